@@ -1,11 +1,20 @@
-import sqlite3
 import json
-import os
 import logging
 from datetime import datetime, timedelta
-from flask import Blueprint, jsonify, request, session, render_template
+from flask import Blueprint, jsonify, request, session, render_template, current_app, url_for
 from functools import wraps
 
+import config
+import db
+from snapshot_cache import SnapshotCache
+from word_cache import word_cache
+import write_behind
+import tts_service
+import audio_manifest
+import error_records
+import pdf_cache
+import pdf_jobs
+
 # 创建蓝图
 admin_bp = Blueprint('admin', __name__)
 
@@ -14,7 +23,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # 数据库路径
-DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vocabulary.db')
+DB_PATH = db.pool.database
 
 # 管理员权限装饰器
 def admin_required(f):
@@ -26,11 +35,10 @@ def admin_required(f):
         
         # 检查用户是否是管理员
         try:
-            conn = sqlite3.connect(DB_PATH)
+            conn = db.get_db()
             cursor = conn.cursor()
             cursor.execute('SELECT role FROM Users WHERE id = ?', (session['user_id'],))
             user = cursor.fetchone()
-            conn.close()
             
             if not user or user[0] != 'admin':
                 return jsonify({'error': '您没有管理员权限'}), 403
@@ -47,130 +55,142 @@ def admin_required(f):
 def admin_dashboard():
     return render_template('admin_dashboard.html')
 
-# 获取仪表盘数据API
-@admin_bp.route('/api/admin/dashboard')
-@admin_required
-def get_dashboard_data():
+def _accuracy(attempts, errors):
+    """根据答题数和错误数计算正确率（百分比），没有答题记录时为0"""
+    if not attempts:
+        return 0
+    return round(max(attempts - (errors or 0), 0) * 100.0 / attempts, 2)
+
+
+def _daily_window(cursor, days, student_id=None):
+    """一次范围查询读取最近days天（不含今天）的每日汇总，返回按日期排列的 (date, attempts, errors, tests)"""
+    start = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+    end = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    query = """
+        SELECT day,
+               SUM(attempts) as attempts,
+               SUM(CASE WHEN attempts > 0 THEN errors ELSE 0 END) as errors,
+               SUM(tests) as tests
+        FROM DailyStudyStats
+        WHERE day BETWEEN ? AND ?
+    """
+    params = [start, end]
+    if student_id is not None:
+        query += " AND student_id = ?"
+        params.append(student_id)
+    query += " GROUP BY day"
+    by_day = {row['day']: row for row in cursor.execute(query, params).fetchall()}
+
+    window = []
+    for i in range(days, 0, -1):
+        date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+        row = by_day.get(date)
+        window.append((date, row['attempts'], row['errors'], row['tests']) if row else (date, 0, 0, 0))
+    return window
+
+
+def _format_activity(value):
+    if not value:
+        return None
+    if len(value) <= 10:
+        return value
+    return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M')
+
+
+def _build_dashboard():
+    """计算仪表盘数据，返回JSON文本（在后台线程中也会调用，不能依赖请求上下文）"""
+    conn = db.pool.acquire()  # 连接池中的连接已启用行工厂，结果可以通过列名访问
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row  # 启用行工厂，使结果可以通过列名访问
         cursor = conn.cursor()
         
         # 获取总学生数（非管理员用户）
-        cursor.execute('SELECT COUNT(*) FROM Users WHERE role != "admin"')
+        cursor.execute("SELECT COUNT(*) FROM Users WHERE role != 'admin'")
         total_students = cursor.fetchone()[0]
         
-        # 获取今日活跃学生数（今天有提交测试的用户）
+        # 获取今日活跃学生数（今天有答题或错误记录的用户）
         today = datetime.now().strftime('%Y-%m-%d')
         cursor.execute("""
             SELECT COUNT(DISTINCT student_id) 
-            FROM ErrorLogs 
-            WHERE date(timestamp) = ?
+            FROM DailyStudyStats 
+            WHERE day = ?
         """, (today,))
         active_students = cursor.fetchone()[0]
         
-        # 获取总测试次数（通过错误日志估算）
-        cursor.execute('SELECT COUNT(DISTINCT test_id) FROM ErrorLogs')
-        total_tests = cursor.fetchone()[0]
-        
-        # 获取平均正确率
+        # 每个学生的测试次数、答题数和错误数（来自每日汇总表）
         cursor.execute("""
-            SELECT AVG(correct_rate) FROM (
-                SELECT student_id, 
-                       COUNT(CASE WHEN is_correct = 1 THEN 1 END) * 100.0 / COUNT(*) as correct_rate
-                FROM ErrorLogs
-                GROUP BY student_id
-            )
+            SELECT student_id,
+                   SUM(tests) as test_count,
+                   SUM(attempts) as attempts,
+                   SUM(CASE WHEN attempts > 0 THEN errors ELSE 0 END) as errors,
+                   MAX(day) as last_day
+            FROM DailyStudyStats
+            GROUP BY student_id
         """)
-        avg_accuracy_result = cursor.fetchone()
-        avg_accuracy = round(avg_accuracy_result[0] if avg_accuracy_result[0] is not None else 0, 2)
+        totals = {row['student_id']: row for row in cursor.fetchall()}
         
-        # 获取学生列表
-        cursor.execute("""
-            SELECT u.id, u.username, u.role, u.created_at as register_date,
-                   (SELECT MAX(error_date) FROM ErrorLogs WHERE student_id = u.id) as last_activity,
-                   (SELECT COUNT(DISTINCT test_id) FROM ErrorLogs WHERE student_id = u.id) as test_count,
-                   (SELECT COUNT(CASE WHEN is_correct = 1 THEN 1 END) * 100.0 / COUNT(*) 
-                    FROM ErrorLogs WHERE student_id = u.id) as accuracy
-            FROM Users u
-            WHERE u.role = 'student'
-            ORDER BY last_activity IS NULL, last_activity DESC
-        """)
-        students = [dict(row) for row in cursor.fetchall()]
+        # 获取总测试次数
+        total_tests = sum(row['test_count'] or 0 for row in totals.values())
         
-        # 处理日期格式和空值
-        for student in students:
-            if student['register_date']:
-                student['register_date'] = datetime.fromisoformat(student['register_date']).strftime('%Y-%m-%d')
-            if student['last_activity']:
-                student['last_activity'] = datetime.fromisoformat(student['last_activity']).strftime('%Y-%m-%d %H:%M')
-            if student['accuracy'] is not None:
-                student['accuracy'] = round(student['accuracy'], 2)
-            else:
-                student['accuracy'] = 0
+        # 获取平均正确率（有答题记录的学生的正确率平均值）
+        rates = [_accuracy(row['attempts'], row['errors']) for row in totals.values() if row['attempts']]
+        avg_accuracy = round(sum(rates) / len(rates), 2) if rates else 0
+        
+        # 最近一次错误的具体时间
+        cursor.execute("SELECT student_id, MAX(last_error_date) as last_error_date FROM StudentWordErrorStats GROUP BY student_id")
+        last_errors = {row['student_id']: row['last_error_date'] for row in cursor.fetchall()}
         
-        # 获取单词错误统计
+        # 获取学生列表（Users表没有注册时间字段）
+        cursor.execute("SELECT u.id, u.username, u.role FROM Users u WHERE u.role = 'student'")
+        students = []
+        for row in cursor.fetchall():
+            student = dict(row)
+            total = totals.get(student['id'])
+            last_activity = max(filter(None, [last_errors.get(student['id']), total['last_day'] if total else None]), default=None)
+            student['register_date'] = None
+            student['last_activity'] = _format_activity(last_activity)
+            student['test_count'] = total['test_count'] if total else 0
+            student['accuracy'] = _accuracy(total['attempts'], total['errors']) if total else 0
+            students.append(student)
+        students.sort(key=lambda student: student['last_activity'] or '', reverse=True)
+        
+        # 获取单词错误统计（错误汇总表中每个学生每个单词一行）
+        cursor.execute("SELECT COALESCE(SUM(error_count), 0) FROM StudentWordErrorStats")
+        total_errors = cursor.fetchone()[0]
         cursor.execute("""
-            SELECT 
-                w.spelling, 
-                w.list_id,
-                COUNT(*) as error_count,
-                COUNT(*) * 100.0 / (SELECT COUNT(*) FROM ErrorLogs) as error_rate,
-                GROUP_CONCAT(DISTINCT e.user_answer, ', ') as common_errors
-            FROM ErrorLogs e
-            JOIN Words w ON e.word_id = w.id
-            WHERE e.is_correct = 0
-            GROUP BY w.id
+            SELECT word_id,
+                   SUM(error_count) as error_count,
+                   GROUP_CONCAT(DISTINCT last_answer) as common_errors
+            FROM StudentWordErrorStats
+            GROUP BY word_id
             ORDER BY error_count DESC
             LIMIT 20
         """)
-        word_stats = [dict(row) for row in cursor.fetchall()]
-        
-        # 处理错误率和常见错误
-        for word in word_stats:
-            word['error_rate'] = round(word['error_rate'], 2)
-            # 限制常见错误的数量
-            if word['common_errors']:
-                errors = word['common_errors'].split(', ')
-                word['common_errors'] = ', '.join(errors[:3])  # 只显示前3个常见错误
-        
-        # 获取正确率趋势（最近30天）
-        accuracy_trend = []
-        for i in range(30, 0, -1):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            cursor.execute("""
-                SELECT 
-                    COUNT(CASE WHEN is_correct = 1 THEN 1 END) * 100.0 / COUNT(*) as accuracy
-                FROM ErrorLogs
-                WHERE date(timestamp) = ?
-            """, (date,))
-            result = cursor.fetchone()
-            accuracy = round(result[0], 2) if result[0] is not None else 0
-            accuracy_trend.append({
-                'date': date,
-                'accuracy': accuracy
-            })
-        
-        # 获取活动趋势（最近30天）
-        activity_trend = []
-        for i in range(30, 0, -1):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            cursor.execute("""
-                SELECT COUNT(DISTINCT test_id) as test_count
-                FROM ErrorLogs
-                WHERE date(timestamp) = ?
-            """, (date,))
-            result = cursor.fetchone()
-            test_count = result[0] if result[0] is not None else 0
-            activity_trend.append({
-                'date': date,
-                'test_count': test_count
+        word_rows = cursor.fetchall()
+        words_by_id = {word.word_id: word for word in word_cache.get_many(conn, [row['word_id'] for row in word_rows])}
+        word_stats = []
+        for row in word_rows:
+            word = words_by_id.get(row['word_id'])
+            if word is None:
+                continue
+            # 常见错误取各学生最近一次的错误答案，只显示前3个
+            answers = [answer for answer in (row['common_errors'] or '').split(',') if answer.strip()]
+            word_stats.append({
+                'spelling': word.fields['spelling'],
+                'list_id': word.fields['list_id'],
+                'error_count': row['error_count'],
+                'error_rate': round(row['error_count'] * 100.0 / total_errors, 2) if total_errors else 0,
+                'common_errors': ', '.join(answers[:3])
             })
         
-        conn.close()
+        # 获取正确率趋势和活动趋势（最近30天，一次范围查询）
+        window = _daily_window(cursor, 30)
+        accuracy_trend = [{'date': date, 'accuracy': _accuracy(attempts, errors)}
+                          for date, attempts, errors, _ in window]
+        activity_trend = [{'date': date, 'test_count': tests}
+                          for date, _, _, tests in window]
         
         # 返回仪表盘数据
-        return jsonify({
+        return json.dumps({
             'total_students': total_students,
             'active_students': active_students,
             'total_tests': total_tests,
@@ -178,24 +198,42 @@ def get_dashboard_data():
             'students': students,
             'word_stats': word_stats,
             'accuracy_trend': accuracy_trend,
-            'activity_trend': activity_trend
-        })
-        
+            'activity_trend': activity_trend,
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }, ensure_ascii=False)
+    finally:
+        db.pool.release(conn)
+
+
+# 仪表盘快照缓存：过期后先返回旧数据并在后台刷新
+dashboard_cache = SnapshotCache('admin-dashboard', _build_dashboard,
+                                ttl=config.DASHBOARD_CACHE_TTL, stale_ttl=config.DASHBOARD_CACHE_STALE_TTL)
+
+
+# 获取仪表盘数据API
+@admin_bp.route('/api/admin/dashboard')
+@admin_required
+def get_dashboard_data():
+    try:
+        # refresh=1 时忽略缓存重新计算（管理员点击"刷新数据"）
+        body, cache_status = dashboard_cache.get(refresh=request.args.get('refresh') == '1')
     except Exception as e:
         logger.error(f"获取仪表盘数据时出错: {e}")
         return jsonify({'error': f'获取仪表盘数据失败: {str(e)}'}), 500
+    response = current_app.response_class(body, mimetype='application/json')
+    response.headers['X-Cache'] = cache_status
+    return response
 
 # 获取单个学生详情API
 @admin_bp.route('/api/admin/student/<int:student_id>')
 @admin_required
 def get_student_details(student_id):
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = db.get_db()
         cursor = conn.cursor()
         
         # 获取学生基本信息
-        cursor.execute('SELECT id, username, role, created_at FROM Users WHERE id = ?', (student_id,))
+        cursor.execute('SELECT id, username, role FROM Users WHERE id = ?', (student_id,))
         student = cursor.fetchone()
         
         if not student:
@@ -203,90 +241,68 @@ def get_student_details(student_id):
         
         student_data = dict(student)
         
-        # 获取学生测试统计
+        # 获取学生测试统计（来自每日汇总表）
         cursor.execute("""
             SELECT 
-                COUNT(DISTINCT test_id) as test_count,
-                COUNT(CASE WHEN is_correct = 1 THEN 1 END) * 100.0 / COUNT(*) as accuracy,
-                MAX(timestamp) as last_activity
-            FROM ErrorLogs
+                SUM(tests) as test_count,
+                SUM(attempts) as attempts,
+                SUM(CASE WHEN attempts > 0 THEN errors ELSE 0 END) as errors,
+                MAX(day) as last_day
+            FROM DailyStudyStats
             WHERE student_id = ?
         """, (student_id,))
         stats = cursor.fetchone()
+        cursor.execute("SELECT MAX(last_error_date) FROM StudentWordErrorStats WHERE student_id = ?", (student_id,))
+        last_error_date = cursor.fetchone()[0]
         
-        if stats:
-            student_data.update(dict(stats))
-            if student_data['accuracy'] is not None:
-                student_data['accuracy'] = round(student_data['accuracy'], 2)
-            else:
-                student_data['accuracy'] = 0
+        student_data['test_count'] = stats['test_count'] or 0
+        student_data['accuracy'] = _accuracy(stats['attempts'], stats['errors'])
+        student_data['last_activity'] = max(filter(None, [last_error_date, stats['last_day']]), default=None)
         
-        # 获取学生最近的错误记录
+        # 获取学生最近的错误记录（ErrorLogs只记录答错的单词）
         cursor.execute("""
-            SELECT 
-                e.id, e.timestamp, e.test_id, e.is_correct,
-                w.spelling, w.meaning, e.user_answer
-            FROM ErrorLogs e
-            JOIN Words w ON e.word_id = w.id
-            WHERE e.student_id = ?
-            ORDER BY e.timestamp DESC
+            SELECT error_id, error_date, word_id, student_answer
+            FROM ErrorLogs
+            WHERE student_id = ?
+            ORDER BY error_date DESC, error_id DESC
             LIMIT 20
         """, (student_id,))
-        recent_errors = [dict(row) for row in cursor.fetchall()]
+        error_rows = cursor.fetchall()
+        words_by_id = {word.word_id: word for word in word_cache.get_many(conn, [row['word_id'] for row in error_rows])}
+        recent_errors = [{
+            'id': row['error_id'],
+            'timestamp': row['error_date'],
+            'is_correct': 0,
+            'spelling': words_by_id[row['word_id']].fields['spelling'],
+            'meaning': words_by_id[row['word_id']].fields['meaning_cn'],
+            'user_answer': row['student_answer']
+        } for row in error_rows if row['word_id'] in words_by_id]
         
         # 获取学生的单词列表统计
         cursor.execute("""
             SELECT 
-                w.list_id,
-                COUNT(*) as total,
-                COUNT(CASE WHEN e.is_correct = 1 THEN 1 END) as correct,
-                COUNT(CASE WHEN e.is_correct = 1 THEN 1 END) * 100.0 / COUNT(*) as accuracy
-            FROM ErrorLogs e
-            JOIN Words w ON e.word_id = w.id
-            WHERE e.student_id = ?
-            GROUP BY w.list_id
-            ORDER BY w.list_id
+                list_id,
+                SUM(attempts) as total,
+                SUM(CASE WHEN attempts > 0 THEN errors ELSE 0 END) as errors
+            FROM DailyStudyStats
+            WHERE student_id = ?
+            GROUP BY list_id
+            ORDER BY list_id
         """, (student_id,))
-        list_stats = [dict(row) for row in cursor.fetchall()]
+        list_stats = [{
+            'list_id': row['list_id'],
+            'total': row['total'],
+            'correct': max(row['total'] - row['errors'], 0),
+            'accuracy': _accuracy(row['total'], row['errors'])
+        } for row in cursor.fetchall()]
         
-        # 处理列表统计的准确率
-        for stat in list_stats:
-            if stat['accuracy'] is not None:
-                stat['accuracy'] = round(stat['accuracy'], 2)
-            else:
-                stat['accuracy'] = 0
-        
-        # 获取学生的学习趋势（最近14天）
-        trend_data = []
-        for i in range(14, 0, -1):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as attempts,
-                    COUNT(CASE WHEN is_correct = 1 THEN 1 END) as correct,
-                    COUNT(CASE WHEN is_correct = 1 THEN 1 END) * 100.0 / COUNT(*) as accuracy
-                FROM ErrorLogs
-                WHERE student_id = ? AND date(timestamp) = ?
-            """, (student_id, date))
-            result = cursor.fetchone()
-            
-            if result:
-                data = dict(result)
-                data['date'] = date
-                if data['accuracy'] is not None:
-                    data['accuracy'] = round(data['accuracy'], 2)
-                else:
-                    data['accuracy'] = 0
-                trend_data.append(data)
-            else:
-                trend_data.append({
-                    'date': date,
-                    'attempts': 0,
-                    'correct': 0,
-                    'accuracy': 0
-                })
-        
-        conn.close()
+        # 获取学生的学习趋势（最近14天，一次范围查询）
+        trend_data = [{
+            'date': date,
+            'attempts': attempts,
+            'correct': max(attempts - errors, 0),
+            'accuracy': _accuracy(attempts, errors)
+        } for date, attempts, errors, _ in _daily_window(cursor, 14, student_id)]
         
         # 返回学生详情数据
         return jsonify({
@@ -298,4 +314,108 @@ def get_student_details(student_id):
         
     except Exception as e:
         logger.error(f"获取学生详情时出错: {e}")
-        return jsonify({'error': f'获取学生详情失败: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'获取学生详情失败: {str(e)}'}), 500
+
+# 批量导出错词考核纸API
+# 未指定字段时导出的内容（与错误历史页面"当日错题试卷"预设相近）
+_BATCH_DEFAULT_FIELDS = ('meaning_cn', 'pos', 'wrong_answers', 'error_count')
+
+@admin_bp.route('/api/admin/export-pdf-batch', methods=['POST'])
+@admin_required
+def export_pdf_batch():
+    """为一组学生生成日期范围内的错词考核纸，打包成一个zip
+
+    请求体：student_ids（为空时为全部学生）、date_from、date_to（默认今天）、book_id、list_id、fields、hideWord、sort_by。
+    错误记录直接从ErrorLogs读取，各学生的考核纸在PDF进程池中并行生成。
+    返回202和任务状态，通过 status_url 查询进度（completed/total），完成后从 download_url 下载。
+    """
+    data = request.get_json(silent=True) or {}
+    today = datetime.now().strftime('%Y-%m-%d')
+    try:
+        date_from = error_records.parse_date(data.get('date_from'), today)
+        date_to = error_records.parse_date(data.get('date_to'), today)
+        student_ids = [int(student_id) for student_id in data.get('student_ids') or []]
+        book_id = int(data['book_id']) if data.get('book_id') else None
+        list_id = int(data['list_id']) if data.get('list_id') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': '参数格式错误'}), 400
+    if date_from > date_to:
+        return jsonify({'error': '开始日期不能晚于结束日期'}), 400
+    fields = data.get('fields') or list(_BATCH_DEFAULT_FIELDS)
+    hide_word = bool(data.get('hideWord', False))
+    sort_by = 'error_count' if data.get('sort_by') == 'error_count' else 'date'
+
+    try:
+        conn = db.get_db()
+        query = "SELECT id, username FROM Users WHERE role = 'student'"
+        if student_ids:
+            query += f" AND id IN ({','.join('?' * len(student_ids))})"
+        students = conn.execute(query + " ORDER BY id", student_ids).fetchall()
+        if not students:
+            return jsonify({'error': '没有找到所选的学生'}), 400
+        if len(students) > config.PDF_BATCH_MAX_STUDENTS:
+            return jsonify({'error': f'一次最多导出 {config.PDF_BATCH_MAX_STUDENTS} 名学生'}), 400
+
+        if date_from == date_to:
+            label = f"{date_from.replace('-', '')}当日错词考核纸"
+        else:
+            label = f"{date_from.replace('-', '')}-{date_to.replace('-', '')}错词考核纸"
+        suffix = ''
+        if book_id is not None or list_id is not None:
+            names = conn.execute("""
+                SELECT (SELECT book_name FROM Books WHERE book_id = ?), (SELECT list_name FROM WordLists WHERE list_id = ?)
+            """, (book_id, list_id)).fetchone()
+            suffix = ' '.join(name for name in names if name)
+
+        filters = error_records.build_filters(book_id, list_id, date_from, date_to)
+        sheets = []
+        skipped = []
+        for student in students:
+            errors = error_records.sheet_records(error_records.iter_batches(conn, student['id'], filters, sort_by),
+                                                 limit=config.PDF_MAX_ROWS)
+            if not errors:
+                skipped.append(student['username'])
+                continue
+            title = f"{student['username']} - {label}" + (f" - {suffix}" if suffix else "")
+            spec = {'errors': errors, 'fields': fields, 'hide_word': hide_word, 'title': title}
+            sheets.append((f"{student['username']}-{label}" + (f"-{suffix}" if suffix else "") + ".pdf", spec))
+        if not sheets:
+            return jsonify({'error': '所选学生在该日期范围内没有错误记录', 'skipped': skipped}), 400
+
+        job = pdf_jobs.manager.submit_batch(session['user_id'], sheets, f"{label}.zip")
+    except pdf_jobs.PDFJobLimitError as e:
+        logger.warning(f"拒绝批量PDF导出请求: {e}")
+        response = jsonify({'error': '已有导出任务正在进行，请稍后再试'})
+        response.status_code = 429
+        response.headers['Retry-After'] = '5'
+        return response
+    except Exception as e:
+        logger.error(f"提交批量PDF导出任务时出错: {e}")
+        return jsonify({'error': f'批量导出失败: {str(e)}'}), 500
+
+    logger.info(f"批量PDF导出: {len(sheets)} 名学生, {job['rows']} 条记录, 跳过 {len(skipped)} 名没有错误记录的学生")
+    return jsonify({
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'total': job['total'],
+        'completed': job['completed'],
+        'skipped': skipped,
+        'status_url': url_for('get_pdf_job', job_id=job['job_id']),
+        'download_url': url_for('download_pdf_job', job_id=job['job_id']),
+    }), 202
+
+# 数据库连接池指标API
+@admin_bp.route('/api/admin/db-pool-stats')
+@admin_required
+def get_db_pool_stats():
+    """返回当前Worker进程的连接池指标（取连接等待时间、健康检查失败次数等）、写入通道、单词缓存、后台写入队列、仪表盘缓存、TTS合成、音频清单、PDF导出任务和PDF缓存指标"""
+    stats = db.pool.stats()
+    stats['writer'] = db.writer.stats()
+    stats['word_cache'] = word_cache.stats()
+    stats['write_behind'] = write_behind.queue.stats()
+    stats['dashboard_cache'] = dashboard_cache.stats()
+    stats['tts'] = tts_service.service.stats()
+    stats['audio_manifest'] = audio_manifest.manifest.stats()
+    stats['pdf_jobs'] = pdf_jobs.manager.stats()
+    stats['pdf_cache'] = pdf_cache.cache.stats()
+    return jsonify(stats)
@@ -5,44 +5,53 @@
 # 详细开发指南请参考：DEVELOPMENT_GUIDE.md
 # ======================================================================
 
-from flask import Flask, jsonify, request, render_template, send_from_directory, session
+from flask import Flask, jsonify, request, render_template, send_file, send_from_directory, session, stream_with_context
 import sqlite3
 import random
 import logging
 from logging.handlers import RotatingFileHandler
 import os
-import hashlib
+import json
+import base64
 # 新增这一行，导入 werkzeug 的安全模块，用于密码加密
-from werkzeug.security import generate_password_hash, check_password_hash
-# 导入gTTS库，用于文本到语音转换
-from gtts import gTTS
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
 # 导入Flask
 from flask import Flask, request, jsonify, render_template, session, send_from_directory
 
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-import io
 import datetime
 import os
+# 导入配置和数据库连接池
+import config
+import db
+import migrations
+import word_sampler
+from word_cache import word_cache, json_array
+from grader import answer_index
+import submissions
+import write_behind
+import tts_service
+import audio_manifest
+import media_delivery
+import audio_bundle
+import error_records
+import pdf_cache
+import pdf_jobs
 # 导入管理员路由蓝图
-from admin_routes import admin_bp
+from admin_routes import admin_bp, dashboard_cache
 
 # --- 应用设置 ---
 app = Flask(__name__, 
            static_folder=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets'),
            static_url_path='/assets')
 app.secret_key = 'your-super-secret-key-for-mvp' # MVP阶段随便写一个即可
-DATABASE_FILE = 'vocabulary.db'
+DATABASE_FILE = config.DATABASE_PATH
 # 我们将所有词库资源（音频、txt）都统一放在 'wordlists' 文件夹下进行管理
-WORDLISTS_BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wordlists')
+WORDLISTS_BASE_DIR = config.WORDLISTS_DIR
 # TTS音频缓存目录
-TTS_CACHE_DIR = os.path.join(WORDLISTS_BASE_DIR, 'tts_cache')
-os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+os.makedirs(config.TTS_CACHE_DIR, exist_ok=True)
+
+# 注册数据库连接池（请求结束时归还连接）
+db.init_app(app)
 
 # 注册管理员路由蓝图
 app.register_blueprint(admin_bp)
@@ -95,72 +104,70 @@ setup_logger(app)
 
 # --- 数据库连接 ---
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """获取当前请求的数据库连接（来自连接池，请求结束时自动归还，无需手动close）"""
+    return db.get_db()
 
 # --- 核心API路由 ---
 
 # 媒体文件服务路由 (您的优秀代码，我们保留)
 @app.route('/wordlists/<path:subpath>')
 def serve_wordlist_files(subpath):
+    path = safe_join(WORDLISTS_BASE_DIR, subpath)
+    # 只对外提供音频文件：词库目录中还有词表文本、音频清单和TTS缓存索引（index.db）
+    if path is None or not media_delivery.is_audio(path):
+        return {'error': '文件不存在'}, 404
     try:
-        return send_from_directory(WORDLISTS_BASE_DIR, subpath)
+        # 音频清单中有md5时用它作为ETag，不必再计算
+        info = audio_manifest.manifest.info(subpath)
+        return media_delivery.send_media(path, WORDLISTS_BASE_DIR, config.MEDIA_ACCEL_PREFIX,
+                                         etag=info['md5'] if info else None)
+    except FileNotFoundError:
+        return {'error': '文件不存在'}, 404
     except Exception as e:
         app.logger.error(f'发送媒体文件时出错: {subpath}, 错误: {str(e)}')
         return {'error': '服务器内部错误'}, 500
 
-# TTS文本预处理函数
-def preprocess_text_for_tts(text):
-    """预处理文本以优化TTS效果"""
-    # 处理特殊情况
-    text = text.replace('a/an', 'a or an')
-    text = text.replace('/', ' or ')
-    # 可以添加更多替换规则
-    return text
+def _tts_pending_response(key):
+    """合成仍在进行，客户端按Retry-After稍后轮询同一地址"""
+    response = jsonify({'status': 'pending', 'key': key, 'poll': request.path})
+    response.status_code = 202
+    response.headers['Retry-After'] = '1'
+    response.headers['Location'] = request.path
+    return response
 
 # TTS API端点
 @app.route('/api/tts/<word>')
 def get_tts_audio(word):
-    """生成单词的TTS音频并返回"""
+    """返回单词的TTS音频；合成较慢时返回202，客户端按Retry-After稍后重试同一地址
+
+    可选参数 wait 指定最多等待合成完成的秒数（不超过 TTS_WAIT_SECONDS，wait=0 立即返回）。
+    """
     try:
-        # 文本预处理
-        processed_word = preprocess_text_for_tts(word)
-        
-        # 生成文件名（使用哈希避免文件名问题）
-        filename = hashlib.md5(processed_word.encode()).hexdigest() + '.mp3'
-        filepath = os.path.join(TTS_CACHE_DIR, filename)
-        
-        # 如果文件不存在，则生成
-        if not os.path.exists(filepath):
-            # 添加超时控制，防止Worker崩溃
-            import signal
-            
-            def timeout_handler(signum, frame):
-                raise TimeoutError("TTS生成超时")
-            
-            # 设置30秒超时
-            signal.signal(signal.SIGALRM, timeout_handler)
-            signal.alarm(30)
-            
-            try:
-                tts = gTTS(text=processed_word, lang='en', slow=False)
-                tts.save(filepath)
-                app.logger.info(f"已生成TTS音频: {word} -> {filepath}")
-            except TimeoutError:
-                app.logger.error(f"TTS生成超时: {word}")
-                # 返回一个默认的音频文件或错误响应
-                return {'error': 'TTS生成超时，请稍后重试'}, 408
-            except Exception as e:
-                app.logger.error(f"TTS生成失败: {word}, 错误: {str(e)}")
-                return {'error': 'TTS生成失败'}, 500
-            finally:
-                signal.alarm(0)  # 取消超时
-        
-        return send_from_directory(TTS_CACHE_DIR, filename)
-    except Exception as e:
-        app.logger.error(f"生成TTS音频失败: {word}, 错误: {str(e)}")
-        return {'error': '生成TTS音频失败'}, 500
+        wait = min(float(request.args.get('wait', config.TTS_WAIT_SECONDS)), config.TTS_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({'error': 'wait参数无效'}), 400
+
+    # 索引中的文件可能刚被其他Worker淘汰，此时删除记录并重新生成一次
+    for _ in range(2):
+        try:
+            key, filepath = tts_service.service.get(word, wait)
+        except tts_service.TTSBusyError as e:
+            app.logger.warning(f"TTS任务繁忙，拒绝请求: {word}, {e}")
+            response = jsonify({'error': 'TTS服务繁忙，请稍后重试'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '5'
+            return response
+        except Exception as e:
+            app.logger.error(f"生成TTS音频失败: {word}, 错误: {str(e)}")
+            return {'error': 'TTS生成失败'}, 500
+
+        if filepath is None:
+            return _tts_pending_response(key)
+        try:
+            return media_delivery.send_media(filepath, tts_service.service.cache.root, config.TTS_ACCEL_PREFIX)
+        except FileNotFoundError:
+            tts_service.service.cache.discard(key)
+    return _tts_pending_response(key)
 
 # API 1: 获取问题 (已升级)
 # 在app.py中找到这个函数并替换它
@@ -181,125 +188,94 @@ def get_questions():
     
     # 根据学习模式选择不同的查询策略
     if study_mode.lower() == 'error_review':
-        # 错误复习模式：只获取该学生在指定列表中犯过错误的单词
+        # 错误复习模式：只获取该学生在指定列表中犯过错误的单词及错误统计（来自错误汇总表），单词内容来自缓存
         sql_query = '''
-        SELECT w.word_id, w.spelling, w.meaning_cn, w.pos, w.audio_path_uk, w.audio_path_us,
-               w.derivatives, w.root_etymology, w.mnemonic, w.comparison, w.collocation,
-               w.exam_sentence, w.exam_year_source, w.exam_options, w.exam_explanation, w.tips,
-               w.list_id,
-               (SELECT COUNT(*) FROM ErrorLogs WHERE word_id = w.word_id AND student_id = ?) as error_count,
-               (SELECT MAX(error_date) FROM ErrorLogs WHERE word_id = w.word_id AND student_id = ?) as last_error_date,
-               wl.list_name, b.book_name
-        FROM Words w
-        INNER JOIN ErrorLogs e ON w.word_id = e.word_id
-        LEFT JOIN WordLists wl ON w.list_id = wl.list_id
-        LEFT JOIN Books b ON wl.book_id = b.book_id
-        WHERE w.list_id = ? AND e.student_id = ?
-        GROUP BY w.word_id
-        ORDER BY error_count DESC, last_error_date DESC
+        SELECT s.word_id, s.error_count, s.last_error_date
+        FROM StudentWordErrorStats s
+        INNER JOIN Words w ON w.word_id = s.word_id
+        WHERE w.list_id = ? AND s.student_id = ?
+        ORDER BY s.error_count DESC, s.last_error_date DESC
         '''
-        params = (student_id, student_id, list_id, student_id)
-    else:
-        # 标准模式和默写模式：随机获取单词
-        sql_query = '''SELECT w.word_id, w.spelling, w.meaning_cn, w.pos, w.audio_path_uk, w.audio_path_us, 
-                   w.derivatives, w.root_etymology, w.mnemonic, w.comparison, w.collocation, 
-                   w.exam_sentence, w.exam_year_source, w.exam_options, w.exam_explanation, w.tips,
-                   b.book_name
-                   FROM Words w
-                   LEFT JOIN WordLists wl ON w.list_id = wl.list_id
-                   LEFT JOIN Books b ON wl.book_id = b.book_id
-                   WHERE w.list_id = ? ORDER BY RANDOM()'''
-        params = (list_id,)
-
-    # 对于错词复习模式，总是获取全部错词，不应用LIMIT
-    # 对于其他模式，只有当数量不是'all'时才加上LIMIT子句
-    if study_mode.lower() != 'error_review' and count_str.lower() != 'all':
-        try:
-            # 确保count可以被转换为整数
-            limit_count = int(count_str)
-            sql_query += ' LIMIT ?'
-            params += (limit_count,) # 将数量添加到参数元组中
-        except ValueError:
-            # 如果count不是一个有效的数字，就使用默认值10，并记录一个警告
-            app.logger.warning(f"无效的count参数: '{count_str}', 将使用默认值10。")
-            sql_query += ' LIMIT ?'
-            params += (10,)
+        params = (list_id, student_id)
 
-    # 添加调试日志
-    if study_mode.lower() == 'error_review':
+        # 错词复习模式总是获取全部错词，不应用LIMIT
         app.logger.info(f"错词复习模式SQL: {sql_query}")
         app.logger.info(f"错词复习模式参数: {params}")
-    
-    words = conn.execute(sql_query, params).fetchall()
-    conn.close()
-    
-    # 添加调试日志
-    if study_mode.lower() == 'error_review':
+        error_rows = conn.execute(sql_query, params).fetchall()
+        words = word_cache.get_many(conn, [row['word_id'] for row in error_rows])
+        error_stats = {row['word_id']: row for row in error_rows}
+        items = [word.to_json('review', {
+            'error_count': error_stats[word.word_id]['error_count'],
+            'last_error_date': error_stats[word.word_id]['last_error_date'],
+        }) for word in words]
+
+        # 添加调试日志
         app.logger.info(f"错词复习模式: 列表ID={list_id}, 学生ID={student_id}, 获取到{len(words)}个错词")
         if words:
-            app.logger.info(f"错词示例: {[word['spelling'] for word in words[:3]]}")
+            app.logger.info(f"错词示例: {[word.fields['spelling'] for word in words[:3]]}")
         else:
             app.logger.info(f"错词复习模式: 列表ID={list_id}, 学生ID={student_id}, 没有错词")
-    
-    # --- 数据处理逻辑，根据学习模式决定是否包含音频URL和详情字段 ---
-    word_list = []
-    for word in words:
-        word_dict = dict(word)
-        
-        # 处理详情字段，确保它们不是None
-        detail_fields = ['derivatives', 'root_etymology', 'mnemonic', 'comparison', 
-                         'collocation', 'exam_sentence', 'exam_year_source', 
-                         'exam_options', 'exam_explanation', 'tips']
-        
-        for field in detail_fields:
-            if field in word_dict and word_dict[field] is None:
-                word_dict[field] = ""
-        
-        # 处理错误复习模式特有的字段
-        if study_mode.lower() == 'error_review':
-            # 确保错误统计字段存在
-            if 'error_count' not in word_dict:
-                word_dict['error_count'] = 0
-            if 'last_error_date' not in word_dict:
-                word_dict['last_error_date'] = ""
-            if 'list_name' not in word_dict:
-                word_dict['list_name'] = ""
-            if 'book_name' not in word_dict:
-                word_dict['book_name'] = ""
-        else:
-            # 标准模式和默写模式：确保book_name字段存在
-            if 'book_name' not in word_dict:
-                word_dict['book_name'] = ""
-        
-        # 根据学习模式决定是否包含音频URL
-        if study_mode.lower() != 'dictation':
-            # 标准模式和错词复习模式：包含音频URL
-            # 根据词书类型选择正确的媒体路径
-            book_name = word_dict.get('book_name', '')
-            if '高中' in book_name:
-                media_prefix = "/wordlists/senior_high/media"
-            else:
-                media_prefix = "/wordlists/junior_high/media"
-            
-            if word_dict['audio_path_uk']:
-                word_dict['audio_path_uk'] = f"{media_prefix}/{word_dict['audio_path_uk']}"
-            else:
-                # 如果没有音频文件，提供TTS URL
-                word_dict['audio_path_uk'] = f"/api/tts/{word_dict['spelling']}"
-                
-            if word_dict['audio_path_us']:
-                word_dict['audio_path_us'] = f"{media_prefix}/{word_dict['audio_path_us']}"
-            else:
-                # 如果没有音频文件，提供TTS URL
-                word_dict['audio_path_us'] = f"/api/tts/{word_dict['spelling']}"
-        else:
-            # 默写模式：不提供音频
-            word_dict['audio_path_uk'] = ""
-            word_dict['audio_path_us'] = ""
-            
-        word_list.append(word_dict)
-        
-    return jsonify(word_list)
+    else:
+        # 标准模式和默写模式：随机获取单词
+        # 只有当数量不是'all'时才限制数量
+        limit_count = None
+        if count_str.lower() != 'all':
+            try:
+                # 确保count可以被转换为整数
+                limit_count = int(count_str)
+            except ValueError:
+                # 如果count不是一个有效的数字，就使用默认值10，并记录一个警告
+                app.logger.warning(f"无效的count参数: '{count_str}', 将使用默认值10。")
+                limit_count = 10
+
+        # 可选的seed参数：同一个seed总是抽到同一份试卷，方便老师给全班出相同的题
+        seed = request.args.get('seed', default=None, type=str)
+        # 在内存中的单词ID索引上抽样，再从单词缓存中取出预先编码好的内容
+        word_ids = word_sampler.sample_word_ids(conn, list_id, limit_count, seed=seed)
+        # 默写模式不提供音频，标准模式包含音频URL（没有录音文件时为TTS地址）
+        view = 'dictation' if study_mode.lower() == 'dictation' else 'quiz'
+        items = [word.to_json(view) for word in word_cache.get_many(conn, word_ids)]
+
+    return app.response_class(json_array(items), mimetype='application/json')
+
+@app.route('/api/audio-bundle')
+def get_audio_bundle():
+    """返回测验音频包，前端一次请求预加载全部音频（格式见 audio_bundle.py）
+
+    ?word_ids=1,2,3 打包指定单词（最多 AUDIO_BUNDLE_MAX_WORDS 个）；?list_id=N 打包整个列表（按内容缓存）。
+    """
+    conn = get_db_connection()
+    list_id = request.args.get('list_id', type=int)
+    if list_id is not None:
+        payloads = word_cache.get_many(conn, word_sampler.word_index.get(conn, list_id))
+        if not payloads:
+            return jsonify({'error': '列表不存在或没有单词'}), 404
+        path, etag = audio_bundle.list_bundle(list_id, payloads)
+        return media_delivery.send_media(path, WORDLISTS_BASE_DIR, config.MEDIA_ACCEL_PREFIX,
+                                         etag=etag, immutable=False)
+
+    try:
+        word_ids = [int(value) for value in request.args.get('word_ids', '').split(',') if value.strip()]
+    except ValueError:
+        return jsonify({'error': 'word_ids参数无效'}), 400
+    if not word_ids:
+        return jsonify({'error': '需要提供list_id或word_ids'}), 400
+    if len(word_ids) > config.AUDIO_BUNDLE_MAX_WORDS:
+        return jsonify({'error': f'一次最多打包{config.AUDIO_BUNDLE_MAX_WORDS}个单词'}), 400
+
+    sources = audio_bundle.collect(word_cache.get_many(conn, word_ids))
+    response = app.response_class(mimetype='application/octet-stream')
+    response.set_etag(audio_bundle.digest(sources))
+    response.cache_control.no_cache = True
+    if request.if_none_match.contains(response.get_etag()[0]):
+        response.status_code = 304
+        return response
+    response.set_data(audio_bundle.build(sources))
+    return response
+
+def _parse_word_id(value):
+    """请求中的单词ID（数字或数字字符串）转为int，格式错误时抛出ValueError"""
+    return int(str(value))
 
 # API 2: 提交答案并批改
 @app.route('/api/submit', methods=['POST'])
@@ -315,164 +291,45 @@ def submit_answers():
     if answers:
         app.logger.info(f"第一个答案示例: word_id={answers[0].get('word_id')}, answer={answers[0].get('answer')}")
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # 单词ID可能以字符串提交，统一转为int（grader 缓存以int为key）
+    try:
+        items = [(_parse_word_id(item.get('word_id')), item.get('answer', '')) for item in answers]
+    except ValueError:
+        return jsonify({'error': '单词ID无效'}), 400
+
+    # 一次取出所有单词的可接受答案（走 grader 缓存，未命中的单词按主键批量 IN 查询）
+    word_ids = list(dict.fromkeys(word_id for word_id, _ in items))
+    answers_by_id = answer_index.get_many(get_db_connection(), word_ids)
 
+    # 批改：全部在内存中完成
+    graded = []
     error_details = []
-    for item in answers:
-        word_id = item.get('word_id')
-        student_answer = item.get('answer', '')
-
-        correct_word = cursor.execute('SELECT spelling FROM Words WHERE word_id = ?', (word_id,)).fetchone()
-        if correct_word:
-            correct_spelling = correct_word['spelling']
-            # 处理斜杠分隔的拼写变体
-            valid_spellings = [s.strip().lower() for s in correct_spelling.split('/')]
-            
-            # 处理逗号分隔的拼写变体（如"wis, wit"）
-            expanded_spellings = []
-            for spelling in valid_spellings:
-                if ',' in spelling:
-                    # 对于逗号分隔的变体，将它们分开并添加到有效拼写列表中
-                    comma_variants = [v.strip().lower() for v in spelling.split(',')]
-                    expanded_spellings.extend(comma_variants)
-                else:
-                    expanded_spellings.append(spelling)
-            
-            valid_spellings = expanded_spellings
-            
-            if student_answer.strip().lower() not in valid_spellings:
-                error_details.append({
-                    'word_id': word_id,
-                    'correct_spelling': correct_spelling,
-                    'your_answer': student_answer
-                })
-                # 将错误记录到ErrorLogs表，使用当前用户ID
-                try:
-                    cursor.execute(
-                        "INSERT INTO ErrorLogs (student_id, word_id, error_type, student_answer, error_date) VALUES (?, ?, ?, ?, datetime('now', 'localtime'))",
-                        (student_id, word_id, 'spelling_mvp', student_answer)
-                    )
-                    app.logger.info(f"记录错误: 用户ID={student_id}, 单词ID={word_id}, 学生答案={student_answer}, 模式=错词复习, 正确拼写={correct_spelling}")
-                except sqlite3.Error as e:
-                    app.logger.error(f"记录错误到ErrorLogs表失败: {e}")
-                    # 如果表不存在，尝试创建它
-                    if 'no such table' in str(e).lower():
-                        try:
-                            cursor.execute('''
-                            CREATE TABLE IF NOT EXISTS ErrorLogs (
-                                error_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                student_id INTEGER,
-                                word_id INTEGER,
-                                error_type TEXT,
-                                student_answer TEXT,
-                                error_date TEXT,
-                                FOREIGN KEY (word_id) REFERENCES Words(word_id)
-                            )
-                            ''')
-                            conn.commit()
-                            app.logger.info("ErrorLogs表已创建")
-                            # 重新尝试插入
-                            cursor.execute(
-                                "INSERT INTO ErrorLogs (student_id, word_id, error_type, student_answer, error_date) VALUES (?, ?, ?, ?, date('now', 'localtime'))",
-                            (student_id, word_id, 'spelling_mvp', student_answer)
-                            )
-                        except sqlite3.Error as e2:
-                            app.logger.error(f"创建ErrorLogs表并插入数据失败: {e2}")
-
-    # 更新SRS进度（仅对已登录用户）
-    if student_id != -1:
+    for word_id, student_answer in items:
+        word_answers = answers_by_id.get(word_id)
+        if word_answers is None:
+            continue
+        is_correct = word_answers.check(student_answer)
+        graded.append((word_id, is_correct, student_answer))
+        if not is_correct:
+            error_details.append({
+                'word_id': word_id,
+                'correct_spelling': word_answers.spelling,
+                'your_answer': student_answer
+            })
+
+    # 记录错误到ErrorLogs表并更新SRS进度（仅对已登录用户）
+    if graded:
+        result = submissions.build_result(student_id, graded)
         try:
-            for item in answers:
-                word_id = item.get('word_id')
-                student_answer = item.get('answer', '')
-                correct_word = cursor.execute('SELECT spelling FROM Words WHERE word_id = ?', (word_id,)).fetchone()
-                
-                if correct_word:
-                    correct_spelling = correct_word['spelling']
-                    valid_spellings = [s.strip().lower() for s in correct_spelling.split('/')]
-                    
-                    # 处理逗号分隔的拼写变体
-                    expanded_spellings = []
-                    for spelling in valid_spellings:
-                        if ',' in spelling:
-                            comma_variants = [v.strip().lower() for v in spelling.split(',')]
-                            expanded_spellings.extend(comma_variants)
-                        else:
-                            expanded_spellings.append(spelling)
-                    
-                    valid_spellings = expanded_spellings
-                    
-                    # 判断答案是否正确
-                    is_correct = student_answer.strip().lower() in valid_spellings
-                    
-                    # 获取当前SRS进度
-                    cursor.execute("""
-                        SELECT repetitions, interval FROM StudentWordProgress 
-                        WHERE student_id = ? AND word_id = ?
-                    """, (student_id, word_id))
-                    
-                    progress = cursor.fetchone()
-                    
-                    if not progress:
-                        # 创建新进度记录
-                        repetitions = 0
-                        interval = 1
-                        app.logger.info(f"创建新的SRS进度记录: student_id={student_id}, word_id={word_id}, 正确={is_correct}")
-                    else:
-                        repetitions = progress[0] or 0
-                        interval = progress[1] or 1
-                        app.logger.info(f"更新现有SRS进度: student_id={student_id}, word_id={word_id}, 当前repetitions={repetitions}, interval={interval}, 正确={is_correct}")
-                    
-                    # 根据答案正确性更新SRS进度
-                    if is_correct:
-                        # 答对了：增加熟练度
-                        if repetitions == 0:
-                            # 第一次答对：标记为初学，1天后复习
-                            repetitions = 1
-                            interval = 1
-                        elif repetitions == 1:
-                            # 第二次答对：标记为熟悉，6天后复习
-                            repetitions = 2
-                            interval = 6
-                        else:
-                            # 多次答对：增加间隔
-                            repetitions += 1
-                            interval = int(interval * 1.5)  # 温和增长
-                    else:
-                        # 答错了：降低熟练度，标记为需要重点复习
-                        if repetitions == 0:
-                            # 第一次答错：标记为不熟悉，明天复习
-                            repetitions = 0
-                            interval = 1
-                        else:
-                            # 之前答对过但这次答错：降低熟练度
-                            repetitions = max(0, repetitions - 1)
-                            interval = max(1, interval // 2)  # 减少间隔
-                    
-                    # 限制最大间隔
-                    interval = min(interval, 365)
-                    
-                    # 计算下次复习日期
-                    from datetime import datetime, timedelta
-                    next_review_date = (datetime.now() + timedelta(days=interval)).strftime('%Y-%m-%d')
-                    
-                    # 更新或插入进度
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO StudentWordProgress 
-                        (student_id, word_id, repetitions, interval, next_review_date)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (student_id, word_id, repetitions, interval, next_review_date))
-                    
-                    app.logger.info(f"SRS进度更新: word_id={word_id}, 正确={is_correct}, repetitions: {repetitions}, interval: {interval}天, next_review: {next_review_date}")
-                    
-            app.logger.info(f"SRS进度更新完成: 用户ID={student_id}, 处理单词数={len(answers)}")
+            if write_behind.queue.enabled:
+                # 结果落盘到本地日志后立即返回，由后台线程批量写入数据库
+                write_behind.queue.append(result)
+            else:
+                error_count, progress_count = db.run_write(submissions.record_results, [result])
+                app.logger.info(f"批改结果已记录: 用户ID={student_id}, 错误记录数={error_count}, SRS进度更新数={progress_count}")
         except Exception as e:
-            app.logger.error(f"更新SRS进度时出错: {e}")
+            app.logger.error(f"记录批改结果时出错: {e}")
             # 不中断主流程，继续执行
-
-    conn.commit()
-    conn.close()
     
     # 添加提交完成日志
     app.logger.info(f"答案提交完成: 用户ID={student_id}, 错误数量={len(error_details)}")
@@ -488,7 +345,7 @@ def submit_answers():
 def get_books():
     """获取所有可用的词书列表"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # 查询数据库中所有词书
@@ -502,9 +359,6 @@ def get_books():
     except sqlite3.Error as e:
         app.logger.error(f"获取词书列表时出错: {e}")
         return jsonify({'error': '获取词书列表失败'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 # --- API路由：获取单词列表 ---
 @app.route('/api/lists')
@@ -513,7 +367,7 @@ def get_lists():
     try:
         book_id = request.args.get('book_id', type=int)
         
-        conn = sqlite3.connect(DATABASE_FILE)
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         if book_id:
@@ -550,9 +404,6 @@ def get_lists():
     except sqlite3.Error as e:
         app.logger.error(f"获取单词列表时出错: {e}")
         return jsonify({'error': '获取单词列表失败'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 # --- API路由：获取错误统计信息 ---
 @app.route('/api/error-stats')
@@ -590,14 +441,14 @@ def get_error_stats():
             list_name = list_result[0] or f'List {list_id}'
             book_name = list_result[1] or 'Unknown Book'
         
-        # 查询该列表中学生的错误统计
+        # 查询该列表中学生的错误统计（来自错误汇总表）
         error_query = """
         SELECT 
-            COUNT(DISTINCT e.word_id) as error_words_count,
-            COUNT(e.error_id) as total_errors
-        FROM ErrorLogs e
-        JOIN Words w ON e.word_id = w.word_id
-        WHERE e.student_id = ? AND w.list_id = ?
+            COUNT(*) as error_words_count,
+            COALESCE(SUM(s.error_count), 0) as total_errors
+        FROM StudentWordErrorStats s
+        JOIN Words w ON s.word_id = w.word_id
+        WHERE s.student_id = ? AND w.list_id = ?
         """
         
         cursor.execute(error_query, (student_id, list_id))
@@ -618,7 +469,6 @@ def get_error_stats():
                 'book_name': book_name
             }
         
-        conn.close()
         return jsonify(stats)
         
     except sqlite3.Error as e:
@@ -634,6 +484,38 @@ def index():
 def error_history():
     return render_template('error_history.html')
 
+# --- 错误历史分页 ---
+def _encode_history_cursor(row, sort_by):
+    """把当前页最后一行的排序键编码为分页游标"""
+    raw = json.dumps({'s': sort_by, 'k': error_records.sort_key(row, sort_by)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_history_cursor(token, sort_by):
+    """解析分页游标，格式错误或与排序方式不匹配时抛出ValueError"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        key = data['k']
+    except (ValueError, TypeError, KeyError):
+        raise ValueError('无效的分页游标')
+    if data.get('s') != sort_by or not isinstance(key, list) or len(key) != len(error_records.SORT_KEYS[sort_by]):
+        raise ValueError('分页游标与排序方式不匹配')
+    return key
+
+
+def _stream_error_history(conn, student_id, filters, sort_by, descending, after):
+    """流式返回全部错误记录：分批键集查询，逐批编码输出，不在内存中保留完整列表"""
+    def generate():
+        yield '{"errors":['
+        count = 0
+        for items in error_records.iter_batches(conn, student_id, filters, sort_by, descending, after):
+            yield (',' if count else '') + ','.join(json.dumps(item, separators=(',', ':')) for item in items)
+            count += len(items)
+        yield f'],"count":{count}}}'
+
+    return app.response_class(stream_with_context(generate()), mimetype='application/json')
+
+
 # --- 错误历史记录API ---
 @app.route('/api/error-history')
 def get_error_history():
@@ -658,62 +540,39 @@ def get_error_history():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # 查询错误记录，并关联单词信息、词书和单元名称
-        query = """
-        SELECT e.error_id, e.word_id, w.spelling, w.meaning_cn, w.pos, w.list_id, 
-               e.student_answer, e.error_type, e.error_date,
-               (SELECT COUNT(*) FROM ErrorLogs WHERE word_id = e.word_id AND student_id = e.student_id) as error_count,
-               wl.book_id, b.book_name, wl.list_name
-        FROM ErrorLogs e
-        JOIN Words w ON e.word_id = w.word_id
-        LEFT JOIN WordLists wl ON w.list_id = wl.list_id
-        LEFT JOIN Books b ON wl.book_id = b.book_id
-        WHERE e.student_id = ?
-        """
-        
-        params = [student_id]
-        
-        # 添加词书和列表筛选条件
-        if book_id is not None:
-            query += " AND wl.book_id = ?"
-            params.append(book_id)
-        
-        if list_id is not None:
-            query += " AND w.list_id = ?"
-            params.append(list_id)
-        
-        # 添加日期范围筛选条件
-        if date_from is not None:
-            query += " AND e.error_date >= ?"
-            params.append(date_from)
-        
-        if date_to is not None:
-            query += " AND e.error_date <= ?"
-            params.append(date_to + ' 23:59:59')  # 包含当天的所有时间
-        
-        # 添加排序逻辑
-        if sort_by == 'error_count':
-            query += " ORDER BY error_count"
-        else:  # 默认按日期排序
-            query += " ORDER BY e.error_date"
-        
-        # 添加排序方向
-        if sort_order.lower() == 'asc':
-            query += " ASC"
-        else:  # 默认降序
-            query += " DESC"
-        
-        query += " LIMIT ?"
-        params.append(limit)
-        
-        cursor.execute(query, params)
-        errors = cursor.fetchall()
+        # 分页参数：cursor 为上一页返回的 next_cursor；stream=1 时流式返回全部记录（用于导出）
+        sort_key = 'error_count' if sort_by == 'error_count' else 'date'
+        descending = sort_order.lower() != 'asc'
+        page_cursor = request.args.get('cursor', default=None, type=str)
+        stream = request.args.get('stream', default='', type=str).lower() in ('1', 'true', 'yes')
+        try:
+            after = _decode_history_cursor(page_cursor, sort_key) if page_cursor else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        filters = error_records.build_filters(book_id, list_id, date_from, date_to)
+
+        if stream:
+            return _stream_error_history(conn, student_id, filters, sort_key, descending, after)
+
+        # 查询错误记录（多取一行用于判断是否还有下一页）
+        errors = error_records.fetch_page(conn, student_id, filters, sort_key, descending, after, limit + 1)
+        has_more = len(errors) > limit
+        errors = errors[:limit]
+        next_cursor = _encode_history_cursor(errors[-1], sort_key) if has_more and errors else None
+
+        # 后续页只返回错误记录，统计信息和单词汇总只在第一页返回
+        if after is not None:
+            return jsonify({
+                'errors': error_records.with_words(conn, errors),
+                'next_cursor': next_cursor,
+                'has_more': has_more
+            })
         
         # 查询错误统计信息
         stats_query = """
         SELECT w.list_id, COUNT(*) as error_count,
-               (SELECT COUNT(DISTINCT word_id) FROM ErrorLogs WHERE student_id = ? AND word_id IN 
-                (SELECT word_id FROM Words WHERE list_id = w.list_id)) as unique_words_count,
+               (SELECT COUNT(*) FROM StudentWordErrorStats s JOIN Words sw ON sw.word_id = s.word_id
+                WHERE s.student_id = ? AND sw.list_id = w.list_id) as unique_words_count,
                wl.book_id, b.book_name, wl.list_name
         FROM ErrorLogs e
         JOIN Words w ON e.word_id = w.word_id
@@ -751,61 +610,92 @@ def get_error_history():
         stats = cursor.fetchall()
         
         # 查询每个单词的错误历史
-        word_history_query = """
-        SELECT w.word_id, w.spelling, w.list_id, w.meaning_cn, w.pos,
-               COUNT(*) as total_errors,
-               GROUP_CONCAT(e.student_answer, ', ') as wrong_answers,
-               GROUP_CONCAT(e.error_date, ', ') as error_dates,
-               wl.book_id, b.book_name, wl.list_name
-        FROM ErrorLogs e
-        JOIN Words w ON e.word_id = w.word_id
-        LEFT JOIN WordLists wl ON w.list_id = wl.list_id
-        LEFT JOIN Books b ON wl.book_id = b.book_id
-        WHERE e.student_id = ?
-        """
-        
-        word_history_params = [student_id]
-        
-        # 添加词书和列表筛选条件
-        if book_id is not None:
-            word_history_query += " AND wl.book_id = ?"
-            word_history_params.append(book_id)
-        
-        if list_id is not None:
-            word_history_query += " AND w.list_id = ?"
-            word_history_params.append(list_id)
-        
-        # 添加日期范围筛选条件
-        if date_from is not None:
-            word_history_query += " AND e.error_date >= ?"
-            word_history_params.append(date_from)
-        
-        if date_to is not None:
-            word_history_query += " AND e.error_date <= ?"
-            word_history_params.append(date_to + ' 23:59:59')  # 包含当天的所有时间
-        
-        word_history_query += """
-        GROUP BY w.word_id
-        """
-        
-        # 添加排序逻辑
-        if sort_by == 'error_count' and sort_order.lower() == 'asc':
-            word_history_query += " ORDER BY total_errors ASC"
-        else:  # 默认按错误次数降序
-            word_history_query += " ORDER BY total_errors DESC"
-        
-        word_history_query += " LIMIT 20"
-        
-        cursor.execute(word_history_query, word_history_params)
-        word_history = cursor.fetchall()
+        word_history_order = 'ASC' if sort_by == 'error_count' and sort_order.lower() == 'asc' else 'DESC'
+        if date_from is None and date_to is None:
+            # 没有日期筛选时错误次数直接来自错误汇总表，只为返回的单词读取答案和日期明细
+            word_history_query = """
+            SELECT s.word_id, s.error_count as total_errors
+            FROM StudentWordErrorStats s
+            JOIN Words w ON s.word_id = w.word_id
+            LEFT JOIN WordLists wl ON w.list_id = wl.list_id
+            WHERE s.student_id = ?
+            """
+            word_history_params = [student_id]
+            if book_id is not None:
+                word_history_query += " AND wl.book_id = ?"
+                word_history_params.append(book_id)
+            if list_id is not None:
+                word_history_query += " AND w.list_id = ?"
+                word_history_params.append(list_id)
+            word_history_query += f" ORDER BY s.error_count {word_history_order} LIMIT 20"
+
+            word_history = [dict(row) for row in cursor.execute(word_history_query, word_history_params).fetchall()]
+            if word_history:
+                word_ids = [item['word_id'] for item in word_history]
+                details = {row['word_id']: row for row in cursor.execute(f"""
+                    SELECT word_id,
+                           GROUP_CONCAT(student_answer, ', ') as wrong_answers,
+                           GROUP_CONCAT(error_date, ', ') as error_dates
+                    FROM ErrorLogs
+                    WHERE student_id = ? AND word_id IN ({','.join('?' * len(word_ids))})
+                    GROUP BY word_id
+                """, [student_id] + word_ids).fetchall()}
+                for item in word_history:
+                    detail = details.get(item['word_id'])
+                    item['wrong_answers'] = detail['wrong_answers'] if detail else None
+                    item['error_dates'] = detail['error_dates'] if detail else None
+        else:
+            word_history_query = """
+            SELECT w.word_id,
+                   COUNT(*) as total_errors,
+                   GROUP_CONCAT(e.student_answer, ', ') as wrong_answers,
+                   GROUP_CONCAT(e.error_date, ', ') as error_dates
+            FROM ErrorLogs e
+            JOIN Words w ON e.word_id = w.word_id
+            LEFT JOIN WordLists wl ON w.list_id = wl.list_id
+            LEFT JOIN Books b ON wl.book_id = b.book_id
+            WHERE e.student_id = ?
+            """
+            
+            word_history_params = [student_id]
+            
+            # 添加词书和列表筛选条件
+            if book_id is not None:
+                word_history_query += " AND wl.book_id = ?"
+                word_history_params.append(book_id)
+            
+            if list_id is not None:
+                word_history_query += " AND w.list_id = ?"
+                word_history_params.append(list_id)
+            
+            # 添加日期范围筛选条件
+            if date_from is not None:
+                word_history_query += " AND e.error_date >= ?"
+                word_history_params.append(date_from)
+            
+            if date_to is not None:
+                word_history_query += " AND e.error_date <= ?"
+                word_history_params.append(date_to + ' 23:59:59')  # 包含当天的所有时间
+            
+            word_history_query += f"""
+            GROUP BY w.word_id
+            ORDER BY total_errors {word_history_order}
+            LIMIT 20
+            """
+            
+            cursor.execute(word_history_query, word_history_params)
+            word_history = cursor.fetchall()
         
-        # 转换为JSON格式
-        error_list = [dict(error) for error in errors]
+        # 转换为JSON格式，单词内容（拼写、释义、所属词书和列表）来自单词缓存
+        error_list = error_records.with_words(conn, errors)
+        words_by_id = {word.word_id: word for word in word_cache.get_many(
+            conn, list({row['word_id'] for row in word_history}))}
         stats_list = [dict(stat) for stat in stats]
-        word_history_list = [dict(item) for item in word_history]
+        word_history_list = [dict(words_by_id[item['word_id']].summary, **dict(item))
+                             for item in word_history if item['word_id'] in words_by_id]
         
         # 获取错误单词数（用于计算正确率）
-        total_tested_query = "SELECT COUNT(DISTINCT word_id) FROM ErrorLogs WHERE student_id = ?"
+        total_tested_query = "SELECT COUNT(*) FROM StudentWordErrorStats WHERE student_id = ?"
         cursor.execute(total_tested_query, (student_id,))
         total_tested = cursor.fetchone()[0]
         
@@ -884,14 +774,14 @@ def get_error_history():
             accuracy_rate = round((correct_words / estimated_total) * 100, 2)
             accuracy_rate = max(0, min(100, accuracy_rate))
         
-        conn.close()
-        
         return jsonify({
             'errors': error_list,
             'stats': stats_list,
             'word_history': word_history_list,
             'total_tested': total_tested,
-            'accuracy_rate': accuracy_rate
+            'accuracy_rate': accuracy_rate,
+            'next_cursor': next_cursor,
+            'has_more': has_more
         })
     except Exception as e:
         app.logger.error(f"获取错误历史记录时出错: {str(e)}")
@@ -919,6 +809,10 @@ def record_error():
         
         if not word_id:
             return jsonify({'error': '缺少单词ID'}), 400
+        try:
+            word_id = _parse_word_id(word_id)
+        except ValueError:
+            return jsonify({'error': '单词ID无效'}), 400
         
         app.logger.info(f"记录错误: student_id={student_id}, word_id={word_id}, student_answer='{student_answer}', list_id={list_id}")
         
@@ -929,18 +823,26 @@ def record_error():
         cursor.execute("SELECT spelling, meaning_cn FROM Words WHERE word_id = ?", (word_id,))
         word = cursor.fetchone()
         if not word:
-            conn.close()
             return jsonify({'error': '单词不存在'}), 404
         
-        # 记录错误到ErrorLogs表
-        cursor.execute("""
+        # 前端判错的答案可能是可接受的拼写变体（如英式/美式拼写），这种情况不记录错误
+        word_answers = answer_index.get(conn, word_id)
+        if student_answer and word_answers is not None and word_answers.check(student_answer):
+            app.logger.info(f"答案为可接受的拼写变体，不记录错误: student_id={student_id}, word_id={word_id}, student_answer='{student_answer}'")
+            return jsonify({
+                'success': True,
+                'message': '答案正确，无需记录',
+                'is_correct': True,
+                'word_id': word_id,
+                'word': word['spelling']
+            })
+        
+        # 记录错误到ErrorLogs表（经由串行化写入通道）
+        db.run_write(lambda conn: conn.execute("""
             INSERT INTO ErrorLogs (student_id, word_id, student_answer, error_type, error_date)
             VALUES (?, ?, ?, ?, datetime('now'))
-        """, (student_id, word_id, student_answer, 'spelling_error'))
-        
-        conn.commit()
-        conn.close()
-        
+        """, (student_id, word_id, student_answer, 'spelling_error')))
+
         app.logger.info(f"成功记录错误: student_id={student_id}, word_id={word_id}, word='{word['spelling']}'")
         
         return jsonify({
@@ -976,16 +878,15 @@ def register():
     # 检查用户名是否已存在
     user = cursor.execute('SELECT * FROM Users WHERE username = ?', (username,)).fetchone()
     if user:
-        conn.close()
         return jsonify({'error': '用户名已存在'}), 409 # 409代表冲突
 
     # 将密码加密后存储
     password_hash = generate_password_hash(password)
 
-    cursor.execute('INSERT INTO Users (username, password_hash, role) VALUES (?, ?, ?)', 
-                   (username, password_hash, 'student')) # 默认为学生
-    conn.commit()
-    conn.close()
+    db.run_write(lambda conn: conn.execute('INSERT INTO Users (username, password_hash, role) VALUES (?, ?, ?)',
+                                           (username, password_hash, 'student'))) # 默认为学生
+    # 学生列表发生变化，让当前Worker的仪表盘缓存在后台重新计算
+    dashboard_cache.invalidate()
 
     return jsonify({'message': '用户注册成功'}), 201 # 201代表创建成功
 
@@ -998,7 +899,6 @@ def login():
 
     conn = get_db_connection()
     user = conn.execute('SELECT * FROM Users WHERE username = ?', (username,)).fetchone()
-    conn.close()
 
     if user and check_password_hash(user['password_hash'], password):
         # 密码正确，将用户信息存入 session
@@ -1011,20 +911,19 @@ def login():
 
 # --- 数据库初始化 ---
 def init_db():
-    conn = get_db_connection()
+    # 表结构、字段和索引由 migrations.py 统一管理
+    if config.DB_AUTO_MIGRATE:
+        migrations.run_migrations(get_db_connection())
+    db.run_write(_init_db)
+    # 重放上次退出时未写入数据库的批改结果
+    if write_behind.queue.enabled:
+        write_behind.queue.recover()
+    # 加载音频清单，生成题目时据此判断音频文件是否存在
+    audio_manifest.manifest.load()
+
+def _init_db(conn):
     cursor = conn.cursor()
     
-    # 检查Users表是否存在role字段
-    cursor.execute("PRAGMA table_info(Users)")
-    columns = cursor.fetchall()
-    has_role_column = any(column['name'] == 'role' for column in columns)
-    
-    # 如果没有role字段，添加该字段
-    if not has_role_column and any(column['name'] == 'id' for column in columns):
-        cursor.execute("ALTER TABLE Users ADD COLUMN role TEXT DEFAULT 'student'")
-        conn.commit()
-        app.logger.info("已向Users表添加role字段")
-    
     # 检查是否有管理员账户
     admin = cursor.execute("SELECT * FROM Users WHERE role = 'admin'").fetchone()
     if not admin:
@@ -1043,256 +942,165 @@ def init_db():
             cursor.execute("INSERT INTO Users (username, password_hash, role) VALUES (?, ?, ?)", 
                           (admin_username, password_hash, 'admin'))
         
-        conn.commit()
         app.logger.info("已创建默认管理员账户")
     
-    conn.close()
 
 # 应用启动时初始化数据库
 with app.app_context():
     init_db()
 
 # --- PDF导出功能 ---
+def _pdf_job_info(job):
+    """返回给客户端的任务状态"""
+    info = {key: job.get(key) for key in ('job_id', 'status', 'rows', 'size', 'queue_ms', 'render_ms', 'error')}
+    if job.get('kind') == 'batch':
+        # 批量任务的进度
+        info.update({key: job.get(key) for key in ('total', 'completed', 'failed_sheets')})
+    info['status_url'] = f"/api/export-pdf/{job['job_id']}"
+    info['download_url'] = f"/api/export-pdf/{job['job_id']}/download"
+    return info
+
+def _pdf_job_response(job):
+    """已完成的任务返回生成的文件（PDF，批量任务为zip），失败返回500，仍在进行时返回202，客户端按Retry-After轮询下载地址"""
+    if job['status'] == pdf_jobs.DONE:
+        try:
+            return send_file(pdf_jobs.manager.output_path(job), mimetype=pdf_jobs.OUTPUT_TYPES[pdf_jobs.output_type(job)],
+                             as_attachment=True, download_name=job['filename'])
+        except FileNotFoundError:
+            return jsonify({'error': '导出文件已过期，请重新导出'}), 404
+    if job['status'] == pdf_jobs.FAILED:
+        return jsonify({'error': f"导出PDF失败: {job.get('error')}"}), 500
+    response = jsonify(_pdf_job_info(job))
+    response.status_code = 202
+    response.headers['Retry-After'] = '1'
+    response.headers['Location'] = f"/api/export-pdf/{job['job_id']}/download"
+    return response
+
+def _get_own_pdf_job(job_id):
+    """返回当前用户的导出任务，不存在或不属于当前用户时返回None"""
+    job = pdf_jobs.manager.status(job_id) if job_id.isalnum() else None
+    if job is None or job['student_id'] != session.get('user_id'):
+        return None
+    return job
+
+def _export_filter(data, name):
+    """导出的筛选参数：请求体中的值优先，其次是查询参数；'all' 和空值表示不筛选"""
+    value = data.get(name)
+    if value is None or value == '':
+        value = request.args.get(name)
+    return None if value in (None, '', 'all') else value
+
+def _export_errors_from_db(student_id, data):
+    """按错误历史的筛选参数分批读取错误记录，按单词合并（最多 PDF_MAX_ROWS 个单词），参数格式错误时抛出ValueError"""
+    try:
+        book_id = _export_filter(data, 'book_id')
+        book_id = int(book_id) if book_id is not None else None
+        list_id = _export_filter(data, 'list_id')
+        list_id = int(list_id) if list_id is not None else None
+        date_from = error_records.parse_date(_export_filter(data, 'date_from'))
+        date_to = error_records.parse_date(_export_filter(data, 'date_to'))
+    except (TypeError, ValueError):
+        raise ValueError('筛选参数无效')
+    sort_key = 'error_count' if _export_filter(data, 'sort_by') == 'error_count' else 'date'
+    descending = str(_export_filter(data, 'sort_order') or 'desc').lower() != 'asc'
+
+    conn = get_db_connection()
+    filters = error_records.build_filters(book_id, list_id, date_from, date_to)
+    return error_records.sheet_records(error_records.iter_batches(conn, student_id, filters, sort_key, descending),
+                                       limit=config.PDF_MAX_ROWS)
+
 @app.route('/api/export-pdf', methods=['POST'])
 def export_pdf():
-    """导出错误历史记录为PDF"""
+    """导出错误历史记录为PDF
+
+    请求体中没有 errors 时，按与 /api/error-history 相同的筛选参数（book_id、list_id、date_from、date_to、
+    sort_by、sort_order，放在请求体或查询参数中）直接从数据库读取错误记录，浏览器不必先下载再上传完整的历史记录；
+    请求体中有 errors 时使用提交的记录（兼容旧的调用方式）。
+    内容相同的导出直接返回缓存的PDF（见 pdf_cache）。否则在PDF进程池中生成，
+    最多等待 wait 秒（默认且不超过 PDF_WAIT_SECONDS）：完成时直接返回PDF，否则返回202和任务状态，客户端轮询 download_url。
+    """
+    # 获取当前登录用户ID，如果未登录则使用默认值-1（表示游客）
+    student_id = session.get('user_id', -1)
+    # 如果用户未登录，返回错误信息
+    if student_id == -1:
+        return jsonify({'error': '请先登录后导出错误历史记录'}), 401
     try:
-        app.logger.info("开始导出PDF")
-        start_time = datetime.datetime.now()
-        
-        # 获取当前登录用户ID，如果未登录则使用默认值-1（表示游客）
-        student_id = session.get('user_id', -1)
-        # 如果用户未登录，返回错误信息
-        if student_id == -1:
-            return jsonify({'error': '请先登录后导出错误历史记录'}), 401
-            
-        # 获取请求数据
-        data = request.get_json()
-        errors = data.get('errors', [])
-        selected_fields = data.get('fields', [])
-        hide_word = data.get('hideWord', False)
-        book_name = data.get('bookName', '')
-        list_name = data.get('listName', '')
-        
-        app.logger.info(f"PDF导出数据: {len(errors)}条记录, {len(selected_fields)}个字段")
-        
-        # 如果没有错误记录，返回错误信息
-        if not errors:
-            return jsonify({'error': '没有可导出的数据'}), 400
-            
-        # 导入reportlab库
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib import colors
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch, cm
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        import io
-        import datetime
-        
-        # 注册中文字体
+        wait = min(float(request.args.get('wait', config.PDF_WAIT_SECONDS)), config.PDF_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({'error': 'wait参数无效'}), 400
+
+    # 获取请求数据
+    data = request.get_json(silent=True) or {}
+    selected_fields = data.get('fields', [])
+    hide_word = data.get('hideWord', False)
+    book_name = data.get('bookName', '')
+    list_name = data.get('listName', '')
+    if 'errors' in data:
+        errors = data.get('errors') or []
+    else:
         try:
-            # 检查是否已经注册了字体，避免重复注册
-            if 'SimSun' not in pdfmetrics.getRegisteredFontNames():
-                app.logger.info("注册中文字体: SimSun")
-                # 尝试注册系统中的中文字体
-                pdfmetrics.registerFont(TTFont('SimSun', 'C:\\Windows\\Fonts\\simsun.ttc'))
-        except Exception as font_error:
-            # 如果失败，使用默认字体
-            app.logger.warning(f"无法加载中文字体，将使用默认字体: {str(font_error)}")
-            
-        app.logger.info("初始化PDF文档")
-        start_pdf_time = datetime.datetime.now()
-        
-        # 创建PDF文档
-        buffer = io.BytesIO()
-        
-        # 获取当前用户名
-        username = session.get('username', 'User')
-        
-        # 生成文件名
-        current_date = datetime.datetime.now().strftime("%Y%m%d")
-        if book_name and list_name:
-            filename = f"{username}-{current_date}当日错词考核纸-{book_name}{list_name}.pdf"
-        elif book_name:
-            filename = f"{username}-{current_date}当日错词考核纸-{book_name}.pdf"
-        elif list_name:
-            filename = f"{username}-{current_date}当日错词考核纸-{list_name}.pdf"
-        else:
-            filename = f"{username}-{current_date}当日错词考核纸.pdf"
-        
-        # 创建PDF文档
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72
-        )
-        
-        # 创建样式
-        styles = getSampleStyleSheet()
-        styles.add(ParagraphStyle(
-            name='Chinese',
-            fontName='SimSun',
-            fontSize=10,
-            leading=12
-        ))
-        styles.add(ParagraphStyle(
-            name='ChineseTitle',
-            fontName='SimSun',
-            fontSize=16,
-            leading=20,
-            alignment=1  # 居中对齐
-        ))
-        
-        # 创建内容列表
-        elements = []
-        
-        # 添加Logo
-        logo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'img', 'Logo', 'orange-theme-logo.svg')
-        if os.path.exists(logo_path):
-            img = Image(logo_path, width=2*inch, height=1*inch)
-            img.hAlign = 'CENTER'
-            elements.append(img)
-            elements.append(Spacer(1, 0.5*inch))
-        
-        # 添加标题
-        title = f"{username} - {current_date}当日错词考核纸"
-        if book_name or list_name:
-            subtitle = []
-            if book_name:
-                subtitle.append(book_name)
-            if list_name:
-                subtitle.append(list_name)
-            title += f" - {' '.join(subtitle)}"
-        elements.append(Paragraph(title, styles['ChineseTitle']))
-        elements.append(Spacer(1, 0.25*inch))
-        
-        # 添加错误记录
-        total_errors = len(errors)
-        app.logger.info(f"开始处理{total_errors}条错误记录")
-        
-        # 批量处理，每50条记录记录一次日志
-        batch_size = 50
-        
-        # 如果错误记录过多，可能导致内存问题，限制最大处理数量
-        max_errors = 500
-        if total_errors > max_errors:
-            app.logger.warning(f"错误记录数量过多({total_errors})，将只处理前{max_errors}条记录")
-            errors = errors[:max_errors]
-            total_errors = max_errors
-        
-        for i, error in enumerate(errors):
-            # 创建表格数据
-            data = []
-            
-            # 添加序号和单词
-            if hide_word:
-                data.append([f"{i+1}.", "______"])
-            else:
-                data.append([f"{i+1}.", error.get('spelling', '')])
-            
-            # 添加选定的字段
-            for field in selected_fields:
-                if field != 'word':  # 单词已经作为标题显示了
-                    label = ''
-                    value = ''
-                    
-                    if field == 'meaning_cn':
-                        label = '中文意思'
-                        value = error.get('meaning_cn', '-')
-                    elif field == 'pos':
-                        label = '词性'
-                        value = error.get('pos', '-')
-                    elif field == 'ipa':
-                        label = '音标'
-                        value = error.get('ipa', '-')
-                    elif field == 'meaning_en':
-                        label = '英文释义'
-                        value = error.get('meaning_en', '-')
-                    elif field == 'example_en':
-                        label = '英文例句'
-                        value = error.get('example_en', '-')
-                    elif field == 'example_cn':
-                        label = '中文例句'
-                        value = error.get('example_cn', '-')
-                    elif field == 'list':
-                        label = '所属列表'
-                        value = error.get('list_name', '-')
-                    elif field == 'wrong_answers':
-                        label = '错误答案'
-                        wrong_answers = error.get('wrong_answers', [])
-                        if wrong_answers and isinstance(wrong_answers, list) and len(wrong_answers) > 0:
-                            value = '; '.join(wrong_answers)
-                        else:
-                            value = '-'
-                    elif field == 'error_date':
-                        label = '错误日期'
-                        value = error.get('error_date', '-')
-                    elif field == 'error_count':
-                        label = '错误次数'
-                        value = str(error.get('error_count', '0'))
-                    
-                    data.append(['', f"{label}: {value}"])
-            
-            # 记录处理进度
-            if (i + 1) % batch_size == 0 or i == total_errors - 1:
-                app.logger.info(f"PDF生成进度: {i+1}/{total_errors} ({((i+1)/total_errors*100):.1f}%)")
-            
-            # 创建表格
-            table = Table(data, colWidths=[0.5*inch, 4*inch])
-            table.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('FONTNAME', (0, 0), (-1, -1), 'SimSun'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ]))
-            
-            elements.append(table)
-            elements.append(Spacer(1, 0.1*inch))
-        
-        # 记录表格生成完成时间
-        pre_build_time = datetime.datetime.now()
-        table_gen_duration = (pre_build_time - start_pdf_time).total_seconds()
-        app.logger.info(f"表格数据准备完成，耗时: {table_gen_duration:.2f}秒")
-        
-        # 构建PDF文档
-        app.logger.info("开始构建PDF文档")
-        doc.build(elements)
-        
-        # 记录PDF构建完成时间
-        post_build_time = datetime.datetime.now()
-        build_duration = (post_build_time - pre_build_time).total_seconds()
-        app.logger.info(f"PDF文档构建完成，耗时: {build_duration:.2f}秒")
-        
-        # 获取PDF内容
-        pdf_data = buffer.getvalue()
-        buffer.close()
-        
-        # 记录PDF大小
-        pdf_size = len(pdf_data) / 1024  # KB
-        app.logger.info(f"PDF文件大小: {pdf_size:.2f}KB")
-        
-        # 计算生成PDF所需时间
-        end_time = datetime.datetime.now()
-        duration = (end_time - start_time).total_seconds()
-        app.logger.info(f"PDF生成完成，耗时: {duration:.2f}秒, 文件大小: {len(pdf_data)/1024:.2f}KB")
-        
-        # 返回PDF文件
-        from flask import send_file
-        return send_file(
-            io.BytesIO(pdf_data),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
-        )
-        
+            errors = _export_errors_from_db(student_id, data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    app.logger.info(f"PDF导出数据: {len(errors)}条记录, {len(selected_fields)}个字段"
+                    + ("" if 'errors' in data else "（从数据库读取）"))
+
+    # 如果没有错误记录，返回错误信息
+    if not errors:
+        return jsonify({'error': '没有可导出的数据'}), 400
+    # 如果错误记录过多，可能导致内存问题，限制最大处理数量
+    if len(errors) > config.PDF_MAX_ROWS:
+        app.logger.warning(f"错误记录数量过多({len(errors)})，将只处理前{config.PDF_MAX_ROWS}条记录")
+        errors = errors[:config.PDF_MAX_ROWS]
+
+    # 生成文件名和标题
+    username = session.get('username', 'User')
+    current_date = datetime.datetime.now().strftime("%Y%m%d")
+    suffix = f"{book_name}{list_name}"
+    filename = f"{username}-{current_date}当日错词考核纸" + (f"-{suffix}" if suffix else "") + ".pdf"
+    title = f"{username} - {current_date}当日错词考核纸"
+    if book_name or list_name:
+        title += f" - {' '.join(name for name in (book_name, list_name) if name)}"
+
+    spec = {'errors': errors, 'fields': selected_fields, 'hide_word': hide_word, 'title': title}
+    cache_key = pdf_cache.cache_key(spec)
+    cached_path = pdf_cache.cache.lookup(cache_key)
+    if cached_path:
+        try:
+            response = send_file(cached_path, mimetype='application/pdf', as_attachment=True, download_name=filename)
+            response.headers['X-PDF-Cache'] = 'hit'
+            app.logger.info(f"PDF导出命中缓存: {cache_key[:16]}")
+            return response
+        except FileNotFoundError:
+            pass  # 刚被淘汰，重新生成
+    try:
+        job = pdf_jobs.manager.submit(student_id, spec, filename, cache_key=cache_key)
+    except pdf_jobs.PDFJobLimitError as e:
+        app.logger.warning(f"拒绝PDF导出请求: {e}")
+        response = jsonify({'error': '已有导出任务正在进行，请稍后再试'})
+        response.status_code = 429
+        response.headers['Retry-After'] = '5'
+        return response
     except Exception as e:
-        app.logger.error(f"导出PDF时出错: {e}")
+        app.logger.error(f"提交PDF导出任务时出错: {e}")
         return jsonify({'error': f'导出PDF失败: {str(e)}'}), 500
+    return _pdf_job_response(pdf_jobs.manager.wait(job['job_id'], wait))
+
+@app.route('/api/export-pdf/<job_id>')
+def get_pdf_job(job_id):
+    """查询导出任务的状态、排队和渲染耗时"""
+    job = _get_own_pdf_job(job_id)
+    if job is None:
+        return jsonify({'error': '导出任务不存在'}), 404
+    return jsonify(_pdf_job_info(job))
+
+@app.route('/api/export-pdf/<job_id>/download')
+def download_pdf_job(job_id):
+    """下载导出任务生成的PDF（批量任务为zip），任务仍在进行时返回202"""
+    job = _get_own_pdf_job(job_id)
+    if job is None:
+        return jsonify({'error': '导出任务不存在'}), 404
+    return _pdf_job_response(job)
 
 # --- 提供JS修复脚本 ---
 @app.route('/fix_mess_display_new.js')
@@ -1313,41 +1121,26 @@ def favicon():
 def add_to_verification_pool(student_id, word_id, claimed_grade):
     """将高评分单词添加到验证池"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 创建验证池表（如果不存在）
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS SRSVerificationPool (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id INTEGER NOT NULL,
-                word_id INTEGER NOT NULL,
-                claimed_grade INTEGER NOT NULL,
-                added_date DATE DEFAULT (date('now')),
-                verification_date DATE,
-                verification_result TEXT,
-                FOREIGN KEY (student_id) REFERENCES Users (id),
-                FOREIGN KEY (word_id) REFERENCES Words (word_id)
-            )
-        """)
-        
-        # 检查是否已在验证池中
-        cursor.execute("""
-            SELECT id FROM SRSVerificationPool 
-            WHERE student_id = ? AND word_id = ? AND verification_date IS NULL
-        """, (student_id, word_id))
-        
-        if not cursor.fetchone():
-            # 添加到验证池
+        def _add(conn):
+            cursor = conn.cursor()
+
+            # 检查是否已在验证池中（SRSVerificationPool表由migrations.py创建）
             cursor.execute("""
-                INSERT INTO SRSVerificationPool (student_id, word_id, claimed_grade)
-                VALUES (?, ?, ?)
-            """, (student_id, word_id, claimed_grade))
-            
-            app.logger.info(f"单词添加到验证池: student_id={student_id}, word_id={word_id}, claimed_grade={claimed_grade}")
+                SELECT id FROM SRSVerificationPool 
+                WHERE student_id = ? AND word_id = ? AND verification_date IS NULL
+            """, (student_id, word_id))
         
-        conn.commit()
-        conn.close()
+            if not cursor.fetchone():
+                # 添加到验证池
+                cursor.execute("""
+                    INSERT INTO SRSVerificationPool (student_id, word_id, claimed_grade)
+                    VALUES (?, ?, ?)
+                """, (student_id, word_id, claimed_grade))
+            
+                app.logger.info(f"单词添加到验证池: student_id={student_id}, word_id={word_id}, claimed_grade={claimed_grade}")
+
+        # 经由串行化写入通道提交
+        db.run_write(_add)
         
     except Exception as e:
         app.logger.error(f"添加验证池失败: {e}")
@@ -1369,7 +1162,6 @@ def get_verification_candidates(student_id, limit=5):
         """, (student_id, limit))
         
         candidates = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return candidates
         
@@ -1380,28 +1172,28 @@ def get_verification_candidates(student_id, limit=5):
 def record_verification_result(student_id, word_id, verification_result, actual_grade=None):
     """记录验证结果"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        def _record(conn):
+            cursor = conn.cursor()
         
-        # 更新验证结果
-        cursor.execute("""
-            UPDATE SRSVerificationPool 
-            SET verification_date = date('now'), verification_result = ?
-            WHERE student_id = ? AND word_id = ? AND verification_date IS NULL
-        """, (verification_result, student_id, word_id))
-        
-        # 如果验证失败，重置SRS进度
-        if verification_result == 'failed' and actual_grade is not None:
+            # 更新验证结果
             cursor.execute("""
-                UPDATE StudentWordProgress 
-                SET repetitions = 0, interval = 1, next_review_date = date('now')
-                WHERE student_id = ? AND word_id = ?
-            """, (student_id, word_id))
+                UPDATE SRSVerificationPool 
+                SET verification_date = date('now'), verification_result = ?
+                WHERE student_id = ? AND word_id = ? AND verification_date IS NULL
+            """, (verification_result, student_id, word_id))
+        
+            # 如果验证失败，重置SRS进度
+            if verification_result == 'failed' and actual_grade is not None:
+                cursor.execute("""
+                    UPDATE StudentWordProgress 
+                    SET repetitions = 0, interval = 1, next_review_date = date('now')
+                    WHERE student_id = ? AND word_id = ?
+                """, (student_id, word_id))
             
-            app.logger.info(f"验证失败，重置SRS进度: student_id={student_id}, word_id={word_id}")
-        
-        conn.commit()
-        conn.close()
+                app.logger.info(f"验证失败，重置SRS进度: student_id={student_id}, word_id={word_id}")
+
+        # 经由串行化写入通道提交
+        db.run_write(_record)
         
     except Exception as e:
         app.logger.error(f"记录验证结果失败: {e}")
@@ -1446,7 +1238,6 @@ def get_srs_progress():
         
         recent_words = [dict(row) for row in cursor.fetchall()]
         
-        conn.close()
         
         return jsonify({
             'stats': {
@@ -1485,22 +1276,15 @@ def get_due_words():
             base_where += " AND w.list_id = ?"
             params.append(list_id)
         
-        # 策略1：优先获取错词（在ErrorLogs中有记录的单词）
+        # 策略1：优先获取错词（错误汇总表中有记录的单词）
         cursor.execute(f"""
-            SELECT w.word_id, w.spelling, w.meaning_cn, w.pos, w.audio_path_uk, w.audio_path_us,
-                   w.derivatives, w.root_etymology, w.mnemonic, w.comparison, w.collocation,
-                   w.exam_sentence, w.exam_year_source, w.exam_options, w.exam_explanation, w.tips,
-                   p.repetitions, p.interval, p.next_review_date,
-                   wl.list_name, b.book_name,
-                   (SELECT COUNT(*) FROM ErrorLogs e WHERE e.word_id = w.word_id AND e.student_id = p.student_id) as error_count,
-                   (SELECT MAX(error_date) FROM ErrorLogs e WHERE e.word_id = w.word_id AND e.student_id = p.student_id) as last_error_date
+            SELECT w.word_id, p.repetitions, p.interval, p.next_review_date,
+                   s.error_count, s.last_error_date
             FROM StudentWordProgress p
             JOIN Words w ON p.word_id = w.word_id
-            LEFT JOIN WordLists wl ON w.list_id = wl.list_id
-            LEFT JOIN Books b ON wl.book_id = b.book_id
+            JOIN StudentWordErrorStats s ON s.student_id = p.student_id AND s.word_id = p.word_id
             WHERE {base_where}
-            AND EXISTS (SELECT 1 FROM ErrorLogs e WHERE e.word_id = w.word_id AND e.student_id = p.student_id)
-            ORDER BY error_count DESC, last_error_date DESC, p.next_review_date ASC
+            ORDER BY s.error_count DESC, s.last_error_date DESC, p.next_review_date ASC
             LIMIT ?
         """, params + [limit])
         
@@ -1517,17 +1301,11 @@ def get_due_words():
                 params.extend(error_word_ids)
             
             cursor.execute(f"""
-                SELECT w.word_id, w.spelling, w.meaning_cn, w.pos, w.audio_path_uk, w.audio_path_us,
-                       w.derivatives, w.root_etymology, w.mnemonic, w.comparison, w.collocation,
-                       w.exam_sentence, w.exam_year_source, w.exam_options, w.exam_explanation, w.tips,
-                       p.repetitions, p.interval, p.next_review_date,
-                       wl.list_name, b.book_name,
+                SELECT w.word_id, p.repetitions, p.interval, p.next_review_date,
                        0 as error_count,
                        NULL as last_error_date
                 FROM StudentWordProgress p
                 JOIN Words w ON p.word_id = w.word_id
-                LEFT JOIN WordLists wl ON w.list_id = wl.list_id
-                LEFT JOIN Books b ON wl.book_id = b.book_id
                 WHERE {base_where}
                 AND p.next_review_date <= date('now')
                 {exclude_clause}
@@ -1539,11 +1317,17 @@ def get_due_words():
         else:
             due_words = error_words
         
-        conn.close()
-        
         app.logger.info(f"SRS复习单词获取: 用户ID={student_id}, 错词数={len(error_words)}, 总单词数={len(due_words)}")
         
-        return jsonify({'due_words': due_words})
+        # 单词内容来自缓存，只追加学生相关的SRS进度和错误统计
+        progress_by_id = {row['word_id']: row for row in due_words}
+        words = word_cache.get_many(conn, list(progress_by_id))
+        items = [word.to_json('srs', {
+            key: progress_by_id[word.word_id][key]
+            for key in ('repetitions', 'interval', 'next_review_date', 'error_count', 'last_error_date')
+        }) for word in words]
+        
+        return app.response_class('{"due_words":' + json_array(items) + '}', mimetype='application/json')
         
     except Exception as e:
         app.logger.error(f"获取待复习单词时出错: {e}")
@@ -1585,61 +1369,65 @@ def update_srs_progress():
         cursor.execute("SELECT word_id FROM Words WHERE word_id = ?", (word_id,))
         if not cursor.fetchone():
             app.logger.error(f"单词不存在: word_id={word_id}")
-            conn.close()
             return jsonify({'error': '单词不存在'}), 404
         
-        # 获取当前进度
-        cursor.execute("""
-            SELECT repetitions, interval FROM StudentWordProgress 
-            WHERE student_id = ? AND word_id = ?
-        """, (student_id, word_id))
-        
-        progress = cursor.fetchone()
-        
-        if not progress:
-            # 创建新进度记录
-            repetitions = 0
-            interval = 1
-            app.logger.info(f"创建新的SRS进度记录: student_id={student_id}, word_id={word_id}")
-        else:
-            repetitions = progress[0] or 0
-            interval = progress[1] or 1
-            app.logger.info(f"更新现有SRS进度: student_id={student_id}, word_id={word_id}, 当前repetitions={repetitions}, interval={interval}")
+        def _update(conn):
+            # 读取-计算-写入放在同一个写事务中，避免并发请求互相覆盖进度
+            cursor = conn.cursor()
+
+            # 获取当前进度
+            cursor.execute("""
+                SELECT repetitions, interval FROM StudentWordProgress 
+                WHERE student_id = ? AND word_id = ?
+            """, (student_id, word_id))
         
-        # 根据评分更新间隔（简化的SuperMemo算法）
-        old_repetitions = repetitions
-        old_interval = interval
+            progress = cursor.fetchone()
         
-        if grade >= 3:  # 记得
-            repetitions += 1
-            if repetitions == 1:
+            if not progress:
+                # 创建新进度记录
+                repetitions = 0
                 interval = 1
-            elif repetitions == 2:
-                interval = 6
+                app.logger.info(f"创建新的SRS进度记录: student_id={student_id}, word_id={word_id}")
             else:
-                interval = int(interval * 2.5)
-        else:  # 不记得
-            repetitions = 0
-            interval = 1
-        
-        # 限制最大间隔
-        interval = min(interval, 365)
+                repetitions = progress[0] or 0
+                interval = progress[1] or 1
+                app.logger.info(f"更新现有SRS进度: student_id={student_id}, word_id={word_id}, 当前repetitions={repetitions}, interval={interval}")
+        
+            # 根据评分更新间隔（简化的SuperMemo算法）
+            old_repetitions = repetitions
+            old_interval = interval
+        
+            if grade >= 3:  # 记得
+                repetitions += 1
+                if repetitions == 1:
+                    interval = 1
+                elif repetitions == 2:
+                    interval = 6
+                else:
+                    interval = int(interval * 2.5)
+            else:  # 不记得
+                repetitions = 0
+                interval = 1
         
-        # 计算下次复习日期
-        from datetime import datetime, timedelta
-        next_review_date = (datetime.now() + timedelta(days=interval)).strftime('%Y-%m-%d')
+            # 限制最大间隔
+            interval = min(interval, 365)
         
-        app.logger.info(f"SRS算法更新: grade={grade}, repetitions: {old_repetitions}->{repetitions}, interval: {old_interval}->{interval}, next_review={next_review_date}")
+            # 计算下次复习日期
+            from datetime import datetime, timedelta
+            next_review_date = (datetime.now() + timedelta(days=interval)).strftime('%Y-%m-%d')
         
-        # 更新或插入进度
-        cursor.execute("""
-            INSERT OR REPLACE INTO StudentWordProgress 
-            (student_id, word_id, repetitions, interval, next_review_date)
-            VALUES (?, ?, ?, ?, ?)
-        """, (student_id, word_id, repetitions, interval, next_review_date))
+            app.logger.info(f"SRS算法更新: grade={grade}, repetitions: {old_repetitions}->{repetitions}, interval: {old_interval}->{interval}, next_review={next_review_date}")
         
-        conn.commit()
-        conn.close()
+            # 更新或插入进度
+            cursor.execute("""
+                INSERT OR REPLACE INTO StudentWordProgress 
+                (student_id, word_id, repetitions, interval, next_review_date)
+                VALUES (?, ?, ?, ?, ?)
+            """, (student_id, word_id, repetitions, interval, next_review_date))
+
+            return repetitions, interval, next_review_date
+
+        repetitions, interval, next_review_date = db.run_write(_update)
         
         # 方案A: 抽查校准机制 - 如果学生评为高分数，添加到验证池
         if grade >= 4:  # 评为4-5分的单词需要验证
@@ -1718,7 +1506,6 @@ def get_mastery_stats():
         
         weekly_stats = [dict(row) for row in cursor.fetchall()]
         
-        conn.close()
         
         return jsonify({
             'mastery_distribution': mastery_distribution,
@@ -1777,38 +1564,22 @@ def submit_verification():
             return jsonify({'error': '缺少单词ID'}), 400
         
         conn = get_db_connection()
-        cursor = conn.cursor()
         
-        # 获取正确拼写
-        cursor.execute("SELECT spelling FROM Words WHERE word_id = ?", (word_id,))
-        word = cursor.fetchone()
+        # 获取正确拼写及可接受的拼写变体
+        word_answers = answer_index.get(conn, word_id)
         
-        if not word:
-            conn.close()
+        if not word_answers:
             return jsonify({'error': '单词不存在'}), 404
         
-        correct_spelling = word['spelling']
-        valid_spellings = [s.strip().lower() for s in correct_spelling.split('/')]
-        
-        # 处理逗号分隔的拼写变体
-        expanded_spellings = []
-        for spelling in valid_spellings:
-            if ',' in spelling:
-                comma_variants = [v.strip().lower() for v in spelling.split(',')]
-                expanded_spellings.extend(comma_variants)
-            else:
-                expanded_spellings.append(spelling)
-        
-        valid_spellings = expanded_spellings
+        correct_spelling = word_answers.spelling
         
         # 判断答案是否正确
-        is_correct = user_answer.lower() in valid_spellings
+        is_correct = word_answers.check(user_answer)
         
         # 记录验证结果
         verification_result = 'passed' if is_correct else 'failed'
         record_verification_result(student_id, word_id, verification_result)
         
-        conn.close()
         
         app.logger.info(f"验证测试结果: student_id={student_id}, word_id={word_id}, result={verification_result}")
         
@@ -1860,7 +1631,6 @@ def get_verification_stats():
         
         recent_verifications = [dict(row) for row in cursor.fetchall()]
         
-        conn.close()
         
         return jsonify({
             'stats': {
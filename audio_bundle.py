@@ -0,0 +1,110 @@
+"""
+音频包 - 把一次测验（或整个单词列表）用到的音频打包成一个文件，前端一次请求即可预加载
+
+题目中的音频地址有两种：词库媒体文件（/wordlists/...，有压缩版本时为压缩版本）和TTS地址（/api/tts/...）。
+音频包按地址收集这些文件（TTS只包含已经缓存的音频，不在这里触发合成），格式为：
+
+    b'VTAB' | 索引长度（4字节大端整数） | 索引JSON | 各音频文件内容
+
+索引为 {"version": 1, "files": [{"url", "type", "offset", "length"}, ...]}，offset相对于索引之后的数据区。
+前端按题目中的音频地址查找，用 Blob.slice 取出对应片段播放，包中没有的地址仍单独请求。
+
+整个列表的音频包按内容摘要缓存在 wordlists/bundles/ 下，由 media_delivery 发送（支持代理模式），
+浏览器用ETag重新验证；测验的音频包按 word_ids 在内存中生成。
+"""
+import glob
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import struct
+
+from werkzeug.security import safe_join
+
+import audio_manifest
+import config
+import tts_service
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'VTAB'
+BUNDLE_VERSION = 1
+_TTS_PREFIX = '/api/tts/'
+
+
+def _source(url):
+    """音频地址 → (文件路径, ETag)，没有对应文件时返回None"""
+    media_prefix = audio_manifest.manifest.url_prefix + '/'
+    if url.startswith(media_prefix):
+        rel = url[len(media_prefix):]
+        path = safe_join(config.WORDLISTS_DIR, rel)
+        info = audio_manifest.manifest.info(rel)
+        if path is None or info is None:
+            return None
+        return path, info['md5']
+    if url.startswith(_TTS_PREFIX):
+        key = tts_service.cache_key(url[len(_TTS_PREFIX):])
+        path = tts_service.service.cache.lookup(key, record=False)
+        return (path, key) if path else None
+    return None
+
+
+def collect(payloads):
+    """收集单词的音频文件，返回 [(url, 文件路径, ETag)]（按出现顺序去重）"""
+    sources = {}
+    for payload in payloads:
+        for url in payload.audio.values():
+            if url and url not in sources:
+                sources[url] = _source(url)
+    return [(url,) + source for url, source in sources.items() if source is not None]
+
+
+def digest(sources):
+    """音频包的内容摘要，用作ETag和缓存文件名"""
+    h = hashlib.md5(f"v{BUNDLE_VERSION}".encode())
+    for url, _, etag in sources:
+        h.update(f"{url}\0{etag}\n".encode())
+    return h.hexdigest()
+
+
+def build(sources):
+    """读取各音频文件生成音频包内容；读取时已被删除的文件（如被淘汰的TTS缓存）跳过"""
+    files = []
+    chunks = []
+    offset = 0
+    for url, path, _ in sources:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            continue
+        files.append({'url': url, 'type': mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                      'offset': offset, 'length': len(data)})
+        chunks.append(data)
+        offset += len(data)
+    index = json.dumps({'version': BUNDLE_VERSION, 'files': files}, ensure_ascii=False,
+                       separators=(',', ':')).encode()
+    return b''.join([MAGIC, struct.pack('>I', len(index)), index] + chunks)
+
+
+def list_bundle(list_id, payloads):
+    """返回整个列表的音频包文件路径和摘要，内容变化时重新生成并删除旧文件"""
+    sources = collect(payloads)
+    bundle_digest = digest(sources)
+    path = os.path.join(config.AUDIO_BUNDLE_DIR, f"list_{list_id}_{bundle_digest[:16]}.vtab")
+    if not os.path.exists(path):
+        os.makedirs(config.AUDIO_BUNDLE_DIR, exist_ok=True)
+        data = build(sources)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        for old in glob.glob(os.path.join(config.AUDIO_BUNDLE_DIR, f"list_{list_id}_*.vtab")):
+            if old != path:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+        logger.info(f"已生成列表 {list_id} 的音频包: {len(sources)} 个文件, {len(data) / 1024:.0f}KB")
+    return path, bundle_digest
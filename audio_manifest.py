@@ -0,0 +1,392 @@
+"""
+音频清单 - 记录词库媒体目录中实际存在的音频文件（路径、大小、md5、时长），生成一次，按需增量更新
+
+Words.audio_path_uk/us 只是文件名，文件是否真的存在以前只能靠 scripts/audio 下的检查脚本。
+应用启动时加载清单，生成题目时据此决定返回媒体文件地址还是TTS地址，
+浏览器不再请求不存在的音频文件。清单文件被重新生成后各Worker进程会自动重新加载；
+媒体目录有文件增删（目录修改时间变化）时，后台线程增量重建清单（未变化的文件沿用原来的md5和时长）。
+还没有清单文件时保持原来的行为，认为所有音频都存在。
+
+audio_transcode.py 生成压缩音频后，同时加载它的清单（compact/manifest.json），
+原文件有对应的压缩版本（且原文件md5未变化）时返回压缩版本的地址。
+
+    python audio_manifest.py build    # 生成/增量更新清单
+    python audio_manifest.py check    # 列出数据库中引用了但不存在的音频文件
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import wave
+
+try:
+    import fcntl
+except ImportError:  # Windows本地开发环境没有fcntl
+    fcntl = None
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_AUDIO_EXTENSIONS = ('.mp3', '.wav')
+# 清单文件格式版本（压缩音频清单使用同样的格式）
+MANIFEST_VERSION = 1
+
+# MPEG音频帧头中的比特率表（kbps）和采样率表，用于估算MP3时长
+_MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),  # MPEG-1 Layer III
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),      # MPEG-2/2.5 Layer III
+}
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mp3_duration(data):
+    """根据第一个MPEG帧（及Xing/Info头）估算时长（秒），无法解析时返回None"""
+    offset = 0
+    if data[:3] == b'ID3' and len(data) >= 10:
+        offset = 10 + ((data[6] & 0x7f) << 21 | (data[7] & 0x7f) << 14 | (data[8] & 0x7f) << 7 | (data[9] & 0x7f))
+    while offset + 4 <= len(data):
+        if data[offset] == 0xFF and data[offset + 1] & 0xE0 == 0xE0:
+            header = data[offset:offset + 4]
+            version = (header[1] >> 3) & 3
+            layer = (header[1] >> 1) & 3
+            bitrate_index = header[2] >> 4
+            rate_index = (header[2] >> 2) & 3
+            if version != 1 and layer == 1 and 0 < bitrate_index < 15 and rate_index < 3:
+                break
+        offset += 1
+    else:
+        return None
+
+    mpeg1 = version == 3
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    bitrate = _MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    samples_per_frame = 1152 if mpeg1 else 576
+    mono = header[3] >> 6 == 3
+    # VBR文件在第一帧的side info之后带有Xing/Info头，记录总帧数
+    xing = offset + 4 + ((17 if mono else 32) if mpeg1 else (9 if mono else 17))
+    if data[xing:xing + 4] in (b'Xing', b'Info') and len(data) >= xing + 12:
+        flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+        if flags & 1:
+            frames = struct.unpack('>I', data[xing + 8:xing + 12])[0]
+            return frames * samples_per_frame / sample_rate
+    return (len(data) - offset) * 8 / bitrate
+
+
+def audio_duration(path, data):
+    """返回音频时长（秒，保留3位小数），无法解析时返回None"""
+    try:
+        if path.endswith('.wav'):
+            with wave.open(path, 'rb') as audio:
+                duration = audio.getnframes() / audio.getframerate()
+        else:
+            duration = _mp3_duration(data)
+    except (wave.Error, EOFError, ZeroDivisionError, struct.error):
+        return None
+    return round(duration, 3) if duration is not None else None
+
+
+def _root_mtimes(base_dir, roots):
+    mtimes = {}
+    for root in roots:
+        try:
+            mtimes[root] = os.stat(os.path.join(base_dir, root)).st_mtime_ns
+        except FileNotFoundError:
+            mtimes[root] = None
+    return mtimes
+
+
+def build_manifest(base_dir, roots, previous=None):
+    """扫描媒体目录生成清单；previous中大小和修改时间未变的文件沿用原来的md5和时长"""
+    old_files = (previous or {}).get('files', {})
+    roots_mtime = _root_mtimes(base_dir, roots)
+    files = {}
+    hashed = 0
+    for root in roots:
+        root_dir = os.path.join(base_dir, root)
+        if not os.path.isdir(root_dir):
+            continue
+        for dirpath, _, filenames in os.walk(root_dir):
+            for name in filenames:
+                if not name.lower().endswith(_AUDIO_EXTENSIONS):
+                    continue
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, base_dir).replace(os.sep, '/')
+                stat = os.stat(path)
+                old = old_files.get(rel)
+                if old and old['size'] == stat.st_size and old['mtime'] == stat.st_mtime_ns:
+                    files[rel] = old
+                    continue
+                with open(path, 'rb') as f:
+                    data = f.read()
+                files[rel] = {
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime_ns,
+                    'md5': hashlib.md5(data).hexdigest(),
+                    'duration': audio_duration(path, data),
+                }
+                hashed += 1
+    logger.info(f"音频清单: {len(files)} 个文件，重新计算 {hashed} 个")
+    return {
+        'version': MANIFEST_VERSION,
+        'generated_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'roots': roots_mtime,
+        'files': files,
+    }
+
+
+def write_manifest(path, manifest):
+    """先写临时文件再原子替换，读取方不会读到写了一半的清单"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def read_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        logger.warning(f"音频清单格式版本不匹配，需要重新生成: {path}")
+        return None
+    return manifest
+
+
+def media_dir(book_name):
+    """根据词书类型选择媒体目录（相对于词库目录）"""
+    if book_name and '高中' in book_name:
+        return 'senior_high/media'
+    return 'junior_high/media'
+
+
+class AudioManifest:
+    """按Worker进程加载的音频清单"""
+
+    def __init__(self, base_dir, path, roots, check_interval=30.0, url_prefix='/wordlists', compact_path=None):
+        self.base_dir = base_dir
+        self.path = path
+        self.roots = list(roots)
+        self.compact_path = compact_path
+        self.check_interval = check_interval
+        self.url_prefix = url_prefix
+
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._file_mtime = None
+        # 压缩音频：原文件路径 → 条目，压缩文件路径 → 条目
+        self._compact = {}
+        self._compact_by_path = {}
+        self._compact_mtime = None
+        self._last_check = 0.0
+        self._pid = None
+        self._rebuilding = False
+        # 每次重新加载加一，供单词缓存判断音频地址是否需要重新计算
+        self.version = 0
+        self._metrics = {'loads': 0, 'rebuilds': 0, 'rebuild_failures': 0, 'missing_lookups': 0}
+
+    # --- 加载 ---
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns if path else None
+        except FileNotFoundError:
+            return None
+
+    def _load_compact(self, manifest):
+        """读取压缩音频清单，只保留原文件md5与音频清单一致的条目"""
+        compact = read_manifest(self.compact_path) if self.compact_path else None
+        if compact is None:
+            return {}
+        files = manifest['files'] if manifest is not None else None
+        by_source = {}
+        for rel, entry in compact['files'].items():
+            source = files.get(rel) if files is not None else None
+            if files is None or (source is not None and source['md5'] == entry['source_md5']):
+                by_source[rel] = entry
+        return by_source
+
+    def load(self):
+        """读取清单文件（不存在时保持未加载状态），返回是否已加载"""
+        mtime = self._mtime(self.path)
+        compact_mtime = self._mtime(self.compact_path)
+        manifest = read_manifest(self.path) if mtime is not None else None
+        compact = self._load_compact(manifest) if compact_mtime is not None else {}
+        with self._lock:
+            self._file_mtime = mtime
+            self._compact_mtime = compact_mtime
+            self._last_check = time.monotonic()
+            if manifest is not None or self._manifest is not None or compact or self._compact:
+                self._manifest = manifest
+                self._compact = compact
+                self._compact_by_path = {entry['path']: entry for entry in compact.values()}
+                self.version += 1
+                self._metrics['loads'] += 1
+        if manifest is None:
+            logger.warning(f"没有可用的音频清单，暂时认为所有音频文件都存在: {self.path}")
+        return manifest is not None
+
+    def check(self):
+        """每隔 check_interval 秒检查清单文件和媒体目录是否变化，返回当前版本号"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return self.version
+            self._last_check = now
+            file_mtime = self._file_mtime
+            compact_mtime = self._compact_mtime
+            manifest = self._manifest
+        if self._mtime(self.path) != file_mtime or self._mtime(self.compact_path) != compact_mtime:
+            self.load()
+        elif manifest is None or manifest['roots'] != _root_mtimes(self.base_dir, self.roots):
+            self._start_rebuild()
+        return self.version
+
+    # --- 重建 ---
+    def rebuild(self):
+        """增量重建清单文件并重新加载；其他进程正在重建时直接返回False"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            with self._lock:
+                previous = self._manifest
+            manifest = build_manifest(self.base_dir, self.roots, previous or read_manifest(self.path))
+            write_manifest(self.path, manifest)
+        with self._lock:
+            self._metrics['rebuilds'] += 1
+        self.load()
+        return True
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            with self._lock:
+                self._metrics['rebuild_failures'] += 1
+            logger.error(f"重建音频清单失败: {e}")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def _start_rebuild(self):
+        with self._lock:
+            if self._rebuilding and self._pid == os.getpid():
+                return
+            self._rebuilding = True
+            self._pid = os.getpid()
+        threading.Thread(target=self._rebuild_in_background, name='audio-manifest-rebuild', daemon=True).start()
+
+    # --- 查询 ---
+    def exists(self, rel):
+        """rel为相对于词库目录的路径；还没有清单时返回True"""
+        with self._lock:
+            manifest = self._manifest
+        if manifest is None:
+            return True
+        found = rel in manifest['files']
+        if not found:
+            with self._lock:
+                self._metrics['missing_lookups'] += 1
+        return found
+
+    def relative_path(self, book_name, audio_path):
+        """把Words中的音频路径转换为相对于词库目录的路径"""
+        if not audio_path:
+            return None
+        prefix = self.url_prefix + '/'
+        if audio_path.startswith(prefix):
+            return audio_path[len(prefix):]
+        return f"{media_dir(book_name)}/{audio_path}"
+
+    def resolve(self, book_name, audio_path):
+        """返回音频文件的URL（有压缩版本时返回压缩版本），文件不存在时返回None（由调用方改用TTS）"""
+        rel = self.relative_path(book_name, audio_path)
+        if rel is None or not self.exists(rel):
+            return None
+        with self._lock:
+            compact = self._compact.get(rel)
+        if compact is not None:
+            return f"{self.url_prefix}/{compact['path']}"
+        return f"{self.url_prefix}/{rel}"
+
+    def info(self, rel):
+        """返回文件的 {size, md5, duration, ...}（也包括压缩音频），不在清单中时返回None"""
+        with self._lock:
+            manifest = self._manifest
+            compact = self._compact_by_path.get(rel)
+        if compact is not None:
+            return compact
+        return manifest['files'].get(rel) if manifest is not None else None
+
+    # --- 指标 ---
+    def stats(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            manifest = self._manifest
+            metrics['rebuilding'] = self._rebuilding
+            metrics['compact_files'] = len(self._compact)
+        metrics['loaded'] = manifest is not None
+        metrics['files'] = len(manifest['files']) if manifest is not None else 0
+        metrics['generated_at'] = manifest['generated_at'] if manifest is not None else None
+        metrics['version'] = self.version
+        return metrics
+
+
+manifest = AudioManifest(config.WORDLISTS_DIR, config.AUDIO_MANIFEST_PATH, config.AUDIO_MEDIA_ROOTS,
+                         compact_path=config.AUDIO_COMPACT_MANIFEST_PATH if config.AUDIO_COMPACT_ENABLED else None)
+
+
+# --- 命令行入口 ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='词库音频清单')
+    parser.add_argument('command', choices=['build', 'check'], help='要执行的操作')
+    parser.add_argument('--database', default=config.DATABASE_PATH, help='数据库文件路径')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.command == 'build':
+        start = time.perf_counter()
+        manifest.load()
+        manifest.rebuild()
+        print(f"已生成音频清单: {manifest.stats()['files']} 个文件，耗时 {time.perf_counter() - start:.1f}秒 -> {manifest.path}")
+        return 0
+
+    if not manifest.load():
+        print("请先执行 python audio_manifest.py build")
+        return 1
+    conn = sqlite3.connect(args.database)
+    try:
+        rows = conn.execute("""
+            SELECT w.word_id, w.spelling, w.audio_path_uk, w.audio_path_us, b.book_name
+            FROM Words w
+            LEFT JOIN WordLists wl ON w.list_id = wl.list_id
+            LEFT JOIN Books b ON wl.book_id = b.book_id
+        """).fetchall()
+    finally:
+        conn.close()
+    missing = 0
+    for word_id, spelling, audio_uk, audio_us, book_name in rows:
+        for audio_path in (audio_uk, audio_us):
+            rel = manifest.relative_path(book_name, audio_path)
+            if rel is not None and not manifest.exists(rel):
+                missing += 1
+                print(f"  缺少音频: word_id={word_id} {spelling}: {rel}")
+    print(f"共 {len(rows)} 个单词，缺少 {missing} 个音频文件")
+    return 1 if missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
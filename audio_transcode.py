@@ -0,0 +1,253 @@
+"""
+音频转码 - 把词库媒体目录中的录音统一转成体积小的压缩版本
+
+wordlists/*/media 中的录音来自Anki、剑桥词典等不同来源，码率、声道、音量和首尾静音长度都不一致。
+这里用pydub（mp3需要ffmpeg）把它们统一转成单声道、低码率的短音频：去掉首尾静音，
+按平均响度归一化（同时保证峰值不超过-1dBFS），写到 wordlists/compact/ 下与原目录相同结构的位置，
+并生成 compact/manifest.json。audio_manifest 加载这份清单后，题目中的音频地址自动改为压缩版本。
+
+只转码新增或内容变化（md5不同）的文件，转码参数变化时全部重新转码，中断后重新执行即可继续；
+原文件已删除的压缩文件会一并清理。
+
+    python audio_transcode.py build              # 增量转码
+    python audio_transcode.py build --force      # 全部重新转码
+    python audio_transcode.py build --workers 4  # 指定并行进程数
+    python audio_transcode.py stats              # 对比原文件和压缩文件的大小
+"""
+import argparse
+import concurrent.futures
+import datetime
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import time
+
+import audio_manifest
+import config
+
+logger = logging.getLogger(__name__)
+
+# 归一化后的峰值上限（dBFS），避免削波
+_PEAK_CEILING_DBFS = -1.0
+# 转码过程中每隔多少秒写一次清单，中断后已完成的文件不必重新转码
+_CHECKPOINT_INTERVAL = 30.0
+
+
+def default_settings():
+    """当前配置的转码参数，记录在清单中，参数变化时需要全部重新转码"""
+    return {
+        'format': config.AUDIO_COMPACT_FORMAT,
+        'bitrate': config.AUDIO_COMPACT_BITRATE,
+        'sample_rate': config.AUDIO_COMPACT_SAMPLE_RATE,
+        'target_dbfs': config.AUDIO_COMPACT_TARGET_DBFS,
+        'silence_dbfs': config.AUDIO_COMPACT_SILENCE_DBFS,
+        'padding_ms': config.AUDIO_COMPACT_PADDING_MS,
+    }
+
+
+def compact_rel(rel, settings):
+    """原文件路径 → 压缩文件路径（都相对于词库目录）"""
+    return f"{config.AUDIO_COMPACT_DIR}/{os.path.splitext(rel)[0]}.{settings['format']}"
+
+
+# --- 音频处理 ---
+def trim_silence(segment, silence_dbfs, padding_ms):
+    """去掉首尾静音，两端各保留padding_ms毫秒；整段都是静音时原样返回"""
+    from pydub.silence import detect_leading_silence
+
+    start = detect_leading_silence(segment, silence_threshold=silence_dbfs)
+    end = len(segment) - detect_leading_silence(segment.reverse(), silence_threshold=silence_dbfs)
+    if end <= start:
+        return segment
+    return segment[max(0, start - padding_ms):min(len(segment), end + padding_ms)]
+
+
+def normalize(segment, target_dbfs):
+    """调整到目标平均响度，增益受峰值上限约束"""
+    if segment.dBFS == float('-inf'):
+        return segment
+    return segment.apply_gain(min(target_dbfs - segment.dBFS, _PEAK_CEILING_DBFS - segment.max_dBFS))
+
+
+def transcode_file(src, dst, settings):
+    """转码单个文件，返回 {size, md5, duration}"""
+    from pydub import AudioSegment
+
+    segment = AudioSegment.from_file(src)
+    segment = segment.set_channels(1).set_frame_rate(settings['sample_rate']).set_sample_width(2)
+    segment = trim_silence(segment, settings['silence_dbfs'], settings['padding_ms'])
+    segment = normalize(segment, settings['target_dbfs'])
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp_path = f"{dst}.{os.getpid()}.tmp"
+    try:
+        if settings['format'] == 'wav':
+            segment.export(tmp_path, format='wav')
+        else:
+            segment.export(tmp_path, format=settings['format'], bitrate=settings['bitrate'])
+        os.replace(tmp_path, dst)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    with open(dst, 'rb') as f:
+        data = f.read()
+    return {'size': len(data), 'md5': hashlib.md5(data).hexdigest(), 'duration': round(len(segment) / 1000, 3)}
+
+
+def _transcode_job(job):
+    """在进程池中执行，返回 (原文件路径, 结果, 错误信息)"""
+    rel, src, dst, settings = job
+    try:
+        return rel, transcode_file(src, dst, settings), None
+    except Exception as e:
+        # ffmpeg解码失败时异常信息包含完整的stderr，只保留开头
+        return rel, None, f"{type(e).__name__}: {str(e)[:200]}"
+
+
+def _check_converter(jobs, settings):
+    """除wav以外的格式都需要ffmpeg"""
+    needs_ffmpeg = settings['format'] != 'wav' or any(not rel.lower().endswith('.wav') for rel, *_ in jobs)
+    if not needs_ffmpeg:
+        return
+    from pydub import AudioSegment
+    if shutil.which(AudioSegment.converter) is None:
+        raise RuntimeError(f"找不到ffmpeg（{AudioSegment.converter}），请先安装: sudo apt install ffmpeg")
+
+
+# --- 批量转码 ---
+def _remove_output(base_dir, rel):
+    try:
+        os.remove(os.path.join(base_dir, rel))
+    except FileNotFoundError:
+        pass
+
+
+def build(workers=None, force=False):
+    """增量转码所有媒体文件并写入压缩音频清单，返回统计结果"""
+    base_dir = config.WORDLISTS_DIR
+    manifest_path = config.AUDIO_COMPACT_MANIFEST_PATH
+    settings = default_settings()
+
+    # 先增量更新音频清单，用其中的md5判断原文件是否变化
+    audio_manifest.manifest.load()
+    audio_manifest.manifest.rebuild()
+    source_files = audio_manifest.read_manifest(audio_manifest.manifest.path)['files']
+
+    previous = audio_manifest.read_manifest(manifest_path)
+    old_files = previous['files'] if previous else {}
+    if previous and previous.get('settings') != settings and not force:
+        logger.info("转码参数已变化，全部重新转码")
+        force = True
+
+    files = {}
+    jobs = []
+    for rel, info in sorted(source_files.items()):
+        dst_rel = compact_rel(rel, settings)
+        old = old_files.get(rel)
+        if (not force and old and old['source_md5'] == info['md5'] and old['path'] == dst_rel
+                and os.path.exists(os.path.join(base_dir, dst_rel))):
+            files[rel] = old
+            continue
+        jobs.append((rel, os.path.join(base_dir, rel), os.path.join(base_dir, dst_rel), settings))
+
+    def write(final=False):
+        write_files = dict(files)
+        if not final and not force:
+            # 尚未转码的文件沿用旧条目（原文件md5不一致的条目不会被使用）
+            for rel, old in old_files.items():
+                if rel in source_files and rel not in write_files and old['path'] == compact_rel(rel, settings):
+                    write_files[rel] = old
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        audio_manifest.write_manifest(manifest_path, {
+            'version': audio_manifest.MANIFEST_VERSION,
+            'generated_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'settings': settings,
+            'files': write_files,
+        })
+
+    result = {'total': len(source_files), 'skipped': len(files), 'transcoded': 0, 'failed': 0,
+              'removed': 0, 'failures': []}
+    logger.info(f"共 {len(source_files)} 个音频文件，已是最新 {len(files)} 个，待转码 {len(jobs)} 个")
+    if jobs:
+        _check_converter(jobs, settings)
+        start = last_report = last_checkpoint = time.monotonic()
+        workers = workers or os.cpu_count() or 1
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for done, (rel, output, error) in enumerate(executor.map(_transcode_job, jobs, chunksize=8), 1):
+                if error is None:
+                    info = source_files[rel]
+                    files[rel] = dict(output, path=compact_rel(rel, settings),
+                                      source_md5=info['md5'], source_size=info['size'])
+                    result['transcoded'] += 1
+                else:
+                    result['failed'] += 1
+                    result['failures'].append((rel, error))
+                    logger.warning(f"转码失败: {rel}, 错误: {error}")
+                now = time.monotonic()
+                if now - last_report >= 5.0:
+                    last_report = now
+                    speed = done / (now - start)
+                    logger.info(f"进度 {done}/{len(jobs)}: {speed:.1f}个/秒, 预计剩余 {(len(jobs) - done) / speed:.0f}秒")
+                if now - last_checkpoint >= _CHECKPOINT_INTERVAL:
+                    last_checkpoint = now
+                    write()
+    write(final=True)
+
+    # 新清单写入后再清理原文件已删除或输出路径变化的旧压缩文件，应用不会引用到已删除的文件
+    for rel, old in old_files.items():
+        if rel not in source_files or old['path'] != compact_rel(rel, settings):
+            _remove_output(base_dir, old['path'])
+            result['removed'] += 1
+    return result
+
+
+def compact_stats():
+    """返回压缩前后的文件数、总大小和总时长"""
+    compact = audio_manifest.read_manifest(config.AUDIO_COMPACT_MANIFEST_PATH)
+    entries = compact['files'].values() if compact else []
+    return {
+        'files': len(entries),
+        'source_bytes': sum(entry['source_size'] for entry in entries),
+        'compact_bytes': sum(entry['size'] for entry in entries),
+        'compact_seconds': round(sum(entry['duration'] for entry in entries), 1),
+        'settings': compact['settings'] if compact else default_settings(),
+        'generated_at': compact['generated_at'] if compact else None,
+    }
+
+
+# --- 命令行入口 ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='词库音频转码')
+    parser.add_argument('command', choices=['build', 'stats'], help='要执行的操作')
+    parser.add_argument('--workers', type=int, help='并行转码的进程数，默认为CPU核数')
+    parser.add_argument('--force', action='store_true', help='全部重新转码')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    if args.command == 'build':
+        start = time.perf_counter()
+        try:
+            result = build(workers=args.workers, force=args.force)
+        except RuntimeError as e:
+            print(e)
+            return 1
+        print(f"完成: 共 {result['total']} 个，已是最新 {result['skipped']} 个，转码 {result['transcoded']} 个，"
+              f"失败 {result['failed']} 个，清理 {result['removed']} 个，耗时 {time.perf_counter() - start:.1f}秒")
+        for rel, error in result['failures'][:20]:
+            print(f"  失败: {rel}: {error}")
+        if result['failed']:
+            return 1
+
+    stats = compact_stats()
+    settings = stats['settings']
+    ratio = stats['compact_bytes'] / stats['source_bytes'] if stats['source_bytes'] else 0.0
+    print(f"压缩音频 {stats['files']} 个（{settings['format']} {settings['bitrate']} 单声道 {settings['sample_rate']}Hz），"
+          f"原文件 {stats['source_bytes'] / 1024 / 1024:.1f}MB → {stats['compact_bytes'] / 1024 / 1024:.1f}MB "
+          f"（{ratio:.0%}），总时长 {stats['compact_seconds']:.0f}秒")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
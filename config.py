@@ -0,0 +1,166 @@
+"""
+配置文件 - 集中管理应用配置，所有配置项均可通过环境变量覆盖
+"""
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _env_int(name, default):
+    """读取整数类型的环境变量"""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name, default):
+    """读取浮点类型的环境变量"""
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# --- 数据库 ---
+DATABASE_PATH = os.environ.get('DATABASE_PATH') or os.path.join(BASE_DIR, 'vocabulary.db')
+
+# --- 词库资源 ---
+# 音频、txt等词库资源统一放在 wordlists 目录下
+WORDLISTS_DIR = os.environ.get('WORDLISTS_DIR') or os.path.join(BASE_DIR, 'wordlists')
+# 音频清单文件，记录媒体目录中实际存在的音频（python audio_manifest.py build 生成）
+AUDIO_MANIFEST_PATH = os.environ.get('AUDIO_MANIFEST_PATH') or os.path.join(WORDLISTS_DIR, 'audio_manifest.json')
+# 清单包含的媒体目录（相对于 WORDLISTS_DIR）
+AUDIO_MEDIA_ROOTS = ('junior_high/media', 'senior_high/media')
+
+# --- 压缩音频（python audio_transcode.py build 生成） ---
+# 转码后的音频放在 WORDLISTS_DIR 下的这个目录中，保持与原媒体目录相同的结构
+AUDIO_COMPACT_DIR = os.environ.get('AUDIO_COMPACT_DIR', 'compact')
+AUDIO_COMPACT_MANIFEST_PATH = (os.environ.get('AUDIO_COMPACT_MANIFEST_PATH')
+                               or os.path.join(WORDLISTS_DIR, AUDIO_COMPACT_DIR, 'manifest.json'))
+# 有压缩版本时题目中返回压缩音频的地址
+AUDIO_COMPACT_ENABLED = os.environ.get('AUDIO_COMPACT_ENABLED', '1').lower() not in ('0', 'false', 'no')
+# 输出格式：单声道、低码率，按响度归一化并去掉首尾静音
+AUDIO_COMPACT_FORMAT = os.environ.get('AUDIO_COMPACT_FORMAT', 'mp3')
+AUDIO_COMPACT_BITRATE = os.environ.get('AUDIO_COMPACT_BITRATE', '32k')
+AUDIO_COMPACT_SAMPLE_RATE = _env_int('AUDIO_COMPACT_SAMPLE_RATE', 22050)
+AUDIO_COMPACT_TARGET_DBFS = _env_float('AUDIO_COMPACT_TARGET_DBFS', -18.0)
+# 低于这个音量（dBFS）视为静音；去掉静音后首尾各保留的毫秒数
+AUDIO_COMPACT_SILENCE_DBFS = _env_float('AUDIO_COMPACT_SILENCE_DBFS', -45.0)
+AUDIO_COMPACT_PADDING_MS = _env_int('AUDIO_COMPACT_PADDING_MS', 80)
+
+# --- 音频包（一次请求预加载一次测验的全部音频） ---
+# 整个列表的音频包缓存目录（在 WORDLISTS_DIR 下时代理模式由代理发送，配置到其他位置时由Worker直接发送）
+AUDIO_BUNDLE_DIR = os.environ.get('AUDIO_BUNDLE_DIR') or os.path.join(WORDLISTS_DIR, 'bundles')
+# 按word_ids打包时最多包含的单词数
+AUDIO_BUNDLE_MAX_WORDS = _env_int('AUDIO_BUNDLE_MAX_WORDS', 200)
+
+# --- 媒体文件发送 ---
+# 为空时由Flask直接发送文件；nginx 使用 X-Accel-Redirect，sendfile 使用 X-Sendfile，交给前端代理发送
+MEDIA_ACCEL_MODE = os.environ.get('MEDIA_ACCEL_MODE', '').strip().lower()
+# nginx模式下词库目录和TTS缓存目录对应的internal location
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/_protected/wordlists/')
+TTS_ACCEL_PREFIX = os.environ.get('TTS_ACCEL_PREFIX', '/_protected/tts_cache/')
+# 媒体和TTS音频的浏览器缓存时间（秒），默认30天
+MEDIA_CACHE_MAX_AGE = _env_int('MEDIA_CACHE_MAX_AGE', 30 * 24 * 3600)
+
+# --- 数据库连接池 ---
+# 每个Worker进程内最多保持的连接数
+DB_POOL_SIZE = _env_int('DB_POOL_SIZE', 5)
+# 连接池耗尽时等待空闲连接的最长时间（秒）
+DB_POOL_TIMEOUT = _env_float('DB_POOL_TIMEOUT', 10.0)
+# 空闲连接超过该时间（秒）未使用，取出时先做健康检查
+DB_HEALTH_CHECK_INTERVAL = _env_float('DB_HEALTH_CHECK_INTERVAL', 30.0)
+# 取连接等待超过该时间（毫秒）时记录警告日志
+DB_SLOW_CHECKOUT_MS = _env_float('DB_SLOW_CHECKOUT_MS', 100.0)
+
+# --- SQLite PRAGMA ---
+# WAL模式下读写互不阻塞，适合多Worker同时读写同一个数据库文件
+DB_JOURNAL_MODE = os.environ.get('DB_JOURNAL_MODE', 'WAL')
+DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL')
+# 负数表示以KB为单位（-16000 约等于 16MB）
+DB_CACHE_SIZE = _env_int('DB_CACHE_SIZE', -16000)
+DB_MMAP_SIZE = _env_int('DB_MMAP_SIZE', 64 * 1024 * 1024)
+DB_BUSY_TIMEOUT_MS = _env_int('DB_BUSY_TIMEOUT_MS', 5000)
+
+# --- 写操作串行化 ---
+# 跨Worker进程的写锁文件，默认与数据库文件放在一起
+DB_WRITE_LOCK_PATH = os.environ.get('DB_WRITE_LOCK_PATH') or DATABASE_PATH + '.write.lock'
+# 等待写锁的最长时间（秒）
+DB_WRITE_LOCK_TIMEOUT = _env_float('DB_WRITE_LOCK_TIMEOUT', 15.0)
+# 遇到 "database is locked" 时的重试次数和初始退避时间（毫秒，按指数增长）
+DB_WRITE_RETRIES = _env_int('DB_WRITE_RETRIES', 5)
+DB_WRITE_BACKOFF_MS = _env_float('DB_WRITE_BACKOFF_MS', 50.0)
+
+# --- 数据库迁移 ---
+# 应用启动时自动执行未完成的迁移（也可以用 python migrations.py upgrade 手动执行）
+DB_AUTO_MIGRATE = os.environ.get('DB_AUTO_MIGRATE', '1').lower() not in ('0', 'false', 'no')
+
+# --- 判分 ---
+# 是否把常见英式/美式拼写对（colour/color 等）视为同一答案（默认关闭）
+GRADER_BRITISH_AMERICAN = os.environ.get('GRADER_BRITISH_AMERICAN', '0').lower() not in ('0', 'false', 'no')
+
+# --- 后台写入队列 ---
+# 开启后 /api/submit 的批改结果先写入本地日志并立即返回，由后台线程批量写入数据库
+WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', '0').lower() not in ('0', 'false', 'no')
+# 日志段文件所在目录，默认与数据库文件放在一起
+WRITE_BEHIND_DIR = os.environ.get('WRITE_BEHIND_DIR') or DATABASE_PATH + '.write-behind'
+# 后台线程写入数据库的间隔（秒），以及攒够多少条结果立即写入
+WRITE_BEHIND_FLUSH_INTERVAL = _env_float('WRITE_BEHIND_FLUSH_INTERVAL', 0.5)
+WRITE_BEHIND_BATCH_SIZE = _env_int('WRITE_BEHIND_BATCH_SIZE', 200)
+# 每条结果写入日志后是否fsync（关闭后机器断电可能丢失最近的结果）
+WRITE_BEHIND_FSYNC = os.environ.get('WRITE_BEHIND_FSYNC', '1').lower() not in ('0', 'false', 'no')
+
+# --- 管理员仪表盘缓存 ---
+# 仪表盘快照的有效期（秒），设为0时每次请求都重新计算
+DASHBOARD_CACHE_TTL = _env_float('DASHBOARD_CACHE_TTL', 60.0)
+# 快照过期后仍可先返回旧数据（同时在后台刷新）的时长（秒）
+DASHBOARD_CACHE_STALE_TTL = _env_float('DASHBOARD_CACHE_STALE_TTL', 600.0)
+
+# --- TTS语音合成 ---
+# 合成引擎：gtts（在线）、espeak（本地离线，需要安装espeak-ng）、stub（测试用假引擎），
+# 多个引擎用逗号分隔时按顺序尝试，如 "gtts,espeak"
+TTS_BACKEND = os.environ.get('TTS_BACKEND', 'gtts')
+# espeak引擎的命令路径（默认自动查找 espeak-ng/espeak）和发音人
+TTS_ESPEAK_COMMAND = os.environ.get('TTS_ESPEAK_COMMAND') or None
+TTS_ESPEAK_VOICE = os.environ.get('TTS_ESPEAK_VOICE', 'en-us')
+# stub引擎模拟的合成耗时（毫秒）
+TTS_STUB_LATENCY_MS = _env_float('TTS_STUB_LATENCY_MS', 0.0)
+# 合成音频的缓存目录
+TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR') or os.path.join(WORDLISTS_DIR, 'tts_cache')
+# 缓存总大小上限（MB），超过后按最近访问时间淘汰，设为0时不限制
+TTS_CACHE_MAX_MB = _env_int('TTS_CACHE_MAX_MB', 512)
+# 每个Worker进程内同时进行的合成任务数，以及最多允许排队的任务数
+TTS_MAX_WORKERS = _env_int('TTS_MAX_WORKERS', 2)
+TTS_MAX_PENDING = _env_int('TTS_MAX_PENDING', 64)
+# 单次合成的超时（秒），gTTS为HTTP超时，espeak为子进程超时
+TTS_TIMEOUT = _env_float('TTS_TIMEOUT', 30.0)
+# /api/tts 请求默认等待合成完成的时间（秒），超过后返回202，客户端稍后重试同一地址
+TTS_WAIT_SECONDS = _env_float('TTS_WAIT_SECONDS', 8.0)
+
+# --- PDF导出 ---
+# 每个Worker进程中生成PDF的子进程数，以及每个子进程处理多少个任务后重启（释放reportlab占用的内存）
+PDF_MAX_WORKERS = _env_int('PDF_MAX_WORKERS', 2)
+PDF_MAX_TASKS_PER_CHILD = _env_int('PDF_MAX_TASKS_PER_CHILD', 50)
+# 每个学生同时进行的导出任务数上限
+PDF_MAX_JOBS_PER_STUDENT = _env_int('PDF_MAX_JOBS_PER_STUDENT', 2)
+# 单个PDF最多包含的错词数
+PDF_MAX_ROWS = _env_int('PDF_MAX_ROWS', 500)
+# PDF中使用的中文字体（TrueType轮廓的 .ttf/.ttc，reportlab不支持CFF轮廓的OpenType字体）及.ttc中的字体序号；
+# 为空时依次尝试常见的系统字体，都找不到时使用reportlab内置的CID字体 STSong-Light
+PDF_FONT_PATH = os.environ.get('PDF_FONT_PATH', '')
+PDF_FONT_SUBFONT_INDEX = _env_int('PDF_FONT_SUBFONT_INDEX', 0)
+# 管理员批量导出时一次最多包含的学生数
+PDF_BATCH_MAX_STUDENTS = _env_int('PDF_BATCH_MAX_STUDENTS', 100)
+# 导出请求等待任务完成的时间（秒），超过后返回202，客户端轮询下载地址
+PDF_WAIT_SECONDS = _env_float('PDF_WAIT_SECONDS', 5.0)
+# 任务状态和生成的PDF所在目录
+PDF_JOB_DIR = os.environ.get('PDF_JOB_DIR') or os.path.join(BASE_DIR, 'exports')
+# 任务超过该时间（秒）仍未完成视为失败；任务文件保留的时间（秒）
+PDF_JOB_TIMEOUT = _env_float('PDF_JOB_TIMEOUT', 300.0)
+PDF_JOB_TTL = _env_float('PDF_JOB_TTL', 3600.0)
+# 按导出内容缓存生成的PDF，相同的导出直接返回缓存文件
+PDF_CACHE_ENABLED = os.environ.get('PDF_CACHE_ENABLED', '1').lower() not in ('0', 'false', 'no')
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR') or os.path.join(PDF_JOB_DIR, 'cache')
+# 缓存总大小上限（MB），超过后按最近使用时间淘汰，设为0时不限制
+PDF_CACHE_MAX_MB = _env_int('PDF_CACHE_MAX_MB', 256)
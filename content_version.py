@@ -0,0 +1,27 @@
+"""
+内容版本号 - 词库内容（Words/WordLists/Books）变化时自动递增，供进程内缓存判断是否失效
+
+版本号保存在 ContentVersions 表中，由 migrations.py 创建的触发器在任何增删改后递增，
+因此导入脚本无需额外处理；也可以调用 bump_version() 手动让所有Worker的缓存失效。
+"""
+
+import sqlite3
+
+WORDS = 'words'
+
+
+def get_version(conn, name=WORDS):
+    """读取内容版本号（主键查询），表不存在时返回0"""
+    try:
+        row = conn.execute("SELECT version FROM ContentVersions WHERE name = ?", (name,)).fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+
+def bump_version(conn, name=WORDS):
+    """手动递增内容版本号（调用方负责提交事务）"""
+    conn.execute("""
+        INSERT INTO ContentVersions (name, version) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1
+    """, (name,))
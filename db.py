@@ -0,0 +1,372 @@
+"""
+数据库连接管理 - 进程内SQLite连接池，连接绑定到Flask应用上下文，在teardown时归还；
+启动时开启WAL并按配置设置PRAGMA，所有写操作经由串行化的写入通道执行
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows本地开发环境没有fcntl，只做进程内串行化
+    fcntl = None
+
+from flask import g
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """连接池耗尽且在超时时间内没有等到空闲连接"""
+
+
+class ConnectionPool:
+    """按Worker进程划分的SQLite连接池
+
+    gunicorn 使用 preload_app，主进程创建的连接会被 fork 到各个 Worker 中，
+    因此池在检测到进程号变化时会丢弃继承来的连接，保证每个 Worker 只使用自己的连接。
+    """
+
+    def __init__(self, database, size=5, timeout=10.0, health_check_interval=30.0,
+                 slow_checkout_ms=100.0):
+        self.database = database
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.slow_checkout_ms = slow_checkout_ms
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = []  # [(conn, last_used)]，后进先出
+        self._in_use = 0
+        self._pid = os.getpid()
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._metrics = {
+            'checkouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'health_check_failures': 0,
+            'timeouts': 0,
+            'wait_ms_total': 0.0,
+            'wait_ms_max': 0.0,
+        }
+
+    def _check_pid(self):
+        """fork之后丢弃从父进程继承的连接（调用方需持有锁）"""
+        pid = os.getpid()
+        if pid != self._pid:
+            # 不能在子进程中关闭父进程的连接，直接丢弃引用即可
+            self._idle = []
+            self._in_use = 0
+            self._pid = pid
+            self._reset_metrics()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, check_same_thread=False,
+                               timeout=config.DB_BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn)
+        self._metrics['created'] += 1
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """取出一个连接，池耗尽时最多等待 timeout 秒"""
+        start = time.perf_counter()
+        with self._cond:
+            self._check_pid()
+            deadline = start + self.timeout
+            while not self._idle and self._in_use >= self.size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._metrics['timeouts'] += 1
+                    raise PoolTimeoutError(f'等待数据库连接超时（{self.timeout}秒）')
+                self._cond.wait(remaining)
+
+            conn = None
+            last_used = None
+            if self._idle:
+                conn, last_used = self._idle.pop()
+            self._in_use += 1
+
+        try:
+            if conn is not None and time.monotonic() - last_used > self.health_check_interval:
+                if not self._is_healthy(conn):
+                    self._metrics['health_check_failures'] += 1
+                    self._discard(conn)
+                    conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        wait_ms = (time.perf_counter() - start) * 1000
+        with self._cond:
+            self._metrics['checkouts'] += 1
+            self._metrics['wait_ms_total'] += wait_ms
+            self._metrics['wait_ms_max'] = max(self._metrics['wait_ms_max'], wait_ms)
+        if wait_ms > self.slow_checkout_ms:
+            logger.warning(f"获取数据库连接耗时较长: {wait_ms:.1f}ms")
+        return conn
+
+    def release(self, conn):
+        """归还连接，未提交的事务会被回滚"""
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"归还连接时回滚失败，连接将被丢弃: {e}")
+            healthy = False
+
+        with self._cond:
+            if os.getpid() != self._pid:
+                return
+            self._in_use = max(0, self._in_use - 1)
+            if healthy and len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+
+        if conn is not None:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        self._metrics['discarded'] += 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        """返回连接池的运行指标"""
+        with self._cond:
+            self._check_pid()
+            metrics = dict(self._metrics)
+            metrics['size'] = self.size
+            metrics['idle'] = len(self._idle)
+            metrics['in_use'] = self._in_use
+            metrics['pid'] = self._pid
+        checkouts = metrics['checkouts']
+        metrics['wait_ms_avg'] = round(metrics['wait_ms_total'] / checkouts, 3) if checkouts else 0.0
+        metrics['wait_ms_total'] = round(metrics['wait_ms_total'], 3)
+        metrics['wait_ms_max'] = round(metrics['wait_ms_max'], 3)
+        return metrics
+
+
+def apply_pragmas(conn):
+    """设置连接级别的PRAGMA（每个新连接都需要设置）"""
+    conn.execute(f"PRAGMA synchronous = {config.DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = {int(config.DB_CACHE_SIZE)}")
+    conn.execute(f"PRAGMA mmap_size = {int(config.DB_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT_MS)}")
+
+
+def bootstrap_database(database=None):
+    """启动时设置数据库级别的PRAGMA，journal_mode=WAL 会持久化到数据库文件中"""
+    database = database or config.DATABASE_PATH
+    conn = sqlite3.connect(database, timeout=config.DB_BUSY_TIMEOUT_MS / 1000)
+    try:
+        mode = conn.execute(f"PRAGMA journal_mode = {config.DB_JOURNAL_MODE}").fetchone()[0]
+        if mode.lower() != config.DB_JOURNAL_MODE.lower():
+            logger.warning(f"无法将数据库切换为{config.DB_JOURNAL_MODE}模式，当前模式: {mode}")
+        else:
+            logger.info(f"数据库日志模式: {mode}")
+        return mode
+    finally:
+        conn.close()
+
+
+def _is_lock_error(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class WriteSerializer:
+    """串行化写入通道
+
+    进程内用线程锁、进程间用文件锁（fcntl.flock）保证同一时刻只有一个写事务，
+    写事务以 BEGIN IMMEDIATE 开始，遇到 "database is locked" 时回滚并按指数退避重试。
+    """
+
+    def __init__(self, lock_path, lock_timeout=15.0, retries=5, backoff_ms=50.0):
+        self.lock_path = lock_path
+        self.lock_timeout = lock_timeout
+        self.retries = max(0, retries)
+        self.backoff_ms = backoff_ms
+
+        self._thread_lock = threading.Lock()
+        self._local = threading.local()
+        self._lock_file = None
+        self._lock_file_pid = None
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'writes': 0,
+            'retries': 0,
+            'failures': 0,
+            'lock_wait_ms_total': 0.0,
+            'lock_wait_ms_max': 0.0,
+        }
+
+    def _get_lock_file(self):
+        # fork之后文件锁需要重新打开，否则会与父进程共享同一个打开的文件描述
+        if self._lock_file is None or self._lock_file_pid != os.getpid():
+            self._lock_file = open(self.lock_path, 'a+')
+            self._lock_file_pid = os.getpid()
+        return self._lock_file
+
+    def _acquire(self):
+        start = time.perf_counter()
+        deadline = start + self.lock_timeout
+        if not self._thread_lock.acquire(timeout=self.lock_timeout):
+            raise sqlite3.OperationalError('等待写锁超时（进程内）')
+        if fcntl is not None:
+            try:
+                lock_file = self._get_lock_file()
+                while True:
+                    try:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.perf_counter() >= deadline:
+                            raise sqlite3.OperationalError('等待写锁超时（跨进程）')
+                        time.sleep(0.005)
+            except Exception:
+                self._thread_lock.release()
+                raise
+        wait_ms = (time.perf_counter() - start) * 1000
+        with self._metrics_lock:
+            self._metrics['lock_wait_ms_total'] += wait_ms
+            self._metrics['lock_wait_ms_max'] = max(self._metrics['lock_wait_ms_max'], wait_ms)
+
+    def _release(self):
+        try:
+            if fcntl is not None and self._lock_file is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._thread_lock.release()
+
+    def run(self, conn, func, *args, **kwargs):
+        """在写事务中执行 func(conn, *args, **kwargs) 并提交，返回 func 的返回值
+
+        func 可能因重试被执行多次，不应在其中产生数据库以外的副作用。
+        在写事务内部再次调用时直接执行，不会重复加锁。
+        """
+        if getattr(self._local, 'depth', 0) > 0:
+            return func(conn, *args, **kwargs)
+
+        attempt = 0
+        while True:
+            self._acquire()
+            self._local.depth = 1
+            try:
+                if conn.in_transaction:
+                    conn.commit()
+                conn.execute('BEGIN IMMEDIATE')
+                result = func(conn, *args, **kwargs)
+                conn.commit()
+                with self._metrics_lock:
+                    self._metrics['writes'] += 1
+                return result
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if not _is_lock_error(e) or attempt >= self.retries:
+                    with self._metrics_lock:
+                        self._metrics['failures'] += 1
+                    raise
+                attempt += 1
+                with self._metrics_lock:
+                    self._metrics['retries'] += 1
+                delay = self.backoff_ms * (2 ** (attempt - 1)) * (1 + random.random() * 0.5) / 1000
+                logger.warning(f"数据库写入冲突，{delay * 1000:.0f}ms后第{attempt}次重试: {e}")
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                with self._metrics_lock:
+                    self._metrics['failures'] += 1
+                raise
+            finally:
+                self._local.depth = 0
+                self._release()
+            time.sleep(delay)
+
+    def stats(self):
+        """返回写入通道的运行指标"""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        writes = metrics['writes']
+        metrics['lock_wait_ms_avg'] = round(metrics['lock_wait_ms_total'] / writes, 3) if writes else 0.0
+        metrics['lock_wait_ms_total'] = round(metrics['lock_wait_ms_total'], 3)
+        metrics['lock_wait_ms_max'] = round(metrics['lock_wait_ms_max'], 3)
+        return metrics
+
+
+pool = ConnectionPool(
+    config.DATABASE_PATH,
+    size=config.DB_POOL_SIZE,
+    timeout=config.DB_POOL_TIMEOUT,
+    health_check_interval=config.DB_HEALTH_CHECK_INTERVAL,
+    slow_checkout_ms=config.DB_SLOW_CHECKOUT_MS,
+)
+
+
+writer = WriteSerializer(
+    config.DB_WRITE_LOCK_PATH,
+    lock_timeout=config.DB_WRITE_LOCK_TIMEOUT,
+    retries=config.DB_WRITE_RETRIES,
+    backoff_ms=config.DB_WRITE_BACKOFF_MS,
+)
+
+
+def get_db():
+    """获取绑定到当前应用上下文的连接，同一请求内多次调用返回同一个连接"""
+    if 'db_conn' not in g:
+        g.db_conn = pool.acquire()
+    return g.db_conn
+
+
+def close_db(exception=None):
+    """应用上下文结束时将连接归还连接池"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        pool.release(conn)
+
+
+def run_write(func, *args, **kwargs):
+    """使用当前请求的连接，通过串行化写入通道执行一个写事务"""
+    return writer.run(get_db(), func, *args, **kwargs)
+
+
+def init_app(app):
+    """初始化数据库PRAGMA，并在Flask应用上注册连接归还钩子"""
+    try:
+        bootstrap_database()
+    except sqlite3.Error as e:
+        logger.error(f"初始化数据库PRAGMA失败: {e}")
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,114 @@
+"""
+错误记录查询 - 错误记录的筛选条件、键集分页和单词内容合并
+
+/api/error-history（分页和流式返回）和PDF导出共用这里的查询：按排序键做键集分页，
+分批读取时不在内存中保留完整列表；单词的拼写、释义和所属词书列表来自单词缓存。
+"""
+from datetime import datetime
+
+from word_cache import word_cache
+
+# 键集分页的排序键，最后以 error_id 保证顺序稳定
+SORT_KEYS = {
+    'date': ('e.error_date', 'e.error_id'),
+    'error_count': ('s.error_count', 'e.error_date', 'e.error_id'),
+}
+# 分批读取全部记录时每次查询的行数
+BATCH_SIZE = 500
+
+
+def sort_key(row, sort_by):
+    """返回一行记录的排序键（用作下一页的起点）"""
+    return [row[column.split('.')[1]] for column in SORT_KEYS[sort_by]]
+
+
+def parse_date(value, default=None):
+    """解析 YYYY-MM-DD 格式的日期，格式错误时抛出ValueError，不是字符串时抛出TypeError"""
+    if not value:
+        return default
+    return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+
+
+def build_filters(book_id=None, list_id=None, date_from=None, date_to=None):
+    """错误历史的筛选条件，返回 (SQL片段, 参数列表)"""
+    clauses = []
+    params = []
+    if book_id is not None:
+        clauses.append(" AND wl.book_id = ?")
+        params.append(book_id)
+    if list_id is not None:
+        clauses.append(" AND w.list_id = ?")
+        params.append(list_id)
+    if date_from is not None:
+        clauses.append(" AND e.error_date >= ?")
+        params.append(date_from)
+    if date_to is not None:
+        clauses.append(" AND e.error_date <= ?")
+        params.append(date_to + ' 23:59:59')  # 包含当天的所有时间
+    return ''.join(clauses), params
+
+
+def fetch_page(conn, student_id, filters, sort_by, descending, after, limit):
+    """按排序键做键集分页读取错误记录，after 为上一页最后一行的排序键"""
+    where, filter_params = filters
+    query = """
+    SELECT e.error_id, e.word_id, e.student_answer, e.error_type, e.error_date,
+           s.error_count
+    FROM ErrorLogs e
+    JOIN StudentWordErrorStats s ON s.student_id = e.student_id AND s.word_id = e.word_id
+    JOIN Words w ON e.word_id = w.word_id
+    LEFT JOIN WordLists wl ON w.list_id = wl.list_id
+    WHERE e.student_id = ?
+    """ + where
+    params = [student_id] + filter_params
+
+    keys = SORT_KEYS[sort_by]
+    if after is not None:
+        query += f" AND ({', '.join(keys)}) {'<' if descending else '>'} ({', '.join('?' * len(keys))})"
+        params.extend(after)
+
+    direction = 'DESC' if descending else 'ASC'
+    query += " ORDER BY " + ', '.join(f"{key} {direction}" for key in keys) + " LIMIT ?"
+    params.append(limit)
+    return conn.execute(query, params).fetchall()
+
+
+def with_words(conn, rows):
+    """错误记录合并单词缓存中的拼写、释义和所属词书列表"""
+    words_by_id = {word.word_id: word for word in word_cache.get_many(conn, list({row['word_id'] for row in rows}))}
+    return [dict(words_by_id[row['word_id']].summary, **dict(row)) for row in rows if row['word_id'] in words_by_id]
+
+
+def iter_batches(conn, student_id, filters, sort_by='date', descending=True, after=None, limit=None):
+    """分批读取全部错误记录（最多limit条），逐批产出合并了单词内容的记录列表"""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        batch_size = BATCH_SIZE if remaining is None else min(BATCH_SIZE, remaining)
+        rows = fetch_page(conn, student_id, filters, sort_by, descending, after, batch_size)
+        items = with_words(conn, rows)
+        if items:
+            yield items
+        if len(rows) < batch_size:
+            break
+        if remaining is not None:
+            remaining -= len(rows)
+        after = sort_key(rows[-1], sort_by)
+
+
+def sheet_records(batches, limit=None):
+    """iter_batches 产出的错误记录 → 错词考核纸的记录（pdf_templates.render_error_sheet 的errors参数）
+
+    同一个单词只出现一次（位置按排序后第一次出现），学生的各个错误答案去重后合并在 wrong_answers 中；最多limit个单词。
+    """
+    words = {}
+    for items in batches:
+        for item in items:
+            record = words.get(item['word_id'])
+            if record is None:
+                if limit is not None and len(words) >= limit:
+                    continue
+                record = words[item['word_id']] = dict(item, wrong_answers=[])
+            answer = item.get('student_answer')
+            if answer and answer not in record['wrong_answers']:
+                record['wrong_answers'].append(answer)
+    return list(words.values())
@@ -0,0 +1,153 @@
+"""
+拼写判分 - 每个单词的可接受答案集合只构建一次，判分时 O(1) 查找
+
+Words.spelling 中用 "/" 或 "," 分隔的拼写变体（如 "organise/organize"、"wis, wit"）、
+"yog(h)urt" 这类可省略字母的写法，以及 SpellingVariants 表中的变体都会被展开。
+开启 GRADER_BRITISH_AMERICAN 后，常见英式/美式拼写对（colour/color 等）也互相接受。
+答案统一做 NFKC 规范化（全角字母、全角空格）、去除首尾空白、合并连续空白并转为小写。
+缓存按 word_id 保存，词库内容版本号变化时整体失效。
+"""
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+
+import config
+import content_version
+
+logger = logging.getLogger(__name__)
+
+# SQLite单条语句的参数数量有限，按主键批量取行时分批执行
+_LOAD_BATCH_SIZE = 500
+
+# 常见英式/美式拼写对，按单词整体替换（词组中的每个单词分别替换）。
+# 只收录 -our/-or、-ise/-ize、-tre/-ter 中没有歧义的词；美式拼写本身也是另一个单词的不收录
+# （如 cheque/check、tyre/tire、metre/meter、practise/practice），否则拼成另一个词也会判为正确
+BRITISH_AMERICAN = {
+    'apologise': 'apologize', 'behaviour': 'behavior', 'centimetre': 'centimeter',
+    'centre': 'center', 'colour': 'color', 'colourful': 'colorful',
+    'favour': 'favor', 'favourite': 'favorite', 'fibre': 'fiber', 'flavour': 'flavor',
+    'harbour': 'harbor', 'honour': 'honor', 'humour': 'humor', 'kilometre': 'kilometer',
+    'labour': 'labor', 'litre': 'liter', 'neighbour': 'neighbor', 'neighbourhood': 'neighborhood',
+    'organisation': 'organization', 'organise': 'organize', 'realise': 'realize',
+    'recognise': 'recognize', 'rumour': 'rumor', 'theatre': 'theater',
+}
+_PAIRS = dict(BRITISH_AMERICAN)
+_PAIRS.update({american: british for british, american in BRITISH_AMERICAN.items()})
+
+# "yog(h)urt" 中括号内为可省略的字母
+_OPTIONAL_LETTERS = re.compile(r'\(([a-z]+)\)')
+
+
+def normalize_answer(text):
+    """规范化学生答案或标准拼写，便于比较"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', str(text))
+    return ' '.join(text.split()).lower()
+
+
+def _expand_optional_letters(spelling):
+    if not _OPTIONAL_LETTERS.search(spelling):
+        return {spelling}
+    return {_OPTIONAL_LETTERS.sub(r'\1', spelling), _OPTIONAL_LETTERS.sub('', spelling)}
+
+
+def _swap_british_american(spelling):
+    swapped = ' '.join(_PAIRS.get(part, part) for part in spelling.split(' '))
+    return {swapped} if swapped != spelling else set()
+
+
+def accepted_answers(spelling, extra_variants=(), british_american=None):
+    """根据标准拼写（及额外变体）构建可接受答案集合"""
+    if british_american is None:
+        british_american = config.GRADER_BRITISH_AMERICAN
+    answers = set()
+    for variant in [*re.split(r'[/,]', spelling or ''), *extra_variants]:
+        variant = normalize_answer(variant)
+        if variant:
+            answers |= _expand_optional_letters(variant)
+    if british_american:
+        for answer in list(answers):
+            answers |= _swap_british_american(answer)
+    return frozenset(answers)
+
+
+class WordAnswers:
+    """单个单词的标准拼写和可接受答案集合"""
+
+    __slots__ = ('word_id', 'spelling', 'accepted')
+
+    def __init__(self, word_id, spelling, accepted):
+        self.word_id = word_id
+        self.spelling = spelling
+        self.accepted = accepted
+
+    def check(self, answer):
+        """判断答案是否正确"""
+        return normalize_answer(answer) in self.accepted
+
+
+class AnswerIndex:
+    """word_id → WordAnswers 的进程内缓存"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._answers = {}
+        self._version = None
+
+    def _check_version(self, conn):
+        version = content_version.get_version(conn)
+        with self._lock:
+            if version != self._version:
+                self._answers = {}
+                self._version = version
+        return version
+
+    def _load(self, conn, word_ids):
+        spellings = {}
+        variants = {}
+        for start in range(0, len(word_ids), _LOAD_BATCH_SIZE):
+            batch = word_ids[start:start + _LOAD_BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(f"SELECT word_id, spelling FROM Words WHERE word_id IN ({placeholders})",
+                                batch).fetchall()
+            spellings.update((row[0], row[1]) for row in rows)
+            try:
+                rows = conn.execute(f"SELECT word_id, spelling_variant FROM SpellingVariants WHERE word_id IN ({placeholders})",
+                                    batch).fetchall()
+            except sqlite3.OperationalError:
+                # 旧数据库可能还没有 SpellingVariants 表
+                rows = []
+            for row in rows:
+                variants.setdefault(row[0], []).append(row[1])
+        return {word_id: WordAnswers(word_id, spelling, accepted_answers(spelling, variants.get(word_id, ())))
+                for word_id, spelling in spellings.items()}
+
+    def get_many(self, conn, word_ids):
+        """返回 {word_id: WordAnswers}，数据库中不存在的单词不包含在结果中"""
+        version = self._check_version(conn)
+        word_ids = list(dict.fromkeys(word_ids))
+        with self._lock:
+            found = {word_id: self._answers[word_id] for word_id in word_ids if word_id in self._answers}
+        missing = [word_id for word_id in word_ids if word_id not in found]
+        if missing:
+            loaded = self._load(conn, missing)
+            found.update(loaded)
+            with self._lock:
+                if self._version == version:
+                    self._answers.update(loaded)
+        return found
+
+    def get(self, conn, word_id):
+        """返回单个单词的 WordAnswers，不存在时返回None"""
+        return self.get_many(conn, [word_id]).get(word_id)
+
+    def invalidate(self):
+        """清空缓存"""
+        with self._lock:
+            self._answers = {}
+
+
+answer_index = AnswerIndex()
@@ -0,0 +1,81 @@
+"""
+媒体文件发送 - 词库音频和TTS音频的缓存响应头，以及交给前端代理发送文件的可选模式
+
+MEDIA_ACCEL_MODE 为空时由Flask直接发送文件（支持Range和条件请求）；
+设为 nginx 时只返回 X-Accel-Redirect 头，由Nginx的internal location发送文件；
+设为 sendfile 时返回 X-Sendfile 头（Apache mod_xsendfile、lighttpd）。
+两种代理模式下Worker只负责校验路径和生成响应头，不再占用Worker传输文件内容。
+代理只映射了root目录（如词库目录），root以外的文件（如配置到别处的 AUDIO_BUNDLE_DIR）仍由Flask直接发送。
+
+所有响应都带强ETag（音频清单中的md5，或文件大小和修改时间）。音频文件另外带
+Cache-Control: public, max-age=MEDIA_CACHE_MAX_AGE, immutable，浏览器重复播放时不再请求服务器；
+内容会变化的文件（整个列表的音频包）只用ETag重新验证。/wordlists 路由只发送音频文件（见 is_audio）。
+"""
+import mimetypes
+import os
+import stat
+from urllib.parse import quote
+
+from flask import Response, request, send_file
+
+import config
+
+
+def is_audio(path):
+    """按扩展名判断是否是音频文件（/wordlists 路由只对外提供音频文件）"""
+    mimetype = mimetypes.guess_type(path)[0]
+    return mimetype is not None and mimetype.startswith('audio/')
+
+
+def file_etag(st):
+    """根据文件大小和修改时间生成ETag"""
+    return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+def _set_cache_headers(response, etag, immutable=True):
+    response.set_etag(etag)
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.max_age = config.MEDIA_CACHE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # 同一地址的内容会变化（如整个列表的音频包），每次用ETag重新验证
+        response.cache_control.max_age = None
+        response.cache_control.no_cache = True
+    return response
+
+
+def _is_under(path, root):
+    root = os.path.realpath(root)
+    return os.path.commonpath([os.path.realpath(path), root]) == root
+
+
+def send_media(path, root, accel_prefix, etag=None, immutable=True):
+    """发送root目录下的文件path；文件不存在时抛出FileNotFoundError
+
+    accel_prefix 为Nginx中对应root目录的internal location（如 /_protected/wordlists/）。
+    immutable 为False时不让浏览器长期缓存，只用ETag重新验证。
+    """
+    st = os.stat(path)
+    if not stat.S_ISREG(st.st_mode):
+        raise FileNotFoundError(path)
+    etag = etag or file_etag(st)
+    mode = config.MEDIA_ACCEL_MODE
+
+    if not mode or not _is_under(path, root):
+        response = send_file(path, conditional=True, etag=etag, max_age=config.MEDIA_CACHE_MAX_AGE)
+        return _set_cache_headers(response, etag, immutable)
+
+    # 代理模式：条件请求直接在这里返回304，其余交给代理发送文件
+    if request.if_none_match.contains(etag):
+        return _set_cache_headers(Response(status=304), etag, immutable)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    response = Response(mimetype=mimetype)
+    if mode == 'nginx':
+        rel = os.path.relpath(path, root).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(rel)
+    elif mode == 'sendfile':
+        response.headers['X-Sendfile'] = path
+    else:
+        raise ValueError(f"未知的 MEDIA_ACCEL_MODE: {mode}")
+    return _set_cache_headers(response, etag, immutable)
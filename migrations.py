@@ -0,0 +1,615 @@
+"""
+数据库迁移 - 版本化管理数据库结构
+
+每个迁移步骤只会执行一次，已执行的版本记录在 SchemaMigrations 表中。
+应用启动时自动执行未完成的迁移，也可以通过命令行手动执行：
+
+    python migrations.py upgrade    # 执行所有未完成的迁移
+    python migrations.py status     # 查看迁移状态
+    python migrations.py explain    # 输出各API查询的 EXPLAIN QUERY PLAN
+    python migrations.py rebuild-error-stats    # 从 ErrorLogs 全量重建错误汇总表
+"""
+import argparse
+import logging
+import sqlite3
+import sys
+
+import config
+import db
+
+logger = logging.getLogger(__name__)
+
+
+# --- 工具函数 ---
+def _column_names(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def _add_column_if_missing(conn, table, column, definition):
+    if column not in _column_names(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        logger.info(f"已向{table}表添加{column}字段")
+
+
+# --- 迁移步骤 ---
+def _baseline_schema(conn):
+    """核心数据表（已存在的表不受影响）"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Books (
+            book_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_name TEXT NOT NULL UNIQUE
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS WordLists (
+            list_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            list_name TEXT NOT NULL,
+            book_id INTEGER,
+            FOREIGN KEY (book_id) REFERENCES Books(book_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Words (
+            word_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            spelling TEXT NOT NULL,
+            meaning_cn TEXT,
+            pos TEXT,
+            audio_path_uk TEXT,
+            audio_path_us TEXT,
+            list_id INTEGER,
+            FOREIGN KEY (list_id) REFERENCES WordLists(list_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password_hash TEXT NOT NULL,
+            role TEXT NOT NULL DEFAULT 'student' CHECK(role IN ('student', 'admin'))
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ErrorLogs (
+            error_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER,
+            word_id INTEGER,
+            error_type TEXT,
+            student_answer TEXT,
+            error_date TEXT,
+            FOREIGN KEY (word_id) REFERENCES Words(word_id),
+            FOREIGN KEY (student_id) REFERENCES Users(id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS StudentWordProgress (
+            progress_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER,
+            word_id INTEGER,
+            easiness_factor REAL DEFAULT 2.5,
+            interval INTEGER DEFAULT 0,
+            repetitions INTEGER DEFAULT 0,
+            next_review_date TEXT,
+            FOREIGN KEY (word_id) REFERENCES Words(word_id),
+            FOREIGN KEY (student_id) REFERENCES Users(id)
+        )
+    """)
+    # INSERT OR REPLACE 依赖 (student_id, word_id) 唯一索引
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_student_word
+        ON StudentWordProgress (student_id, word_id)
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS SRSVerificationPool (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            word_id INTEGER NOT NULL,
+            claimed_grade INTEGER NOT NULL,
+            added_date DATE DEFAULT (date('now')),
+            verification_date DATE,
+            verification_result TEXT,
+            FOREIGN KEY (student_id) REFERENCES Users (id),
+            FOREIGN KEY (word_id) REFERENCES Words (word_id)
+        )
+    """)
+
+
+def _detail_columns(conn):
+    """单词详情字段、音标字段和用户角色字段（原先由导入脚本和init_db临时添加）"""
+    for column in ['derivatives', 'root_etymology', 'mnemonic', 'comparison', 'collocation',
+                   'exam_sentence', 'exam_year_source', 'exam_options', 'exam_explanation',
+                   'tips', 'ipa']:
+        _add_column_if_missing(conn, 'Words', column, 'TEXT')
+    _add_column_if_missing(conn, 'Users', 'role', "TEXT DEFAULT 'student'")
+
+
+def _hot_path_indexes(conn):
+    """热点查询索引：错题历史、SRS到期单词、按列表取词"""
+    # (student_id, word_id, error_date) 覆盖每个单词错误次数和最近错误日期的子查询
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_errorlogs_student_word
+        ON ErrorLogs (student_id, word_id, error_date)
+    """)
+    # 错题历史按学生筛选、按日期排序和范围过滤
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_errorlogs_student_date
+        ON ErrorLogs (student_id, error_date)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_words_list_id ON Words (list_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_wordlists_book_id ON WordLists (book_id)")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_progress_student_review
+        ON StudentWordProgress (student_id, next_review_date)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_verification_student_pending
+        ON SRSVerificationPool (student_id, verification_date, added_date)
+    """)
+    # 更新查询规划器的统计信息
+    conn.execute("ANALYZE")
+
+
+def _content_versions(conn):
+    """词库内容版本号及触发器：Words/WordLists/Books 任何增删改都会让进程内的单词缓存失效"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ContentVersions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO ContentVersions (name, version) VALUES ('words', 1)")
+    for table in ['Words', 'WordLists', 'Books']:
+        for event in ['INSERT', 'UPDATE', 'DELETE']:
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_{event.lower()}_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE ContentVersions SET version = version + 1 WHERE name = 'words';
+                END
+            """)
+
+
+def _spelling_variants(conn):
+    """拼写变体表（英式/美式等）及版本触发器：变体变化同样让判分缓存失效"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS SpellingVariants (
+            variant_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            word_id INTEGER NOT NULL,
+            spelling_variant TEXT NOT NULL,
+            is_primary BOOLEAN DEFAULT 0,
+            FOREIGN KEY (word_id) REFERENCES Words(word_id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_spelling_variants_word_id ON SpellingVariants (word_id)")
+    for event in ['INSERT', 'UPDATE', 'DELETE']:
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_spellingvariants_{event.lower()}_version
+            AFTER {event} ON SpellingVariants
+            BEGIN
+                UPDATE ContentVersions SET version = version + 1 WHERE name = 'words';
+            END
+        """)
+
+
+def _write_behind_segments(conn):
+    """后台写入队列已写入的日志段，与数据写入在同一事务中登记，保证日志段只会被写入一次"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS WriteBehindSegments (
+            segment TEXT PRIMARY KEY,
+            events INTEGER NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )
+    """)
+
+
+# 从 ErrorLogs 重新计算某个（学生, 单词）的汇总行，{student_id}/{word_id} 替换为触发器中的 OLD./NEW. 字段
+_RECOMPUTE_ERROR_STATS = """
+    DELETE FROM StudentWordErrorStats WHERE student_id = {student_id} AND word_id = {word_id};
+    INSERT INTO StudentWordErrorStats (student_id, word_id, error_count, first_error_date, last_error_date, last_answer)
+    SELECT student_id, word_id, COUNT(*), MIN(error_date), MAX(error_date),
+           (SELECT student_answer FROM ErrorLogs
+            WHERE student_id = {student_id} AND word_id = {word_id}
+            ORDER BY error_date DESC, error_id DESC LIMIT 1)
+    FROM ErrorLogs
+    WHERE student_id = {student_id} AND word_id = {word_id}
+    GROUP BY student_id, word_id;
+"""
+
+
+def rebuild_error_stats(conn):
+    """从 ErrorLogs 全量重建 StudentWordErrorStats（调用方负责事务），返回汇总行数"""
+    conn.execute("DELETE FROM StudentWordErrorStats")
+    conn.execute("""
+        INSERT INTO StudentWordErrorStats (student_id, word_id, error_count, first_error_date, last_error_date, last_answer)
+        SELECT e.student_id, e.word_id, COUNT(*), MIN(e.error_date), MAX(e.error_date),
+               (SELECT student_answer FROM ErrorLogs
+                WHERE student_id = e.student_id AND word_id = e.word_id
+                ORDER BY error_date DESC, error_id DESC LIMIT 1)
+        FROM ErrorLogs e
+        GROUP BY e.student_id, e.word_id
+    """)
+    return conn.execute("SELECT COUNT(*) FROM StudentWordErrorStats").fetchone()[0]
+
+
+def _error_stats(conn):
+    """每个学生每个单词的错误汇总（错误次数、首次/最近错误日期、最近一次错误答案），由触发器增量维护"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS StudentWordErrorStats (
+            student_id INTEGER NOT NULL,
+            word_id INTEGER NOT NULL,
+            error_count INTEGER NOT NULL DEFAULT 0,
+            first_error_date TEXT,
+            last_error_date TEXT,
+            last_answer TEXT,
+            PRIMARY KEY (student_id, word_id)
+        )
+    """)
+    # 按错误次数排序的错词列表（错题历史的单词汇总）
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_error_stats_student_count
+        ON StudentWordErrorStats (student_id, error_count, last_error_date)
+    """)
+    # 新增错误：累加次数并更新最近错误日期和答案
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_errorlogs_insert_stats
+        AFTER INSERT ON ErrorLogs
+        BEGIN
+            INSERT INTO StudentWordErrorStats (student_id, word_id, error_count, first_error_date, last_error_date, last_answer)
+            VALUES (NEW.student_id, NEW.word_id, 1, NEW.error_date, NEW.error_date, NEW.student_answer)
+            ON CONFLICT(student_id, word_id) DO UPDATE SET
+                error_count = error_count + 1,
+                first_error_date = MIN(first_error_date, excluded.first_error_date),
+                last_answer = CASE WHEN excluded.last_error_date >= last_error_date
+                                   THEN excluded.last_answer ELSE last_answer END,
+                last_error_date = MAX(last_error_date, excluded.last_error_date);
+        END
+    """)
+    # 删除或修改错误记录（清理、同步脚本）较少发生，直接按（学生, 单词）重新计算
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_errorlogs_delete_stats
+        AFTER DELETE ON ErrorLogs
+        BEGIN
+            {_RECOMPUTE_ERROR_STATS.format(student_id='OLD.student_id', word_id='OLD.word_id')}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_errorlogs_update_stats
+        AFTER UPDATE ON ErrorLogs
+        BEGIN
+            {_RECOMPUTE_ERROR_STATS.format(student_id='OLD.student_id', word_id='OLD.word_id')}
+            {_RECOMPUTE_ERROR_STATS.format(student_id='NEW.student_id', word_id='NEW.word_id')}
+        END
+    """)
+    rebuild_error_stats(conn)
+
+
+def _analyze_error_stats(conn):
+    """收集错误汇总表的统计信息，让错题历史的分页查询按日期索引顺序读取而不是先排序"""
+    conn.execute("ANALYZE StudentWordErrorStats")
+
+
+# 错误记录所属的（日期, 列表），{row} 替换为触发器中的 OLD/NEW
+_DAILY_KEY = "substr({row}.error_date, 1, 10), {row}.student_id, COALESCE((SELECT list_id FROM Words WHERE word_id = {row}.word_id), 0)"
+
+
+def _daily_study_stats(conn):
+    """按天、学生、列表汇总的学习统计，供管理员仪表盘按日期范围读取
+
+    errors 由 ErrorLogs 上的触发器维护；attempts（答题数）和 tests（测试次数）只有提交测试时才知道，
+    由 submissions.record_results() 写入。没有列表的单词记在 list_id=0 下，游客（student_id=-1）不统计。
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS DailyStudyStats (
+            day TEXT NOT NULL,
+            student_id INTEGER NOT NULL,
+            list_id INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            errors INTEGER NOT NULL DEFAULT 0,
+            tests INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, student_id, list_id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_stats_student_day ON DailyStudyStats (student_id, day)")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_errorlogs_insert_daily
+        AFTER INSERT ON ErrorLogs
+        WHEN NEW.student_id != -1 AND NEW.error_date IS NOT NULL
+        BEGIN
+            INSERT INTO DailyStudyStats (day, student_id, list_id, errors)
+            VALUES ({_DAILY_KEY.format(row='NEW')}, 1)
+            ON CONFLICT(day, student_id, list_id) DO UPDATE SET errors = errors + 1;
+        END
+    """)
+    decrement = f"""
+            UPDATE DailyStudyStats SET errors = MAX(errors - 1, 0)
+            WHERE (day, student_id, list_id) = ({_DAILY_KEY.format(row='OLD')});
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_errorlogs_delete_daily
+        AFTER DELETE ON ErrorLogs
+        WHEN OLD.student_id != -1 AND OLD.error_date IS NOT NULL
+        BEGIN
+            {decrement}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_errorlogs_update_daily_old
+        AFTER UPDATE OF student_id, word_id, error_date ON ErrorLogs
+        WHEN OLD.student_id != -1 AND OLD.error_date IS NOT NULL
+        BEGIN
+            {decrement}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_errorlogs_update_daily_new
+        AFTER UPDATE OF student_id, word_id, error_date ON ErrorLogs
+        WHEN NEW.student_id != -1 AND NEW.error_date IS NOT NULL
+        BEGIN
+            INSERT INTO DailyStudyStats (day, student_id, list_id, errors)
+            VALUES ({_DAILY_KEY.format(row='NEW')}, 1)
+            ON CONFLICT(day, student_id, list_id) DO UPDATE SET errors = errors + 1;
+        END
+    """)
+    # 回填历史数据：历史上没有记录答题总数，attempts 为0（正确率只按有答题数的日期计算）；
+    # 同一次提交的错误写入时间相同，测试次数按不同的错误时间估算
+    conn.execute("""
+        INSERT OR REPLACE INTO DailyStudyStats (day, student_id, list_id, attempts, errors, tests)
+        SELECT substr(e.error_date, 1, 10), e.student_id, COALESCE(w.list_id, 0), 0,
+               COUNT(*), COUNT(DISTINCT e.error_date)
+        FROM ErrorLogs e
+        LEFT JOIN Words w ON w.word_id = e.word_id
+        WHERE e.student_id != -1 AND e.error_date IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+    conn.execute("ANALYZE DailyStudyStats")
+
+
+# 版本号必须递增，已发布的迁移不要修改，新的结构变更追加新步骤
+MIGRATIONS = [
+    (1, 'baseline_schema', _baseline_schema),
+    (2, 'detail_columns', _detail_columns),
+    (3, 'hot_path_indexes', _hot_path_indexes),
+    (4, 'content_versions', _content_versions),
+    (5, 'spelling_variants', _spelling_variants),
+    (6, 'write_behind_segments', _write_behind_segments),
+    (7, 'error_stats', _error_stats),
+    (8, 'analyze_error_stats', _analyze_error_stats),
+    (9, 'daily_study_stats', _daily_study_stats),
+]
+
+
+# --- 迁移执行 ---
+def _ensure_version_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS SchemaMigrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )
+    """)
+    conn.commit()
+
+
+def applied_versions(conn):
+    """返回已执行的迁移版本集合"""
+    _ensure_version_table(conn)
+    return {row[0] for row in conn.execute("SELECT version FROM SchemaMigrations").fetchall()}
+
+
+def run_migrations(conn):
+    """按版本顺序执行所有未完成的迁移，每个迁移在独立的写事务中执行，返回本次执行的版本列表"""
+    done = applied_versions(conn)
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version in done:
+            continue
+
+        def _apply(conn, version=version, name=name, step=step):
+            # 多个Worker同时启动时，拿到写锁后再确认一次
+            if conn.execute("SELECT 1 FROM SchemaMigrations WHERE version = ?", (version,)).fetchone():
+                return False
+            step(conn)
+            conn.execute("INSERT INTO SchemaMigrations (version, name) VALUES (?, ?)", (version, name))
+            return True
+
+        if db.writer.run(conn, _apply):
+            logger.info(f"已执行数据库迁移: {version:03d}_{name}")
+            applied.append(version)
+    return applied
+
+
+# --- 查询计划报告 ---
+# 各API的代表性查询（与app.py中的SQL保持一致），用于确认热点查询都走索引
+API_QUERIES = {
+    'questions (list word ids)': (
+        "SELECT word_id FROM Words WHERE list_id = ? ORDER BY word_id", (1,)),
+    'word cache (load by id)': ("""
+        SELECT w.word_id, w.spelling, w.list_id, wl.list_name, wl.book_id, b.book_name
+        FROM Words w
+        LEFT JOIN WordLists wl ON w.list_id = wl.list_id
+        LEFT JOIN Books b ON wl.book_id = b.book_id
+        WHERE w.word_id IN (?, ?, ?)
+    """, (1, 2, 3)),
+    'content version': ("SELECT version FROM ContentVersions WHERE name = ?", ('words',)),
+    'questions (error_review)': ("""
+        SELECT s.word_id, s.error_count, s.last_error_date
+        FROM StudentWordErrorStats s
+        INNER JOIN Words w ON w.word_id = s.word_id
+        WHERE w.list_id = ? AND s.student_id = ?
+        ORDER BY s.error_count DESC, s.last_error_date DESC
+    """, (1, 1)),
+    'submit (spelling lookup)': ("SELECT word_id, spelling FROM Words WHERE word_id IN (?, ?, ?)", (1, 2, 3)),
+    'grader (spelling variants)': (
+        "SELECT word_id, spelling_variant FROM SpellingVariants WHERE word_id IN (?, ?, ?)", (1, 2, 3)),
+    'submit (progress lookup)': ("""
+        SELECT word_id, repetitions, interval FROM StudentWordProgress
+        WHERE student_id = ? AND word_id IN (?, ?, ?)
+    """, (1, 1, 2, 3)),
+    'error-stats': ("""
+        SELECT COUNT(*), COALESCE(SUM(s.error_count), 0)
+        FROM StudentWordErrorStats s
+        JOIN Words w ON s.word_id = w.word_id
+        WHERE s.student_id = ? AND w.list_id = ?
+    """, (1, 1)),
+    'error-history (errors)': ("""
+        SELECT e.error_id, e.word_id, e.error_date, s.error_count
+        FROM ErrorLogs e
+        JOIN StudentWordErrorStats s ON s.student_id = e.student_id AND s.word_id = e.word_id
+        JOIN Words w ON e.word_id = w.word_id
+        LEFT JOIN WordLists wl ON w.list_id = wl.list_id
+        WHERE e.student_id = ? AND e.error_date >= ? AND e.error_date <= ?
+        ORDER BY e.error_date DESC, e.error_id DESC LIMIT ?
+    """, (1, '2025-01-01', '2025-12-31 23:59:59', 51)),
+    'error-history (next page)': ("""
+        SELECT e.error_id, e.word_id, e.error_date, s.error_count
+        FROM ErrorLogs e
+        JOIN StudentWordErrorStats s ON s.student_id = e.student_id AND s.word_id = e.word_id
+        JOIN Words w ON e.word_id = w.word_id
+        LEFT JOIN WordLists wl ON w.list_id = wl.list_id
+        WHERE e.student_id = ? AND (e.error_date, e.error_id) < (?, ?)
+        ORDER BY e.error_date DESC, e.error_id DESC LIMIT ?
+    """, (1, '2025-07-10 00:00:00', 1000, 51)),
+    'error-history (word history)': ("""
+        SELECT s.word_id, s.error_count as total_errors
+        FROM StudentWordErrorStats s
+        JOIN Words w ON s.word_id = w.word_id
+        LEFT JOIN WordLists wl ON w.list_id = wl.list_id
+        WHERE s.student_id = ?
+        ORDER BY s.error_count DESC LIMIT 20
+    """, (1,)),
+    'error-history (word history details)': ("""
+        SELECT word_id, GROUP_CONCAT(student_answer, ', '), GROUP_CONCAT(error_date, ', ')
+        FROM ErrorLogs
+        WHERE student_id = ? AND word_id IN (?, ?, ?)
+        GROUP BY word_id
+    """, (1, 1, 2, 3)),
+    'error-history (total tested)': (
+        "SELECT COUNT(*) FROM StudentWordErrorStats WHERE student_id = ?", (1,)),
+    'srs/progress': ("""
+        SELECT COUNT(*), SUM(CASE WHEN next_review_date <= date('now') THEN 1 ELSE 0 END)
+        FROM StudentWordProgress WHERE student_id = ?
+    """, (1,)),
+    'srs/due-words (errors)': ("""
+        SELECT w.word_id, p.repetitions, p.interval, p.next_review_date,
+               s.error_count, s.last_error_date
+        FROM StudentWordProgress p
+        JOIN Words w ON p.word_id = w.word_id
+        JOIN StudentWordErrorStats s ON s.student_id = p.student_id AND s.word_id = p.word_id
+        WHERE p.student_id = ?
+        ORDER BY s.error_count DESC, s.last_error_date DESC, p.next_review_date ASC
+        LIMIT ?
+    """, (1, 10)),
+    'srs/due-words (due)': ("""
+        SELECT w.word_id
+        FROM StudentWordProgress p
+        JOIN Words w ON p.word_id = w.word_id
+        WHERE p.student_id = ? AND p.next_review_date <= date('now')
+        ORDER BY p.next_review_date ASC, p.repetitions ASC
+        LIMIT ?
+    """, (1, 10)),
+    'srs/verification-candidates': ("""
+        SELECT vp.word_id, vp.claimed_grade, w.spelling, w.meaning_cn
+        FROM SRSVerificationPool vp
+        JOIN Words w ON vp.word_id = w.word_id
+        WHERE vp.student_id = ? AND vp.verification_date IS NULL
+        ORDER BY vp.added_date ASC
+        LIMIT ?
+    """, (1, 5)),
+    'admin dashboard (daily trend)': ("""
+        SELECT day, SUM(attempts), SUM(CASE WHEN attempts > 0 THEN errors ELSE 0 END), SUM(tests)
+        FROM DailyStudyStats
+        WHERE day BETWEEN ? AND ?
+        GROUP BY day
+    """, ('2025-06-16', '2025-07-15')),
+    'admin student (daily trend)': ("""
+        SELECT day, SUM(attempts), SUM(CASE WHEN attempts > 0 THEN errors ELSE 0 END), SUM(tests)
+        FROM DailyStudyStats
+        WHERE day BETWEEN ? AND ? AND student_id = ?
+        GROUP BY day
+    """, ('2025-07-01', '2025-07-15', 1)),
+    'admin student (list stats)': ("""
+        SELECT list_id, SUM(attempts), SUM(CASE WHEN attempts > 0 THEN errors ELSE 0 END)
+        FROM DailyStudyStats
+        WHERE student_id = ?
+        GROUP BY list_id
+    """, (1,)),
+    'admin student (recent errors)': ("""
+        SELECT error_id, error_date, word_id, student_answer
+        FROM ErrorLogs
+        WHERE student_id = ?
+        ORDER BY error_date DESC, error_id DESC
+        LIMIT 20
+    """, (1,)),
+    'login': ("SELECT * FROM Users WHERE username = ?", ('admin',)),
+}
+
+# 数据量很小的字典表，全表扫描可以接受
+SMALL_TABLES = {'Books', 'WordLists', 'Users'}
+
+
+def _scanned_tables(plan_details):
+    """从查询计划中找出全表扫描的表（"SCAN 表名" 且没有使用索引）"""
+    tables = []
+    for detail in plan_details:
+        parts = detail.split()
+        if len(parts) >= 2 and parts[0] == 'SCAN' and 'USING' not in parts:
+            tables.append(parts[1])
+    return tables
+
+
+def explain_api_queries(conn):
+    """对每个API查询执行 EXPLAIN QUERY PLAN，返回 [{name, plan, full_scans}]"""
+    aliases = {'w': 'Words', 'e': 'ErrorLogs', 'p': 'StudentWordProgress', 'wl': 'WordLists',
+               'b': 'Books', 'vp': 'SRSVerificationPool'}
+    report = []
+    for name, (sql, params) in API_QUERIES.items():
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        scans = [aliases.get(t, t) for t in _scanned_tables(plan)]
+        report.append({
+            'name': name,
+            'plan': plan,
+            'full_scans': [t for t in scans if t not in SMALL_TABLES],
+        })
+    return report
+
+
+# --- 命令行入口 ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='数据库迁移工具')
+    parser.add_argument('command', choices=['upgrade', 'status', 'explain', 'rebuild-error-stats'], help='要执行的操作')
+    parser.add_argument('--database', default=config.DATABASE_PATH, help='数据库文件路径')
+    parser.add_argument('--strict', action='store_true', help='explain时如存在全表扫描则返回非零退出码')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    conn = sqlite3.connect(args.database)
+    conn.row_factory = sqlite3.Row
+    try:
+        if args.command == 'upgrade':
+            applied = run_migrations(conn)
+            print(f"已执行 {len(applied)} 个迁移" if applied else "数据库已是最新版本")
+        elif args.command == 'rebuild-error-stats':
+            count = db.writer.run(conn, rebuild_error_stats)
+            print(f"已重建错误汇总: {count} 个（学生, 单词）")
+        elif args.command == 'status':
+            done = applied_versions(conn)
+            for version, name, _ in MIGRATIONS:
+                print(f"[{'x' if version in done else ' '}] {version:03d}_{name}")
+        else:
+            report = explain_api_queries(conn)
+            has_scans = False
+            for item in report:
+                print(f"== {item['name']}")
+                for detail in item['plan']:
+                    print(f"   {detail}")
+                if item['full_scans']:
+                    has_scans = True
+                    print(f"   !! 全表扫描: {', '.join(item['full_scans'])}")
+            if args.strict and has_scans:
+                return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+PDF导出缓存 - 按导出内容的摘要缓存生成的PDF，同样的导出直接从磁盘返回
+
+老师会在同一天为同一个学生、同一个列表反复导出当日错词考核纸，内容完全相同。
+缓存key是渲染参数（错词记录、字段、是否隐藏单词、标题——包含用户名、日期和书本/列表名）
+加上 pdf_templates.TEMPLATE_VERSION 的sha256，版式变化后旧的缓存自然失效。
+PDF由进程池子进程生成后写入缓存（cache/<key>.pdf），命中时更新文件的修改时间，
+总大小超过上限时按修改时间从旧到新删除，直到低于上限的90%。文件名就是key，多个Worker进程共用，不需要索引。
+
+    python pdf_cache.py stats     # 查看缓存大小和文件数
+    python pdf_cache.py evict     # 立即按上限淘汰
+    python pdf_cache.py clear     # 清空缓存
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+
+import config
+import pdf_templates
+
+logger = logging.getLogger(__name__)
+
+# 淘汰时删除到上限的这个比例以下，避免每次写入都触发淘汰
+_LOW_WATERMARK = 0.9
+
+
+def cache_key(spec):
+    """渲染参数（pdf_templates.render_error_sheet 的参数）的内容摘要"""
+    content = json.dumps({'template': pdf_templates.TEMPLATE_VERSION, 'spec': spec},
+                         ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class PDFCache:
+    """按内容摘要存放的PDF文件，命中统计按Worker进程计算"""
+
+    def __init__(self, root, max_bytes=0, enabled=True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # 写入和淘汰发生在进程池子进程中，Worker进程只统计查找的命中情况
+        self._metrics = {'hits': 0, 'misses': 0}
+
+    def path(self, key):
+        return os.path.join(self.root, f"{key}.pdf")
+
+    def lookup(self, key):
+        """返回缓存的PDF路径，未缓存时返回None"""
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        try:
+            # 修改时间作为最近使用时间
+            os.utime(path)
+        except FileNotFoundError:
+            path = None
+        with self._lock:
+            self._metrics['hits' if path else 'misses'] += 1
+        return path
+
+    def put(self, key, data):
+        """写入生成的PDF（先写临时文件再原子替换），超过上限时淘汰旧文件"""
+        if not self.enabled:
+            return None
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        if self.max_bytes:
+            self.evict()
+        return path
+
+    def _entries(self):
+        """返回 [(修改时间, 大小, 路径)]"""
+        entries = []
+        names = os.listdir(self.root) if os.path.isdir(self.root) else []
+        for name in names:
+            if not name.endswith('.pdf'):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self, max_bytes=None):
+        """总大小超过上限时按最近使用时间淘汰，返回删除的文件数"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if not max_bytes:
+            return 0
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= max_bytes:
+            return 0
+        target = int(max_bytes * _LOW_WATERMARK)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            removed += 1
+        logger.info(f"PDF缓存超过上限，已淘汰 {removed} 个文件")
+        return removed
+
+    def clear(self):
+        """删除全部缓存文件，返回删除的文件数"""
+        removed = 0
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    # --- 指标 ---
+    def stats(self):
+        """返回本进程的命中、未命中次数和缓存目录中的文件数、总大小"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        entries = self._entries()
+        metrics['entries'] = len(entries)
+        metrics['bytes'] = sum(size for _, size, _ in entries)
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = round(metrics['hits'] / lookups, 4) if lookups else 0.0
+        metrics['max_bytes'] = self.max_bytes
+        metrics['enabled'] = self.enabled
+        return metrics
+
+
+cache = PDFCache(config.PDF_CACHE_DIR, max_bytes=config.PDF_CACHE_MAX_MB * 1024 * 1024,
+                 enabled=config.PDF_CACHE_ENABLED)
+
+
+# --- 命令行入口 ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='PDF导出缓存维护')
+    parser.add_argument('command', choices=['stats', 'evict', 'clear'], help='要执行的操作')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.command == 'evict':
+        print(f"已淘汰: {cache.evict()} 个文件")
+    elif args.command == 'clear':
+        print(f"已删除: {cache.clear()} 个文件")
+    stats = cache.stats()
+    print(f"文件数 {stats['entries']}，总大小 {stats['bytes'] / 1024 / 1024:.1f}MB，"
+          f"上限 {stats['max_bytes'] / 1024 / 1024:.0f}MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
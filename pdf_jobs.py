@@ -0,0 +1,481 @@
+"""
+PDF导出任务 - 在独立的进程池中生成PDF，请求线程只负责提交任务和查询状态
+
+reportlab排版是纯CPU计算，几百条错词需要数秒，以前直接在请求线程中执行会占住一个sync Worker。
+现在每个Worker进程有一个小的进程池：Linux上子进程从forkserver派生（forkserver预先导入 pdf_templates 和reportlab，
+不继承Worker进程中的线程和数据库连接），Windows上使用spawn。
+任务状态和生成的PDF写在 PDF_JOB_DIR 目录中（<job_id>.json / <job_id>.pdf），
+因此提交任务和查询状态、下载的请求可以落在不同的Worker上。
+
+每个学生同时进行的任务数有上限（跨进程用文件锁保证），超过时 submit() 抛出 PDFJobLimitError。
+每个任务记录排队耗时、渲染耗时和文件大小；超过 PDF_JOB_TTL 秒的任务文件会被清理。
+
+批量任务（submit_batch，管理员为整个班级导出）把每个学生的考核纸作为一个子任务并行生成，
+子任务的PDF先写到 <job_id>.<序号>.part（已缓存的考核纸在提交时硬链接过来），
+任务记录中的 completed/total 反映进度，全部完成后打包成 <job_id>.zip。
+"""
+import concurrent.futures
+import contextlib
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import fcntl
+except ImportError:  # Windows本地开发环境没有fcntl，只做进程内串行化
+    fcntl = None
+
+import config
+import pdf_cache
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+# 任务输出文件的扩展名和类型
+OUTPUT_TYPES = {'pdf': 'application/pdf', 'zip': 'application/zip'}
+# 清理过期任务文件的最小间隔（秒）
+_CLEANUP_INTERVAL = 60.0
+
+
+class PDFJobLimitError(Exception):
+    """学生同时进行的导出任务过多"""
+
+
+# --- 任务文件 ---
+def _job_path(job_dir, job_id, extension):
+    return os.path.join(job_dir, f"{job_id}.{extension}")
+
+
+def output_type(job):
+    """任务生成的文件类型（OUTPUT_TYPES的key）：批量任务为zip，其余为PDF"""
+    return 'zip' if job.get('kind') == 'batch' else 'pdf'
+
+
+def _part_path(job_dir, job_id, index):
+    return os.path.join(job_dir, f"{job_id}.{index}.part")
+
+
+def _write_file(path, data):
+    """先写临时文件再原子替换，读取方不会读到写了一半的文件"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _link_or_copy(src, dst):
+    """把src硬链接到dst（不在同一文件系统时复制），之后src被删除也不影响dst；src不存在时抛出FileNotFoundError"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _write_status(job_dir, job):
+    _write_file(_job_path(job_dir, job['job_id'], 'json'), json.dumps(job, ensure_ascii=False).encode())
+
+
+def read_status(job_dir, job_id):
+    """读取任务记录，不存在时返回None"""
+    try:
+        with open(_job_path(job_dir, job_id, 'json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+# --- 子进程 ---
+def _mp_context():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['pdf_templates', 'pdf_cache'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def _init_worker():
+    import pdf_templates
+    pdf_templates.init_worker()
+
+
+def _run_job(job_dir, job, spec):
+    """在子进程中执行：生成PDF并更新任务记录，返回最终的任务记录；任务有cache_key时同时写入PDF缓存"""
+    import pdf_templates
+
+    job = dict(job, status=RUNNING, started_at=time.time())
+    job['queue_ms'] = round((job['started_at'] - job['created_at']) * 1000, 1)
+    _write_status(job_dir, job)
+    start = time.perf_counter()
+    try:
+        pdf_data = pdf_templates.render_error_sheet(**spec)
+        _write_file(_job_path(job_dir, job['job_id'], 'pdf'), pdf_data)
+        job.update(status=DONE, size=len(pdf_data))
+    except Exception as e:
+        job.update(status=FAILED, error=str(e))
+    job.update(finished_at=time.time(), render_ms=round((time.perf_counter() - start) * 1000, 1))
+    _write_status(job_dir, job)
+    if job['status'] == DONE and job.get('cache_key'):
+        try:
+            pdf_cache.cache.put(job['cache_key'], pdf_data)
+        except OSError as e:
+            logger.warning(f"写入PDF缓存失败: {e}")
+    return job
+
+
+def _run_part(path, spec, cache_key):
+    """在子进程中执行：生成批量任务中的一份PDF写到path，返回 (渲染耗时ms, 大小)"""
+    import pdf_templates
+
+    start = time.perf_counter()
+    pdf_data = pdf_templates.render_error_sheet(**spec)
+    _write_file(path, pdf_data)
+    render_ms = round((time.perf_counter() - start) * 1000, 1)
+    if cache_key:
+        try:
+            pdf_cache.cache.put(cache_key, pdf_data)
+        except OSError as e:
+            logger.warning(f"写入PDF缓存失败: {e}")
+    return render_ms, len(pdf_data)
+
+
+# --- 任务管理 ---
+class PDFJobManager:
+    """按Worker进程划分的PDF任务进程池"""
+
+    def __init__(self, job_dir, max_workers=2, max_jobs_per_student=2, timeout=300.0, ttl=3600.0,
+                 max_tasks_per_child=50):
+        self.job_dir = job_dir
+        self.max_workers = max(1, max_workers)
+        self.max_jobs_per_student = max(1, max_jobs_per_student)
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_tasks_per_child = max_tasks_per_child
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        # job_id → Future，只包含本进程提交的任务
+        self._futures = {}
+        self._last_cleanup = 0.0
+        self._metrics = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'render_ms_total': 0.0,
+            'render_ms_max': 0.0,
+            'queue_ms_max': 0.0,
+            'bytes_total': 0,
+            'batches': 0,
+            'batch_sheets': 0,
+        }
+        # job_id → 批量任务的进度（只包含本进程提交的批量任务）
+        self._batches = {}
+
+    def _ensure_executor(self):
+        """调用方需持有锁；gunicorn preload_app 下进程池不会随fork复制，按进程创建"""
+        if self._pid != os.getpid() or self._executor is None:
+            self._pid = os.getpid()
+            self._futures = {}
+            self._batches = {}
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=_mp_context(),
+                initializer=_init_worker,
+                max_tasks_per_child=self.max_tasks_per_child or None,
+            )
+        return self._executor
+
+    @contextlib.contextmanager
+    def _submit_lock(self):
+        """检查并发数和创建任务记录期间持有的跨进程文件锁"""
+        with open(os.path.join(self.job_dir, '.submit.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            yield
+
+    def _is_expired(self, job):
+        timeout = job.get('timeout', self.timeout)
+        return job['status'] in ACTIVE_STATUSES and time.time() - job['created_at'] > timeout
+
+    def _iter_jobs(self):
+        for name in os.listdir(self.job_dir):
+            if name.endswith('.json'):
+                job = read_status(self.job_dir, name[:-5])
+                if job is not None:
+                    yield job
+
+    def active_jobs(self, student_id):
+        """返回学生正在排队或生成中的任务"""
+        return [job for job in self._iter_jobs()
+                if job['student_id'] == student_id and job['status'] in ACTIVE_STATUSES and not self._is_expired(job)]
+
+    def cleanup(self):
+        """删除超过保留时间的任务文件，返回删除的任务数"""
+        removed = 0
+        now = time.time()
+        for job in list(self._iter_jobs()):
+            if now - job['created_at'] <= self.ttl:
+                continue
+            paths = [_job_path(self.job_dir, job['job_id'], extension) for extension in tuple(OUTPUT_TYPES) + ('json',)]
+            for path in paths + glob.glob(_part_path(self.job_dir, job['job_id'], '*')):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            removed += 1
+        return removed
+
+    def _maybe_cleanup(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_cleanup < _CLEANUP_INTERVAL:
+                return
+            self._last_cleanup = now
+        removed = self.cleanup()
+        if removed:
+            logger.info(f"已清理 {removed} 个过期的PDF任务")
+
+    def _create_job(self, student_id, **fields):
+        """检查学生的并发任务数并写入排队中的任务记录"""
+        os.makedirs(self.job_dir, exist_ok=True)
+        self._maybe_cleanup()
+        with self._submit_lock():
+            active = self.active_jobs(student_id)
+            if len(active) >= self.max_jobs_per_student:
+                with self._lock:
+                    self._metrics['rejected'] += 1
+                raise PDFJobLimitError(f"学生 {student_id} 已有 {len(active)} 个导出任务正在进行")
+            job = dict(fields, job_id=uuid.uuid4().hex, student_id=student_id, status=QUEUED, created_at=time.time())
+            _write_status(self.job_dir, job)
+        return job
+
+    def submit(self, student_id, spec, filename, cache_key=None):
+        """提交导出任务，返回任务记录；spec为 pdf_templates.render_error_sheet 的参数，
+        cache_key为 pdf_cache.cache_key(spec)，生成的PDF会同时写入缓存"""
+        job = self._create_job(student_id, filename=filename, rows=len(spec['errors']), cache_key=cache_key)
+        try:
+            with self._lock:
+                future = self._ensure_executor().submit(_run_job, self.job_dir, job, spec)
+                self._futures[job['job_id']] = future
+                self._metrics['submitted'] += 1
+        except Exception as e:
+            self._fail(job, e)
+            raise
+        future.add_done_callback(lambda future: self._job_done(job, future))
+        return job
+
+    def submit_batch(self, owner_id, sheets, filename):
+        """提交批量导出任务，返回任务记录；sheets为 [(文件名, spec)]，已缓存的PDF直接使用，
+        其余在进程池中并行生成，全部完成后打包成zip（生成失败的考核纸记录在 failed_sheets 中）"""
+        total = len(sheets)
+        job = self._create_job(
+            owner_id, kind='batch', filename=filename, rows=sum(len(spec['errors']) for _, spec in sheets),
+            total=total, completed=0, failed_sheets=[],
+            # 每个子进程依次处理若干份，按份数放宽超时
+            timeout=self.timeout * max(1, -(-total // self.max_workers)) if total else self.timeout,
+        )
+        batch = {'job': job, 'sheets': [], 'render_ms': 0.0}
+        pending = []
+        for index, (sheet_name, spec) in enumerate(sheets):
+            key = pdf_cache.cache_key(spec)
+            cached_path = pdf_cache.cache.lookup(key)
+            part_path = _part_path(self.job_dir, job['job_id'], index)
+            batch['sheets'].append((sheet_name, part_path))
+            # 已缓存的考核纸现在就链接到子任务文件，打包前缓存文件可能已被淘汰
+            if cached_path:
+                try:
+                    _link_or_copy(cached_path, part_path)
+                    job['completed'] += 1
+                    continue
+                except FileNotFoundError:
+                    pass
+            pending.append((index, spec, key))
+
+        with self._lock:
+            self._metrics['batches'] += 1
+            self._metrics['batch_sheets'] += total
+            self._batches[job['job_id']] = batch
+        if not pending:
+            self._finish_batch(job['job_id'])
+            return self._batches_pop(job['job_id'])['job']
+        try:
+            with self._lock:
+                executor = self._ensure_executor()
+                # 进程池可能刚因fork重建，重新登记
+                self._batches[job['job_id']] = batch
+                futures = [(index, executor.submit(_run_part, batch['sheets'][index][1], spec, key))
+                           for index, spec, key in pending]
+        except Exception as e:
+            self._batches_pop(job['job_id'])
+            self._fail(job, e)
+            raise
+        for index, future in futures:
+            future.add_done_callback(lambda future, index=index: self._part_done(job['job_id'], index, future))
+        return job
+
+    def _batches_pop(self, job_id):
+        with self._lock:
+            return self._batches.pop(job_id, None)
+
+    def _part_done(self, job_id, index, future):
+        """批量任务中一份考核纸完成，更新进度；全部完成时打包"""
+        error = future.exception()
+        # 任务已被 status() 标记为超时失败时不再覆盖任务记录
+        current = read_status(self.job_dir, job_id)
+        if current is not None and current['status'] not in ACTIVE_STATUSES:
+            if self._batches_pop(job_id) is not None:
+                logger.warning(f"批量PDF任务 {job_id} 已结束（{current['status']}），丢弃后续生成的考核纸")
+            for path in glob.glob(_part_path(self.job_dir, job_id, '*')):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+            return
+        with self._lock:
+            batch = self._batches.get(job_id)
+            if batch is None:
+                return
+            job = batch['job']
+            if error is None:
+                render_ms, _ = future.result()
+                batch['render_ms'] += render_ms
+                self._metrics['render_ms_max'] = max(self._metrics['render_ms_max'], render_ms)
+            else:
+                job['failed_sheets'].append(batch['sheets'][index][0])
+                if isinstance(error, BrokenProcessPool):
+                    self._executor = None
+            job['completed'] += 1
+            job['status'] = RUNNING
+            finished = job['completed'] >= job['total']
+            if not finished:
+                _write_status(self.job_dir, job)
+        if error is not None:
+            logger.error(f"批量PDF任务 {job_id} 中的考核纸生成失败: {batch['sheets'][index][0]}, 错误: {error}")
+        if finished:
+            self._finish_batch(job_id)
+            self._batches_pop(job_id)
+
+    def _finish_batch(self, job_id):
+        """把已生成的考核纸打包成zip（PDF已经压缩过，zip中直接存储），删除临时文件"""
+        with self._lock:
+            batch = self._batches[job_id]
+        job = batch['job']
+        failed = set(job['failed_sheets'])
+        sheets = [(name, path) for name, path in batch['sheets'] if name not in failed]
+        try:
+            if not sheets:
+                raise RuntimeError('所有考核纸都生成失败')
+            zip_path = _job_path(self.job_dir, job_id, 'zip')
+            tmp_path = f"{zip_path}.{os.getpid()}.tmp"
+            with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED) as archive:
+                for name, path in sheets:
+                    archive.write(path, name)
+            os.replace(tmp_path, zip_path)
+            job.update(status=DONE, size=os.path.getsize(zip_path))
+        except Exception as e:
+            job.update(status=FAILED, error=str(e))
+        for path in glob.glob(_part_path(self.job_dir, job_id, '*')):
+            os.remove(path)
+        job.update(finished_at=time.time(), render_ms=round(batch['render_ms'], 1))
+        _write_status(self.job_dir, job)
+        with self._lock:
+            self._metrics['completed' if job['status'] == DONE else 'failed'] += 1
+            self._metrics['render_ms_total'] += batch['render_ms']
+            if job['status'] == DONE:
+                self._metrics['bytes_total'] += job['size']
+        if job['status'] == DONE:
+            logger.info(f"批量PDF任务完成: {job_id}, {job['total']}份考核纸（失败 {len(failed)} 份）, "
+                        f"渲染 {batch['render_ms']:.0f}ms, 大小 {job['size'] / 1024:.1f}KB")
+        else:
+            logger.error(f"批量PDF任务失败: {job_id}, 错误: {job.get('error')}")
+
+    def _fail(self, job, error):
+        """子进程异常退出等情况下由父进程记录失败；进程池已损坏时下次提交重新创建"""
+        _write_status(self.job_dir, dict(job, status=FAILED, error=str(error) or type(error).__name__,
+                                         finished_at=time.time()))
+        with self._lock:
+            self._metrics['failed'] += 1
+            if isinstance(error, BrokenProcessPool):
+                self._executor = None
+
+    def _job_done(self, job, future):
+        with self._lock:
+            self._futures.pop(job['job_id'], None)
+        error = future.exception()
+        if error is not None:
+            logger.error(f"PDF任务异常结束: {job['job_id']}, 错误: {error}")
+            self._fail(job, error)
+            return
+        result = future.result()
+        with self._lock:
+            if result['status'] == DONE:
+                self._metrics['completed'] += 1
+                self._metrics['bytes_total'] += result['size']
+            else:
+                self._metrics['failed'] += 1
+            self._metrics['render_ms_total'] += result['render_ms']
+            self._metrics['render_ms_max'] = max(self._metrics['render_ms_max'], result['render_ms'])
+            self._metrics['queue_ms_max'] = max(self._metrics['queue_ms_max'], result['queue_ms'])
+        if result['status'] == DONE:
+            logger.info(f"PDF任务完成: {result['job_id']}, {result['rows']}条记录, 排队 {result['queue_ms']:.0f}ms, "
+                        f"渲染 {result['render_ms']:.0f}ms, 大小 {result['size'] / 1024:.1f}KB")
+        else:
+            logger.error(f"PDF任务失败: {result['job_id']}, 错误: {result.get('error')}")
+
+    def status(self, job_id):
+        """返回任务记录，不存在时返回None；超时未完成的任务标记为失败"""
+        job = read_status(self.job_dir, job_id)
+        if job is not None and self._is_expired(job):
+            job = dict(job, status=FAILED, error='任务超时', finished_at=time.time())
+            _write_status(self.job_dir, job)
+        return job
+
+    def wait(self, job_id, timeout):
+        """最多等待timeout秒（只对本进程提交的任务有效），返回任务记录"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                future.result(timeout=max(0.0, timeout))
+            except concurrent.futures.TimeoutError:
+                pass
+            except Exception:
+                pass  # 失败原因已写入任务记录
+        return self.status(job_id)
+
+    def output_path(self, job):
+        """任务生成的文件路径"""
+        return _job_path(self.job_dir, job['job_id'], output_type(job))
+
+    # --- 指标 ---
+    def stats(self):
+        """返回当前进程提交的任务数、失败数和渲染耗时"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['inflight'] = len(self._futures) if self._pid == os.getpid() else 0
+            metrics['batches_inflight'] = len(self._batches) if self._pid == os.getpid() else 0
+        finished = metrics['completed'] + metrics['failed']
+        metrics['render_ms_avg'] = round(metrics['render_ms_total'] / finished, 1) if finished else 0.0
+        for key in ('render_ms_total', 'render_ms_max', 'queue_ms_max'):
+            metrics[key] = round(metrics[key], 1)
+        metrics['max_workers'] = self.max_workers
+        metrics['max_jobs_per_student'] = self.max_jobs_per_student
+        return metrics
+
+
+manager = PDFJobManager(
+    config.PDF_JOB_DIR,
+    max_workers=config.PDF_MAX_WORKERS,
+    max_jobs_per_student=config.PDF_MAX_JOBS_PER_STUDENT,
+    timeout=config.PDF_JOB_TIMEOUT,
+    ttl=config.PDF_JOB_TTL,
+    max_tasks_per_child=config.PDF_MAX_TASKS_PER_CHILD,
+)
@@ -0,0 +1,213 @@
+"""
+PDF版式模板 - 错词考核纸的字体、样式和表格排版
+
+中文字体、样式和缩小后的Logo每个进程只准备一次：PDF任务进程池的子进程在启动时调用 init_worker()（见 pdf_jobs.py）。
+字体由 PDF_FONT_PATH 指定，未指定时依次尝试常见的系统字体，都找不到时使用reportlab内置的CID字体。
+
+整份错词列表排成一张表格，每个单词一行（单词和各字段在同一个单元格中分行显示），表头在每页重复，
+不再为每个单词单独创建 Table 和 TableStyle。超过内容列宽度的内容预先按宽度断行，单元格都是普通字符串，
+不使用 Paragraph（段落在表格分页时会被反复重新排版）。
+
+    python scripts/debug/benchmark_pdf_render.py   # 与原来逐个单词建表的方式对比渲染耗时
+"""
+import io
+import logging
+import os
+from xml.sax.saxutils import escape
+
+from PIL import Image as PILImage
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 版式变化时加一（导出结果的缓存以此区分新旧版式）
+TEMPLATE_VERSION = 2
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# reportlab不能直接绘制SVG，使用PNG版本的Logo
+LOGO_PATH = os.path.join(BASE_DIR, 'assets', 'img', 'Logo', 'logo-original.png')
+LOGO_SIZE = (2*inch, 1*inch)
+LOGO_DPI = 150
+
+# 未配置 PDF_FONT_PATH 时依次尝试的字体（Windows宋体、文泉驿、AR PL）
+FONT_CANDIDATES = (
+    'C:\\Windows\\Fonts\\simsun.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',
+    '/usr/share/fonts/truetype/arphic/uming.ttc',
+)
+_FONT_NAME = 'CJK'
+_FALLBACK_FONT = 'STSong-Light'
+
+# 可选字段的标签（word作为每条记录的标题显示，不在这里）
+FIELD_LABELS = {
+    'meaning_cn': '中文意思',
+    'pos': '词性',
+    'ipa': '音标',
+    'meaning_en': '英文释义',
+    'example_en': '英文例句',
+    'example_cn': '中文例句',
+    'list': '所属列表',
+    'wrong_answers': '错误答案',
+    'error_date': '错误日期',
+    'error_count': '错误次数',
+}
+
+PAGE_MARGIN = 72
+FONT_SIZE = 10
+# 序号列和内容列的宽度，合计为A4页面去掉左右边距后的宽度
+COL_WIDTHS = (0.5*inch, A4[0] - 2*PAGE_MARGIN - 0.5*inch)
+_CELL_PADDING = 12
+
+_font_name = None
+_styles = None
+_table_styles = {}
+_logo = None
+
+
+def register_font():
+    """注册中文字体（每个进程一次），返回字体名"""
+    global _font_name
+    if _font_name is not None:
+        return _font_name
+    paths = [config.PDF_FONT_PATH] if config.PDF_FONT_PATH else FONT_CANDIDATES
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        try:
+            pdfmetrics.registerFont(TTFont(_FONT_NAME, path, subfontIndex=config.PDF_FONT_SUBFONT_INDEX))
+            _font_name = _FONT_NAME
+            logger.info(f"PDF中文字体: {path}")
+            return _font_name
+        except Exception as e:
+            logger.warning(f"无法加载字体 {path}: {e}")
+    logger.warning(f"没有可用的中文字体文件，使用内置字体 {_FALLBACK_FONT}")
+    pdfmetrics.registerFont(UnicodeCIDFont(_FALLBACK_FONT))
+    _font_name = _FALLBACK_FONT
+    return _font_name
+
+
+def get_styles():
+    """返回缓存的 {名称: ParagraphStyle}"""
+    global _styles
+    if _styles is None:
+        font_name = register_font()
+        _styles = {
+            'title': ParagraphStyle(name='ChineseTitle', fontName=font_name, fontSize=16, leading=20, alignment=1),
+        }
+    return _styles
+
+
+def _table_style(font_name):
+    """错词表格共用的TableStyle（按字体缓存）"""
+    if font_name not in _table_styles:
+        _table_styles[font_name] = TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), font_name),
+            ('FONTSIZE', (0, 0), (-1, -1), FONT_SIZE),
+            ('LEADING', (0, 0), (-1, -1), 12),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.grey),
+            ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.grey),
+        ])
+    return _table_styles[font_name]
+
+
+def _logo_data():
+    """按打印尺寸缩小后的Logo（PNG内容，每个进程缩放一次），原图嵌入每份PDF时的压缩编码占了小文件大部分的渲染时间"""
+    global _logo
+    if _logo is None:
+        with PILImage.open(LOGO_PATH) as image:
+            image.thumbnail((int(LOGO_SIZE[0] / inch * LOGO_DPI), int(LOGO_SIZE[1] / inch * LOGO_DPI)))
+            buffer = io.BytesIO()
+            image.save(buffer, 'PNG')
+        _logo = buffer.getvalue()
+    return _logo
+
+
+def init_worker():
+    """进程池子进程的初始化函数"""
+    get_styles()
+    if os.path.exists(LOGO_PATH):
+        _logo_data()
+
+
+# --- 错词考核纸 ---
+def field_value(error, field):
+    """返回字段的 (标签, 显示值)"""
+    if field == 'list':
+        value = error.get('list_name', '-')
+    elif field == 'wrong_answers':
+        wrong_answers = error.get('wrong_answers', [])
+        value = '; '.join(wrong_answers) if wrong_answers and isinstance(wrong_answers, list) else '-'
+    elif field == 'error_count':
+        value = str(error.get('error_count', '0'))
+    else:
+        value = error.get(field, '-')
+    return FIELD_LABELS[field], value
+
+
+def _wrap(line, font_name):
+    """把超过内容列宽度的一行断成几行：先按空格断行，没有空格可断的内容（如中文）再按字符断开"""
+    limit = COL_WIDTHS[1] - _CELL_PADDING
+    if pdfmetrics.stringWidth(line, font_name, FONT_SIZE) <= limit:
+        return [line]
+    lines = []
+    for piece in simpleSplit(line, font_name, FONT_SIZE, limit):
+        current, width = '', 0.0
+        for char in piece:
+            char_width = pdfmetrics.stringWidth(char, font_name, FONT_SIZE)
+            if current and width + char_width > limit:
+                lines.append(current)
+                current, width = '', 0.0
+            current += char
+            width += char_width
+        lines.append(current)
+    return lines
+
+
+def _header_elements(title, styles):
+    elements = []
+    if os.path.exists(LOGO_PATH):
+        img = Image(io.BytesIO(_logo_data()), width=LOGO_SIZE[0], height=LOGO_SIZE[1])
+        img.hAlign = 'CENTER'
+        elements.append(img)
+        elements.append(Spacer(1, 0.5*inch))
+    elements.append(Paragraph(escape(title), styles['title']))
+    elements.append(Spacer(1, 0.25*inch))
+    return elements
+
+
+def error_table(errors, fields, hide_word):
+    """把错词列表排成一张表格：每个单词一行（单词和各字段在同一个单元格中分行显示），表头在每页重复"""
+    font_name = register_font()
+    fields = [field for field in fields if field in FIELD_LABELS]
+
+    rows = [['序号', '单词']]
+    for i, error in enumerate(errors, 1):
+        lines = _wrap("______" if hide_word else str(error.get('spelling', '')), font_name)
+        for field in fields:
+            label, value = field_value(error, field)
+            lines.extend(_wrap(f"{label}: {value}", font_name))
+        rows.append([f"{i}.", '\n'.join(lines)])
+    return Table(rows, colWidths=COL_WIDTHS, repeatRows=1, style=_table_style(font_name))
+
+
+def render_error_sheet(errors, fields, hide_word, title):
+    """生成错词考核纸PDF，返回PDF内容"""
+    styles = get_styles()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=PAGE_MARGIN, leftMargin=PAGE_MARGIN,
+                            topMargin=PAGE_MARGIN, bottomMargin=PAGE_MARGIN)
+    doc.build(_header_elements(title, styles) + [error_table(errors, fields, hide_word)])
+    return buffer.getvalue()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+错词考核纸PDF渲染基准测试
+用数据库中的单词构造错词记录，对比原来逐个单词建表的渲染方式（legacy）和 pdf_templates 的单表格版式，
+统计不同行数下的渲染耗时和文件大小（字体、样式在计时前已经准备好，与进程池子进程中的情况一致）
+
+用法: python scripts/debug/benchmark_pdf_render.py [--sizes 50,200,500] [--rounds 5] [--fields meaning_cn,pos,wrong_answers]
+"""
+
+import argparse
+import io
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+# 添加scripts目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+scripts_dir = os.path.dirname(current_dir)
+if scripts_dir not in sys.path:
+    sys.path.insert(0, scripts_dir)
+
+from utils import get_database_path, get_project_root
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='错词考核纸PDF渲染基准测试')
+    parser.add_argument('--database', default=get_database_path(), help='读取单词的数据库路径（只读）')
+    parser.add_argument('--sizes', default='50,200,500', help='每份PDF的错词数，逗号分隔')
+    parser.add_argument('--rounds', type=int, default=5, help='每种规模渲染的次数')
+    parser.add_argument('--fields', default='meaning_cn,pos,ipa,list,wrong_answers,error_count',
+                        help='导出的字段，逗号分隔')
+    parser.add_argument('--output', help='把两种方式最大规模的PDF保存到这个目录，便于对比版式')
+    return parser.parse_args()
+
+
+def legacy_render(pdf_templates, errors, fields, hide_word, title):
+    """原来的渲染方式：每个单词单独一个 Table，之间用 Spacer 隔开，不处理超长内容"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+
+    font_name = pdf_templates.register_font()
+    styles = pdf_templates.get_styles()
+    fields = [field for field in fields if field in pdf_templates.FIELD_LABELS]
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72)
+    elements = []
+    if os.path.exists(pdf_templates.LOGO_PATH):
+        img = Image(pdf_templates.LOGO_PATH, width=2*inch, height=1*inch)
+        img.hAlign = 'CENTER'
+        elements.append(img)
+        elements.append(Spacer(1, 0.5*inch))
+    elements.append(Paragraph(title, styles['title']))
+    elements.append(Spacer(1, 0.25*inch))
+
+    table_style = TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('FONTNAME', (0, 0), (-1, -1), font_name),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ])
+    for i, error in enumerate(errors):
+        data = [[f"{i+1}.", "______" if hide_word else error.get('spelling', '')]]
+        for field in fields:
+            label, value = pdf_templates.field_value(error, field)
+            data.append(['', f"{label}: {value}"])
+        table = Table(data, colWidths=[0.5*inch, 4*inch])
+        table.setStyle(table_style)
+        elements.append(table)
+        elements.append(Spacer(1, 0.1*inch))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def load_errors(database, count):
+    """随机取单词构造前端提交的错词记录"""
+    conn = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("""
+            SELECT w.spelling, w.meaning_cn, w.pos, w.ipa, wl.list_name
+            FROM Words w LEFT JOIN WordLists wl ON w.list_id = wl.list_id
+        """).fetchall()
+    finally:
+        conn.close()
+    errors = []
+    for spelling, meaning_cn, pos, ipa, list_name in random.choices(rows, k=count):
+        errors.append({
+            'spelling': spelling,
+            'meaning_cn': meaning_cn or '-',
+            'pos': pos or '-',
+            'ipa': ipa or '-',
+            'list_name': list_name or '-',
+            'wrong_answers': [spelling[::-1], spelling[:-1]],
+            'error_count': random.randint(1, 5),
+            'error_date': '2025-01-01',
+        })
+    return errors
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.database):
+        print(f"❌ 数据库文件不存在: {args.database}")
+        return 1
+
+    sys.path.insert(0, get_project_root())
+    import pdf_templates
+
+    pdf_templates.init_worker()
+    fields = [field for field in args.fields.split(',') if field]
+    sizes = [int(size) for size in args.sizes.split(',')]
+    renderers = [
+        ('legacy', lambda *render_args: legacy_render(pdf_templates, *render_args)),
+        ('templates', pdf_templates.render_error_sheet),
+    ]
+
+    print(f"字体: {pdf_templates.register_font()}, 字段: {', '.join(fields)}")
+    print(f"{'错词数':>8} {'方式':>10} {'中位数ms':>10} {'最大ms':>10} {'大小KB':>8}")
+    for size in sizes:
+        errors = load_errors(args.database, size)
+        for name, render in renderers:
+            timings = []
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                pdf_data = render(errors, fields, False, '错词考核纸')
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"{size:>8} {name:>10} {statistics.median(timings):>10.1f} {max(timings):>10.1f} "
+                  f"{len(pdf_data) / 1024:>8.1f}")
+            if args.output and size == max(sizes):
+                os.makedirs(args.output, exist_ok=True)
+                with open(os.path.join(args.output, f"{name}_{size}.pdf"), 'wb') as f:
+                    f.write(pdf_data)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/api/submit 性能基准测试
+在数据库副本上按不同测试规模提交答案，统计每次提交的耗时和SQL执行次数
+（executemany 的每一行都会计一次，连接的PRAGMA设置也计入）
+
+用法: python scripts/debug/benchmark_submit.py [--sizes 10,50,100,200,500] [--rounds 20] [--error-rate 0.3]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加scripts目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+scripts_dir = os.path.dirname(current_dir)
+if scripts_dir not in sys.path:
+    sys.path.insert(0, scripts_dir)
+
+from utils import get_database_path, get_project_root
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='/api/submit 性能基准测试')
+    parser.add_argument('--database', default=get_database_path(), help='源数据库路径（不会被修改）')
+    parser.add_argument('--sizes', default='10,50,100,200,500', help='每次提交的单词数量，逗号分隔')
+    parser.add_argument('--rounds', type=int, default=20, help='每种规模提交的次数')
+    parser.add_argument('--error-rate', type=float, default=0.3, help='答错的比例')
+    parser.add_argument('--student-id', type=int, default=1, help='提交时使用的学生ID')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.database):
+        print(f"❌ 数据库文件不存在: {args.database}")
+        return 1
+
+    # 在临时副本上测试，避免污染真实数据
+    workdir = tempfile.mkdtemp(prefix='submit_bench_')
+    database = os.path.join(workdir, 'vocabulary.db')
+    shutil.copy(args.database, database)
+    os.environ['DATABASE_PATH'] = database
+
+    sys.path.insert(0, get_project_root())
+    import app as app_module
+    import db
+
+    app_module.app.logger.setLevel('WARNING')
+
+    # 统计每个请求执行的SQL语句数
+    statements = [0]
+    original_apply_pragmas = db.apply_pragmas
+
+    def apply_pragmas(conn):
+        original_apply_pragmas(conn)
+        conn.set_trace_callback(lambda sql: statements.__setitem__(0, statements[0] + 1))
+
+    db.apply_pragmas = apply_pragmas
+    # 丢弃导入时已创建的连接，让之后的连接都带上计数回调
+    db.pool.close_all()
+
+    conn = sqlite3.connect(database)
+    words = conn.execute("SELECT word_id, spelling FROM Words").fetchall()
+    conn.close()
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = args.student_id
+        sess['username'] = 'benchmark'
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    print(f"数据库副本: {database}")
+    print(f"{'单词数':>8} {'中位数ms':>10} {'p95 ms':>10} {'每词ms':>8} {'SQL/次':>8}")
+    try:
+        for size in sizes:
+            timings = []
+            statement_counts = []
+            for _ in range(args.rounds):
+                sample = random.sample(words, min(size, len(words)))
+                answers = [{'word_id': word_id,
+                            'answer': 'wrong' if random.random() < args.error_rate else spelling}
+                           for word_id, spelling in sample]
+                statements[0] = 0
+                start = time.perf_counter()
+                response = client.post('/api/submit', json={'answers': answers})
+                timings.append((time.perf_counter() - start) * 1000)
+                statement_counts.append(statements[0])
+                if response.status_code != 200:
+                    print(f"❌ 提交失败: {response.status_code} {response.get_data(as_text=True)[:200]}")
+                    return 1
+
+            timings.sort()
+            median = statistics.median(timings)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{size:>8} {median:>10.2f} {p95:>10.2f} {median / size:>8.3f} {statistics.median(statement_counts):>8.0f}")
+    finally:
+        db.pool.close_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒体文件响应头检查
+用Flask测试客户端请求词库音频和TTS音频，检查三种发送模式（直接发送、nginx、sendfile）下的
+ETag、Cache-Control、304条件请求、Range请求和 X-Accel-Redirect / X-Sendfile 头，
+以及词库目录中的非音频文件（词表文本、TTS缓存索引）不能下载
+
+用法: python scripts/debug/check_media_headers.py
+（TTS使用stub引擎和临时缓存目录，不需要网络）
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加scripts目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+scripts_dir = os.path.dirname(current_dir)
+if scripts_dir not in sys.path:
+    sys.path.insert(0, scripts_dir)
+
+from utils import get_project_root
+
+failures = []
+
+
+def check(name, condition, detail=''):
+    print(f"{'✅' if condition else '❌'} {name}" + (f": {detail}" if detail and not condition else ''))
+    if not condition:
+        failures.append(name)
+
+
+def main():
+    os.environ['TTS_BACKEND'] = 'stub'
+    os.environ['TTS_CACHE_DIR'] = tempfile.mkdtemp(prefix='tts_headers_')
+
+    sys.path.insert(0, get_project_root())
+    import app as app_module
+    import config
+
+    app_module.app.logger.setLevel('WARNING')
+    client = app_module.app.test_client()
+
+    media_dir = os.path.join(config.WORDLISTS_DIR, 'junior_high', 'media')
+    media_name = sorted(name for name in os.listdir(media_dir) if name.endswith('.mp3'))[0]
+    media_url = f'/wordlists/junior_high/media/{media_name}'
+    media_size = os.path.getsize(os.path.join(media_dir, media_name))
+    text_url = '/wordlists/senior_high/Senior_high.txt'
+
+    for mode in ('', 'nginx', 'sendfile'):
+        config.MEDIA_ACCEL_MODE = mode
+        print(f"\n== 模式: {mode or '直接发送'}")
+        for url in (media_url, '/api/tts/apple'):
+            response = client.get(url)
+            etag = response.headers.get('ETag', '')
+            cache_control = response.headers.get('Cache-Control', '')
+            check(f"{url} 200", response.status_code == 200, response.status_code)
+            check(f"{url} 强ETag", etag.startswith('"') and not etag.startswith('W/'), etag)
+            check(f"{url} Cache-Control", 'public' in cache_control and 'immutable' in cache_control
+                  and f'max-age={config.MEDIA_CACHE_MAX_AGE}' in cache_control, cache_control)
+            check(f"{url} Content-Type", response.mimetype.startswith('audio/'), response.mimetype)
+
+            conditional = client.get(url, headers={'If-None-Match': etag})
+            check(f"{url} If-None-Match 返回304", conditional.status_code == 304, conditional.status_code)
+
+            if mode == '':
+                check(f"{url} 返回文件内容", len(response.data) > 0 and 'X-Accel-Redirect' not in response.headers)
+                ranged = client.get(url, headers={'Range': 'bytes=0-9'})
+                check(f"{url} Range 返回206", ranged.status_code == 206 and len(ranged.data) == 10, ranged.status_code)
+            elif mode == 'nginx':
+                accel = response.headers.get('X-Accel-Redirect', '')
+                prefix = config.MEDIA_ACCEL_PREFIX if url == media_url else config.TTS_ACCEL_PREFIX
+                check(f"{url} X-Accel-Redirect", accel.startswith(prefix.rstrip('/') + '/'), accel)
+                check(f"{url} 不返回文件内容", response.data == b'')
+            else:
+                sendfile = response.headers.get('X-Sendfile', '')
+                check(f"{url} X-Sendfile", os.path.isabs(sendfile) and os.path.exists(sendfile), sendfile)
+                check(f"{url} 不返回文件内容", response.data == b'')
+
+        if mode == '':
+            check("媒体文件大小", len(client.get(media_url).data) == media_size)
+
+        # 词表文本、TTS缓存索引等非音频文件不对外提供
+        for url in (text_url, '/wordlists/tts_cache/index.db'):
+            response = client.get(url)
+            check(f"{url} 返回404", response.status_code == 404, response.status_code)
+
+        missing = client.get('/wordlists/junior_high/media/not-exists.mp3')
+        check("不存在的文件返回404", missing.status_code == 404, missing.status_code)
+        traversal = client.get('/wordlists/junior_high/..%2F..%2Fapp.py')
+        check("目录穿越返回404", traversal.status_code == 404, traversal.status_code)
+
+    print(f"\n{'全部通过' if not failures else f'{len(failures)} 项未通过'}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
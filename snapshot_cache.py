@@ -0,0 +1,140 @@
+"""
+快照缓存 - 缓存计算代价较高的整页数据（如管理员仪表盘），过期后先返回旧快照，由后台线程刷新
+
+快照在 ttl 秒内视为新鲜，直接返回；超过 ttl 但未超过 ttl + stale_ttl 时返回旧快照，
+同时启动一个后台线程重新计算（stale-while-revalidate）；没有快照或快照过旧时在当前请求中计算，
+并发请求只计算一次，其余请求等待结果。invalidate() 把当前快照标记为过期并立即在后台刷新。
+缓存按Worker进程保存，后台线程在首次使用时启动，不受gunicorn preload_app的fork影响。
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Snapshot:
+    __slots__ = ('value', 'created', 'generation')
+
+    def __init__(self, value, created, generation):
+        self.value = value
+        self.created = created
+        self.generation = generation
+
+
+class SnapshotCache:
+    """单个快照的缓存，loader 为无参数的计算函数"""
+
+    def __init__(self, name, loader, ttl=60.0, stale_ttl=600.0):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self._cond = threading.Condition(threading.Lock())
+        self._snapshot = None
+        # 每次 invalidate() 加一，早于当前代次的快照视为过期
+        self._generation = 0
+        self._refreshing = False
+        self._metrics = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'refreshes': 0,
+            'background_refreshes': 0,
+            'refresh_failures': 0,
+            'last_refresh_ms': 0.0,
+            'refresh_ms_max': 0.0,
+        }
+
+    def _is_fresh(self, snapshot, now):
+        return snapshot.generation == self._generation and now - snapshot.created < self.ttl
+
+    def _is_usable(self, snapshot, now):
+        return now - snapshot.created < self.ttl + self.stale_ttl
+
+    def _compute(self):
+        """计算新快照并保存，调用前必须已把 _refreshing 置为True"""
+        with self._cond:
+            generation = self._generation
+        start = time.perf_counter()
+        try:
+            value = self.loader()
+        except Exception:
+            with self._cond:
+                self._metrics['refresh_failures'] += 1
+                self._refreshing = False
+                self._cond.notify_all()
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        snapshot = _Snapshot(value, time.monotonic(), generation)
+        with self._cond:
+            self._snapshot = snapshot
+            self._refreshing = False
+            self._metrics['refreshes'] += 1
+            self._metrics['last_refresh_ms'] = elapsed_ms
+            self._metrics['refresh_ms_max'] = max(self._metrics['refresh_ms_max'], elapsed_ms)
+            self._cond.notify_all()
+        return snapshot
+
+    def _refresh_in_background(self):
+        try:
+            self._compute()
+        except Exception as e:
+            # 保留旧快照，下一次请求再尝试刷新
+            logger.error(f"后台刷新快照失败: {self.name}, error={e}")
+
+    def _start_background_refresh(self):
+        """在持有锁时调用，已有刷新在进行时不重复启动"""
+        if self._refreshing:
+            return
+        self._refreshing = True
+        self._metrics['background_refreshes'] += 1
+        threading.Thread(target=self._refresh_in_background, name=f'snapshot-refresh-{self.name}',
+                         daemon=True).start()
+
+    def get(self, refresh=False):
+        """返回 (快照值, 状态)，状态为 'hit'、'stale' 或 'miss'；refresh为True时忽略已有快照重新计算"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                snapshot = self._snapshot
+                if snapshot is not None and self.ttl > 0 and not refresh:
+                    if self._is_fresh(snapshot, now):
+                        self._metrics['hits'] += 1
+                        return snapshot.value, 'hit'
+                    if self._is_usable(snapshot, now):
+                        self._metrics['stale_hits'] += 1
+                        self._start_background_refresh()
+                        return snapshot.value, 'stale'
+                if not self._refreshing:
+                    self._refreshing = True
+                    self._metrics['misses'] += 1
+                    break
+                # 其他请求正在计算，等待其结果后重新判断
+                self._cond.wait()
+                if self._snapshot is not None and self._snapshot is not snapshot:
+                    self._metrics['hits'] += 1
+                    return self._snapshot.value, 'hit'
+        return self._compute().value, 'miss'
+
+    def invalidate(self, refresh=True):
+        """标记当前快照已过期；refresh为True时立即在后台重新计算"""
+        with self._cond:
+            self._generation += 1
+            if refresh and self._snapshot is not None:
+                self._start_background_refresh()
+
+    def stats(self):
+        """返回命中次数、刷新耗时和当前快照的年龄"""
+        with self._cond:
+            metrics = dict(self._metrics)
+            snapshot = self._snapshot
+            metrics['refreshing'] = self._refreshing
+            metrics['age_s'] = round(time.monotonic() - snapshot.created, 3) if snapshot is not None else None
+            metrics['fresh'] = snapshot is not None and self._is_fresh(snapshot, time.monotonic())
+        for key in ('last_refresh_ms', 'refresh_ms_max'):
+            metrics[key] = round(metrics[key], 3)
+        metrics['ttl'] = self.ttl
+        metrics['stale_ttl'] = self.stale_ttl
+        return metrics
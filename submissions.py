@@ -0,0 +1,154 @@
+"""
+答题结果写入 - 把批改结果批量写入 ErrorLogs、StudentWordProgress 和每日学习统计（DailyStudyStats）
+
+/api/submit 的同步写入和后台写入队列（write_behind）共用这里的逻辑。一条批改结果的结构：
+
+    {'student_id': 3, 'graded_at': '2025-07-16 01:17:45',
+     'answers': [[word_id, is_correct, student_answer], ...]}
+
+graded_at 使用本地时间，ErrorLogs.error_date 和下次复习日期都以它为准，
+因此延迟写入时记录的仍是学生实际答题的时间。
+"""
+import datetime
+
+# SQLite单条语句的参数数量有限，按主键批量取行时分批执行
+_BATCH_SIZE = 500
+
+
+def build_result(student_id, answers, graded_at=None):
+    """构造一条批改结果，answers 为 (word_id, is_correct, student_answer) 序列"""
+    if graded_at is None:
+        graded_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return {
+        'student_id': student_id,
+        'graded_at': graded_at,
+        'answers': [[word_id, bool(is_correct), student_answer] for word_id, is_correct, student_answer in answers],
+    }
+
+
+def next_srs_progress(repetitions, interval, is_correct):
+    """根据答案正确性计算新的 (repetitions, interval)"""
+    if is_correct:
+        # 答对了：增加熟练度
+        if repetitions == 0:
+            # 第一次答对：标记为初学，1天后复习
+            repetitions = 1
+            interval = 1
+        elif repetitions == 1:
+            # 第二次答对：标记为熟悉，6天后复习
+            repetitions = 2
+            interval = 6
+        else:
+            # 多次答对：增加间隔
+            repetitions += 1
+            interval = int(interval * 1.5)  # 温和增长
+    else:
+        # 答错了：降低熟练度，标记为需要重点复习
+        if repetitions == 0:
+            # 第一次答错：标记为不熟悉，明天复习
+            repetitions = 0
+            interval = 1
+        else:
+            # 之前答对过但这次答错：降低熟练度
+            repetitions = max(0, repetitions - 1)
+            interval = max(1, interval // 2)  # 减少间隔
+
+    # 限制最大间隔
+    return repetitions, min(interval, 365)
+
+
+def _load_progress(conn, student_id, word_ids):
+    progress = {}
+    for start in range(0, len(word_ids), _BATCH_SIZE):
+        batch = word_ids[start:start + _BATCH_SIZE]
+        rows = conn.execute(f"""
+            SELECT word_id, repetitions, interval FROM StudentWordProgress
+            WHERE student_id = ? AND word_id IN ({','.join('?' * len(batch))})
+        """, [student_id] + batch).fetchall()
+        progress.update((row[0], (row[1] or 0, row[2] or 1)) for row in rows)
+    return progress
+
+
+def _record_daily_stats(conn, results):
+    """累加每天每个列表的答题数和测试次数（错误数由 ErrorLogs 触发器维护）"""
+    results = [result for result in results if result['student_id'] != -1 and result['answers']]
+    word_ids = list({word_id for result in results for word_id, _, _ in result['answers']})
+    list_ids = {}
+    for start in range(0, len(word_ids), _BATCH_SIZE):
+        batch = word_ids[start:start + _BATCH_SIZE]
+        rows = conn.execute(f"SELECT word_id, list_id FROM Words WHERE word_id IN ({','.join('?' * len(batch))})",
+                            batch).fetchall()
+        list_ids.update((row[0], row[1] or 0) for row in rows)
+
+    counts = {}
+    for result in results:
+        keys = set()
+        for word_id, _, _ in result['answers']:
+            key = (result['graded_at'][:10], result['student_id'], list_ids.get(word_id, 0))
+            attempts, tests = counts.get(key, (0, 0))
+            counts[key] = (attempts + 1, tests)
+            keys.add(key)
+        # 一次提交算作所涉及的每个列表的一次测试
+        for key in keys:
+            attempts, tests = counts[key]
+            counts[key] = (attempts, tests + 1)
+
+    if counts:
+        conn.executemany("""
+            INSERT INTO DailyStudyStats (day, student_id, list_id, attempts, tests)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(day, student_id, list_id) DO UPDATE SET
+                attempts = attempts + excluded.attempts,
+                tests = tests + excluded.tests
+        """, [key + value for key, value in counts.items()])
+
+
+def record_results(conn, results):
+    """在调用方的写事务中写入若干条批改结果，返回 (错误记录数, 进度记录数)
+
+    同一学生的同一单词出现多次时按结果顺序依次更新进度；游客（student_id=-1）只记录错误。
+    """
+    error_rows = [
+        (result['student_id'], word_id, 'spelling_mvp', student_answer, result['graded_at'])
+        for result in results
+        for word_id, is_correct, student_answer in result['answers']
+        if not is_correct
+    ]
+    if error_rows:
+        conn.executemany(
+            "INSERT INTO ErrorLogs (student_id, word_id, error_type, student_answer, error_date) VALUES (?, ?, ?, ?, ?)",
+            error_rows
+        )
+
+    # 更新SRS进度（仅对已登录用户），按学生分组批量读取现有进度
+    by_student = {}
+    for result in results:
+        if result['student_id'] == -1:
+            continue
+        items = by_student.setdefault(result['student_id'], [])
+        items.extend((word_id, is_correct, result['graded_at']) for word_id, is_correct, _ in result['answers'])
+
+    progress_rows = []
+    for student_id, items in by_student.items():
+        word_ids = list(dict.fromkeys(word_id for word_id, _, _ in items))
+        progress = _load_progress(conn, student_id, word_ids)
+        graded_at = {}
+        for word_id, is_correct, answered_at in items:
+            repetitions, interval = progress.get(word_id, (0, 1))
+            progress[word_id] = next_srs_progress(repetitions, interval, is_correct)
+            graded_at[word_id] = answered_at
+        for word_id in word_ids:
+            repetitions, interval = progress[word_id]
+            answered_on = datetime.datetime.strptime(graded_at[word_id][:10], '%Y-%m-%d')
+            next_review_date = (answered_on + datetime.timedelta(days=interval)).strftime('%Y-%m-%d')
+            progress_rows.append((student_id, word_id, repetitions, interval, next_review_date))
+
+    if progress_rows:
+        conn.executemany("""
+            INSERT OR REPLACE INTO StudentWordProgress
+            (student_id, word_id, repetitions, interval, next_review_date)
+            VALUES (?, ?, ?, ?, ?)
+        """, progress_rows)
+
+    _record_daily_stats(conn, results)
+    return len(error_rows), len(progress_rows)
@@ -0,0 +1,164 @@
+"""
+TTS合成引擎 - gTTS（在线）、espeak-ng（本地离线）和用于测试/基准的确定性假引擎
+
+通过配置项 TTS_BACKEND 选择，多个引擎用逗号分隔时按顺序尝试（如 "gtts,espeak"：
+无法访问Google时使用本地引擎）。每个引擎把音频写入指定路径，并记录自己的调用次数、失败次数和耗时。
+"""
+import collections
+import hashlib
+import logging
+import math
+import shutil
+import struct
+import subprocess
+import threading
+import time
+import wave
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 每个引擎保留最近多少次合成耗时，用于计算p95
+_LATENCY_SAMPLES = 200
+
+
+class TTSBackend:
+    """合成引擎基类，子类实现 _synthesize(text, path)"""
+
+    name = None
+    # 生成的音频文件扩展名
+    extension = '.mp3'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = collections.deque(maxlen=_LATENCY_SAMPLES)
+        self._metrics = {'calls': 0, 'failures': 0, 'ms_total': 0.0, 'ms_max': 0.0}
+
+    def _synthesize(self, text, path):
+        raise NotImplementedError
+
+    def synthesize(self, text, path):
+        """把text合成为音频写入path，记录耗时"""
+        start = time.perf_counter()
+        try:
+            self._synthesize(text, path)
+        except Exception:
+            with self._lock:
+                self._metrics['calls'] += 1
+                self._metrics['failures'] += 1
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._metrics['calls'] += 1
+            self._metrics['ms_total'] += elapsed_ms
+            self._metrics['ms_max'] = max(self._metrics['ms_max'], elapsed_ms)
+            self._samples.append(elapsed_ms)
+        return elapsed_ms
+
+    def stats(self):
+        """返回调用次数、失败次数和耗时（平均、最大、最近样本的p95）"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            samples = sorted(self._samples)
+        succeeded = metrics['calls'] - metrics['failures']
+        metrics['ms_avg'] = round(metrics['ms_total'] / succeeded, 3) if succeeded else 0.0
+        metrics['ms_p95'] = round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3) if samples else 0.0
+        for key in ('ms_total', 'ms_max'):
+            metrics[key] = round(metrics[key], 3)
+        return metrics
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS，需要访问外网"""
+
+    name = 'gtts'
+    extension = '.mp3'
+
+    def __init__(self, lang='en', timeout=30.0):
+        super().__init__()
+        # 只在选用gTTS引擎时才导入
+        from gtts import gTTS
+        self._gtts = gTTS
+        self.lang = lang
+        self.timeout = timeout
+
+    def _synthesize(self, text, path):
+        self._gtts(text=text, lang=self.lang, slow=False, timeout=self.timeout).save(path)
+
+
+class EspeakBackend(TTSBackend):
+    """本地 espeak-ng / espeak 命令行引擎，不需要网络，输出WAV"""
+
+    name = 'espeak'
+    extension = '.wav'
+
+    def __init__(self, command=None, voice='en-us', timeout=30.0):
+        super().__init__()
+        self.command = command or shutil.which('espeak-ng') or shutil.which('espeak')
+        if not self.command:
+            raise RuntimeError("未找到 espeak-ng 或 espeak 命令，请先安装或设置 TTS_ESPEAK_COMMAND")
+        self.voice = voice
+        self.timeout = timeout
+
+    def _synthesize(self, text, path):
+        # 文本通过标准输入传入，避免以"-"开头的单词被当作命令行参数
+        subprocess.run([self.command, '-v', self.voice, '-w', path, '--stdin'],
+                       input=text.encode('utf-8'), timeout=self.timeout,
+                       check=True, capture_output=True)
+
+
+class StubBackend(TTSBackend):
+    """确定性的假引擎：同一文本总是生成相同的短WAV音频，用于测试和基准测试"""
+
+    name = 'stub'
+    extension = '.wav'
+
+    _RATE = 8000
+
+    def __init__(self, latency_ms=0.0):
+        super().__init__()
+        self.latency_ms = latency_ms
+
+    def _synthesize(self, text, path):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        # 音高由文本的md5决定，时长与文本长度相关
+        digest = hashlib.md5(text.encode('utf-8')).digest()
+        frequency = 220 + digest[0] * 2
+        frames = int(self._RATE * min(0.1 + 0.02 * len(text), 1.0))
+        samples = b''.join(struct.pack('<h', int(8000 * math.sin(2 * math.pi * frequency * i / self._RATE)))
+                           for i in range(frames))
+        with wave.open(path, 'wb') as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(self._RATE)
+            out.writeframes(samples)
+
+
+def create_backend(name):
+    """根据名称创建合成引擎"""
+    name = name.strip().lower()
+    if name == 'gtts':
+        return GTTSBackend(timeout=config.TTS_TIMEOUT)
+    if name == 'espeak':
+        return EspeakBackend(command=config.TTS_ESPEAK_COMMAND, voice=config.TTS_ESPEAK_VOICE,
+                             timeout=config.TTS_TIMEOUT)
+    if name == 'stub':
+        return StubBackend(latency_ms=config.TTS_STUB_LATENCY_MS)
+    raise ValueError(f"未知的TTS引擎: {name}")
+
+
+def create_backends(names):
+    """根据逗号分隔的引擎名称创建引擎列表，按顺序尝试；无法创建的引擎记录错误后跳过"""
+    backends = []
+    for name in names.split(','):
+        if not name.strip():
+            continue
+        try:
+            backends.append(create_backend(name))
+        except Exception as e:
+            logger.error(f"无法创建TTS引擎 {name.strip()}: {e}")
+    if not backends:
+        raise ValueError(f"TTS_BACKEND 中没有可用的引擎: {names}")
+    return backends
@@ -0,0 +1,330 @@
+"""
+TTS音频缓存 - 分目录存放合成音频，按字节上限做LRU淘汰
+
+文件按key（md5）的前两位分到256个子目录中（tts_cache/ab/ab12….mp3），避免单个目录中文件过多。
+缓存目录中的 index.db 记录每个key的文件路径、大小和最近访问时间，多个Worker进程共用；
+每个进程在内存中保存一份key → 文件的映射，命中时不访问文件系统，
+其他进程写入或淘汰的变化每隔 sync_interval 秒同步一次。访问时间先记在内存中，定期批量写回索引。
+总大小超过 max_bytes 时按最近访问时间从旧到新删除，直到低于上限的90%。
+0字节的文件（早期合成中断时留下的）不算缓存：查找时删除并视为未命中，重新合成。
+
+早期版本把文件直接放在缓存目录下（tts_cache/ab12….mp3），查找时仍然兼容，
+可以用 python tts_cache.py migrate 把它们移动到子目录中。
+
+    python tts_cache.py stats      # 查看缓存大小和文件数
+    python tts_cache.py rebuild    # 扫描缓存目录重建索引
+    python tts_cache.py migrate    # 把旧的平铺文件移动到子目录并更新索引
+    python tts_cache.py evict      # 立即按上限淘汰
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 缓存中可能出现的音频扩展名，按查找顺序排列
+CACHE_EXTENSIONS = ('.mp3', '.wav')
+# 淘汰时删除到上限的这个比例以下，避免每次写入都触发淘汰
+_LOW_WATERMARK = 0.9
+
+
+def _is_cache_file(name):
+    return len(name) > 32 and name[32:] in CACHE_EXTENSIONS
+
+
+def _file_size(path):
+    """返回缓存文件的大小；文件不存在时返回0，0字节的文件同时删除"""
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+    if size == 0:
+        logger.warning(f"删除0字节的TTS缓存文件: {path}")
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return size
+
+
+class TTSCache:
+    """按Worker进程划分的缓存管理器，索引保存在缓存目录的 index.db 中"""
+
+    def __init__(self, root, max_bytes=0, index_path=None, sync_interval=5.0, touch_interval=30.0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = index_path or os.path.join(root, 'index.db')
+        self.sync_interval = sync_interval
+        self.touch_interval = touch_interval
+
+        self._lock = threading.RLock()
+        self._pid = None
+        self._conn = None
+        self._entries = None
+        self._data_version = None
+        self._last_sync = 0.0
+        self._touched = {}
+        self._last_touch_flush = time.monotonic()
+        self._metrics = {'hits': 0, 'misses': 0, 'evictions': 0, 'evicted_bytes': 0, 'stale_entries': 0}
+
+    # --- 索引 ---
+    def _connection(self):
+        """调用方需持有锁；fork之后重新打开索引连接"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._entries = None
+            self._touched = {}
+            os.makedirs(self.root, exist_ok=True)
+            self._conn = sqlite3.connect(self.index_path, check_same_thread=False, isolation_level=None,
+                                         timeout=config.DB_BUSY_TIMEOUT_MS / 1000)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)")
+        return self._conn
+
+    def _sync(self, force=False):
+        """调用方需持有锁；索引被其他进程修改过时重新加载内存映射"""
+        conn = self._connection()
+        now = time.monotonic()
+        if not force and self._entries is not None and now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if force or self._entries is None or version != self._data_version:
+            self._entries = {row[0]: (row[1], row[2]) for row in conn.execute("SELECT key, path, size FROM entries")}
+            self._data_version = version
+
+    def _write(self, sql_pairs):
+        """在一个写事务中执行若干条 (sql, params)；调用方需持有锁"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in sql_pairs:
+                if isinstance(params, list):
+                    conn.executemany(sql, params)
+                else:
+                    conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _flush_touched(self, force=False):
+        """把内存中记录的访问时间批量写回索引；调用方需持有锁"""
+        now = time.monotonic()
+        if not self._touched or (not force and now - self._last_touch_flush < self.touch_interval):
+            return
+        self._last_touch_flush = now
+        touched, self._touched = self._touched, {}
+        try:
+            self._write([("UPDATE entries SET last_access = ? WHERE key = ? AND last_access < ?",
+                          [(at, key, at) for key, at in touched.items()])])
+        except sqlite3.Error as e:
+            logger.warning(f"写入TTS缓存访问时间失败: {e}")
+
+    # --- 路径 ---
+    def shard_path(self, key, extension):
+        return os.path.join(self.root, key[:2], key + extension)
+
+    def _find_on_disk(self, key):
+        """索引中没有时检查文件系统（其他进程刚写入的文件或旧的平铺文件），0字节的文件不算"""
+        for extension in CACHE_EXTENSIONS:
+            for path in (self.shard_path(key, extension), os.path.join(self.root, key + extension)):
+                if _file_size(path):
+                    return path
+        return None
+
+    def _register(self, key, path):
+        """调用方需持有锁"""
+        size = os.path.getsize(path)
+        relpath = os.path.relpath(path, self.root)
+        self._write([("INSERT OR REPLACE INTO entries (key, path, size, last_access) VALUES (?, ?, ?, ?)",
+                      (key, relpath, size, time.time()))])
+        self._entries[key] = (relpath, size)
+        return size
+
+    # --- 读写 ---
+    def lookup(self, key, record=True):
+        """返回key对应的音频文件的绝对路径，未缓存时返回None；record为False时不计入命中统计"""
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == 0:
+                # 早期索引登记过的0字节文件：删除后按未命中处理
+                _file_size(os.path.join(self.root, entry[0]))
+                self._write([("DELETE FROM entries WHERE key = ?", (key,))])
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                path = self._find_on_disk(key)
+                if path is None:
+                    if record:
+                        self._metrics['misses'] += 1
+                    return None
+                self._register(key, path)
+            else:
+                path = os.path.join(self.root, entry[0])
+            if record:
+                self._metrics['hits'] += 1
+            self._touched[key] = time.time()
+            self._flush_touched()
+            return path
+
+    def discard(self, key):
+        """索引中有记录但文件已不存在（被其他进程淘汰）时调用，删除索引记录"""
+        with self._lock:
+            self._connection()
+            self._metrics['stale_entries'] += 1
+            self._write([("DELETE FROM entries WHERE key = ?", (key,))])
+            if self._entries is not None:
+                self._entries.pop(key, None)
+            self._touched.pop(key, None)
+
+    def put(self, key, tmp_path, extension):
+        """把已生成的临时文件移动到缓存中并登记，返回最终路径；超过上限时淘汰旧文件
+
+        临时文件为空（引擎没有输出音频）时抛出ValueError，不写入缓存。
+        """
+        if os.path.getsize(tmp_path) == 0:
+            raise ValueError(f"TTS引擎生成了空文件: {tmp_path}")
+        path = self.shard_path(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._sync()
+            self._register(key, path)
+        if self.max_bytes:
+            self.evict()
+        return path
+
+    def evict(self, max_bytes=None):
+        """总大小超过上限时按最近访问时间淘汰，返回删除的文件数"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if not max_bytes:
+            return 0
+        with self._lock:
+            self._flush_touched(force=True)
+            conn = self._connection()
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= max_bytes:
+                return 0
+            target = int(max_bytes * _LOW_WATERMARK)
+            victims = []
+            for key, relpath, size in conn.execute("SELECT key, path, size FROM entries ORDER BY last_access"):
+                if total <= target:
+                    break
+                victims.append((key, relpath, size))
+                total -= size
+            self._write([("DELETE FROM entries WHERE key = ?", [(key,) for key, _, _ in victims])])
+            for key, relpath, size in victims:
+                try:
+                    os.remove(os.path.join(self.root, relpath))
+                except FileNotFoundError:
+                    pass
+                if self._entries is not None:
+                    self._entries.pop(key, None)
+                self._metrics['evictions'] += 1
+                self._metrics['evicted_bytes'] += size
+        logger.info(f"TTS缓存超过上限，已淘汰 {len(victims)} 个文件")
+        return len(victims)
+
+    # --- 维护 ---
+    def _scan(self):
+        """返回缓存目录中的 {key: 路径}，子目录中的文件优先于平铺文件"""
+        found = {}
+        names = os.listdir(self.root) if os.path.isdir(self.root) else []
+        for name in names:
+            if _is_cache_file(name):
+                found[name[:32]] = os.path.join(self.root, name)
+        for shard in names:
+            shard_dir = os.path.join(self.root, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if _is_cache_file(name):
+                    found[name[:32]] = os.path.join(shard_dir, name)
+        return found
+
+    def rebuild(self):
+        """扫描缓存目录重建索引（以文件修改时间作为访问时间），删除0字节的文件，返回文件数"""
+        rows = []
+        for key, path in self._scan().items():
+            size = _file_size(path)
+            if size:
+                rows.append((key, os.path.relpath(path, self.root), size, os.path.getmtime(path)))
+        with self._lock:
+            self._write([("DELETE FROM entries", ()),
+                         ("INSERT INTO entries (key, path, size, last_access) VALUES (?, ?, ?, ?)", rows)])
+            self._sync(force=True)
+        return len(rows)
+
+    def migrate(self):
+        """把旧的平铺文件移动到子目录中并重建索引，返回移动的文件数"""
+        moved = 0
+        for name in os.listdir(self.root):
+            if not _is_cache_file(name):
+                continue
+            if not _file_size(os.path.join(self.root, name)):
+                continue
+            path = self.shard_path(name[:32], name[32:])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                os.remove(os.path.join(self.root, name))
+            else:
+                os.replace(os.path.join(self.root, name), path)
+            moved += 1
+        self.rebuild()
+        return moved
+
+    # --- 指标 ---
+    def stats(self):
+        """返回命中、未命中、淘汰次数和索引中的文件数、总大小"""
+        with self._lock:
+            self._sync()
+            metrics = dict(self._metrics)
+            metrics['entries'] = len(self._entries)
+            metrics['bytes'] = sum(size for _, size in self._entries.values())
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = round(metrics['hits'] / lookups, 4) if lookups else 0.0
+        metrics['max_bytes'] = self.max_bytes
+        return metrics
+
+
+cache = TTSCache(config.TTS_CACHE_DIR, max_bytes=config.TTS_CACHE_MAX_MB * 1024 * 1024)
+
+
+# --- 命令行入口 ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='TTS音频缓存维护')
+    parser.add_argument('command', choices=['stats', 'rebuild', 'migrate', 'evict'], help='要执行的操作')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.command == 'rebuild':
+        print(f"已重建索引: {cache.rebuild()} 个文件")
+    elif args.command == 'migrate':
+        print(f"已移动到子目录: {cache.migrate()} 个文件")
+    elif args.command == 'evict':
+        print(f"已淘汰: {cache.evict()} 个文件")
+    stats = cache.stats()
+    print(f"文件数 {stats['entries']}，总大小 {stats['bytes'] / 1024 / 1024:.1f}MB，"
+          f"上限 {stats['max_bytes'] / 1024 / 1024:.0f}MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
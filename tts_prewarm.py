@@ -0,0 +1,169 @@
+"""
+TTS预生成 - 为没有录音文件的单词批量生成TTS音频，让在线请求只命中缓存
+
+get_questions() 在 audio_path_uk/us 为空或录音文件不在音频清单中时返回 /api/tts/<spelling> 地址，
+这里用同样的判断（audio_manifest.manifest.resolve）和缓存文件名提前生成这些音频：
+
+    python tts_prewarm.py                  # 为缺少录音的单词生成音频
+    python tts_prewarm.py --list-id 217    # 只处理指定列表
+    python tts_prewarm.py --all            # 为所有单词生成音频
+    python tts_prewarm.py --dry-run        # 只统计需要生成的数量
+
+已有缓存的单词直接跳过，中断后重新执行即可从断点继续。
+与在线请求共用 tts_service 的跨进程文件锁，可以在应用运行时执行。
+"""
+import argparse
+import concurrent.futures
+import logging
+import sqlite3
+import sys
+import threading
+import time
+
+import audio_manifest
+import config
+import tts_service
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """限制所有线程合计的合成速率（每秒次数），rate<=0 表示不限制"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def missing_audio_texts(conn, list_id=None, include_all=False, manifest=None):
+    """返回需要TTS的单词拼写（按word_id排序，同一缓存文件只保留一个）
+
+    与 word_cache 生成题目时的判断相同：录音文件为空或不在音频清单中的单词会使用TTS。
+    """
+    manifest = manifest or audio_manifest.manifest
+    query = """SELECT w.spelling, w.audio_path_uk, w.audio_path_us, b.book_name
+               FROM Words w
+               LEFT JOIN WordLists wl ON w.list_id = wl.list_id
+               LEFT JOIN Books b ON wl.book_id = b.book_id
+               WHERE w.spelling IS NOT NULL AND w.spelling != ''"""
+    params = []
+    if list_id is not None:
+        query += " AND w.list_id = ?"
+        params.append(list_id)
+    query += " ORDER BY w.word_id"
+    texts = {}
+    for spelling, audio_path_uk, audio_path_us, book_name in conn.execute(query, params):
+        if not include_all and all(manifest.resolve(book_name or "", path) for path in (audio_path_uk, audio_path_us)):
+            continue
+        texts.setdefault(tts_service.cache_key(spelling), spelling)
+    return list(texts.values())
+
+
+def prewarm(service, texts, workers=4, rate=0.0, max_failures=20, progress_interval=5.0):
+    """并行生成音频，返回统计结果 {total, cached, created, failed, failures, aborted}"""
+    limiter = RateLimiter(rate)
+    lock = threading.Lock()
+    result = {'total': len(texts), 'cached': 0, 'created': 0, 'failed': 0, 'failures': [], 'aborted': False}
+    state = {'done': 0, 'consecutive_failures': 0, 'last_report': time.monotonic()}
+    start = time.monotonic()
+    abort = threading.Event()
+
+    # 预生成的查找不计入缓存命中率，0字节的缓存文件按未命中处理，会重新生成
+    pending = [text for text in texts if service.find_cached(tts_service.cache_key(text), record=False) is None]
+    result['cached'] = len(texts) - len(pending)
+    logger.info(f"共 {len(texts)} 个文本，已有缓存 {result['cached']} 个，待生成 {len(pending)} 个")
+
+    def report(force=False):
+        now = time.monotonic()
+        if not force and now - state['last_report'] < progress_interval:
+            return
+        state['last_report'] = now
+        elapsed = now - start
+        speed = state['done'] / elapsed if elapsed > 0 else 0.0
+        eta = (len(pending) - state['done']) / speed if speed > 0 else 0.0
+        logger.info(f"进度 {state['done']}/{len(pending)}: 新生成 {result['created']}, 失败 {result['failed']}, "
+                    f"{speed:.1f}个/秒, 预计剩余 {eta:.0f}秒")
+
+    def work(text):
+        if abort.is_set():
+            return
+        limiter.wait()
+        try:
+            _, _, created = service.ensure(text)
+            error = None
+        except Exception as e:
+            created, error = False, e
+        with lock:
+            state['done'] += 1
+            if error is None:
+                state['consecutive_failures'] = 0
+                result['created' if created else 'cached'] += 1
+            else:
+                state['consecutive_failures'] += 1
+                result['failed'] += 1
+                result['failures'].append((text, str(error)))
+                logger.warning(f"生成失败: {text}, 错误: {error}")
+                # 连续失败通常说明网络或引擎不可用，没有必要继续
+                if max_failures and state['consecutive_failures'] >= max_failures:
+                    if not abort.is_set():
+                        logger.error(f"连续失败 {max_failures} 次，停止预生成")
+                    abort.set()
+                    result['aborted'] = True
+            report()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='tts-prewarm') as executor:
+        list(executor.map(work, pending))
+    report(force=True)
+    return result
+
+
+# --- 命令行入口 ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='为缺少录音的单词预生成TTS音频')
+    parser.add_argument('--database', default=config.DATABASE_PATH, help='数据库文件路径')
+    parser.add_argument('--list-id', type=int, help='只处理指定单词列表')
+    parser.add_argument('--all', action='store_true', help='为所有单词生成音频（包括已有录音的单词）')
+    parser.add_argument('--workers', type=int, default=4, help='并行合成的线程数')
+    parser.add_argument('--rate', type=float, default=2.0, help='每秒最多合成次数，0表示不限制')
+    parser.add_argument('--max-failures', type=int, default=20, help='连续失败多少次后停止，0表示不停止')
+    parser.add_argument('--dry-run', action='store_true', help='只统计需要生成的数量')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    # 逐条的生成日志太多，只输出进度
+    logging.getLogger('tts_service').setLevel(logging.WARNING)
+    # 没有清单文件时认为所有录音都存在，只为音频字段为空的单词生成
+    audio_manifest.manifest.load()
+    conn = sqlite3.connect(args.database)
+    try:
+        texts = missing_audio_texts(conn, args.list_id, args.all)
+    finally:
+        conn.close()
+
+    service = tts_service.service
+    if args.dry_run:
+        pending = sum(1 for text in texts if service.find_cached(tts_service.cache_key(text), record=False) is None)
+        print(f"共 {len(texts)} 个文本，待生成 {pending} 个")
+        return 0
+
+    result = prewarm(service, texts, workers=args.workers, rate=args.rate, max_failures=args.max_failures)
+    print(f"完成: 共 {result['total']} 个，已有缓存 {result['cached']} 个，"
+          f"新生成 {result['created']} 个，失败 {result['failed']} 个")
+    for text, error in result['failures'][:20]:
+        print(f"  失败: {text}: {error}")
+    return 1 if result['failed'] or result['aborted'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""
+TTS生成服务 - 在有上限的线程池中合成单词音频，同一文本的并发请求合并为一个任务
+
+请求线程只提交任务并在较短的期限内等待结果，不会被一次很慢的合成占住整个Worker。
+任务按文本的md5（与缓存文件名相同）合并：进程内由进行中任务表合并，
+多个Worker进程之间由按key分片的文件锁保证只合成一次。超时由各合成引擎自身控制（HTTP超时、子进程超时），
+不使用信号，因此在多线程Worker中也可以安全使用。音频先写入临时文件再原子替换，不会留下不完整的缓存文件。
+合成引擎见 tts_backends，缓存文件的存放、索引和淘汰见 tts_cache。
+"""
+import concurrent.futures
+import hashlib
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows本地开发环境没有fcntl
+    fcntl = None
+
+import config
+import tts_backends
+from tts_cache import cache as default_cache
+
+logger = logging.getLogger(__name__)
+
+
+class TTSBusyError(Exception):
+    """等待中的合成任务过多，暂时不接受新任务"""
+
+
+def preprocess_text(text):
+    """预处理文本以优化TTS效果"""
+    # 处理特殊情况
+    text = text.replace('a/an', 'a or an')
+    text = text.replace('/', ' or ')
+    # 可以添加更多替换规则
+    return text
+
+
+def cache_key(text):
+    """缓存文件名使用预处理后文本的md5，避免文件名问题"""
+    return hashlib.md5(preprocess_text(text).encode()).hexdigest()
+
+
+class TTSService:
+    """按Worker进程划分的TTS合成线程池"""
+
+    def __init__(self, cache, backends, max_workers=2, max_pending=64):
+        self.cache = cache
+        self.backends = backends
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(1, max_pending)
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        # key → Future，同一key只有一个进行中的任务
+        self._inflight = {}
+        self._metrics = {
+            'requests': 0,
+            'cache_hits': 0,
+            'jobs': 0,
+            'coalesced': 0,
+            'rejected': 0,
+            'failures': 0,
+            'synthesized': 0,
+            'synth_ms_total': 0.0,
+            'synth_ms_max': 0.0,
+        }
+
+    def find_cached(self, key, record=True):
+        """返回key对应的缓存音频路径，不存在（或是0字节的文件）时返回None；record为False时不计入命中统计"""
+        return self.cache.lookup(key, record=record)
+
+    def _ensure_executor(self):
+        # gunicorn preload_app 下线程池不会随fork复制，按进程重新创建
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._inflight = {}
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='tts')
+
+    # --- 合成 ---
+    def _synthesize(self, key, text):
+        """依次尝试各个引擎，返回生成的音频路径；全部失败时抛出最后一个异常"""
+        error = None
+        for backend in self.backends:
+            tmp_path = os.path.join(self.cache.root, f"{key}{backend.extension}.{os.getpid()}-{threading.get_ident()}.tmp")
+            try:
+                backend.synthesize(text, tmp_path)
+                return self.cache.put(key, tmp_path, backend.extension)
+            except Exception as e:
+                logger.warning(f"TTS引擎 {backend.name} 合成失败: {text}, 错误: {e}")
+                error = e
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        raise error
+
+    def _run_job(self, key, text):
+        lock_dir = os.path.join(self.cache.root, '.locks')
+        os.makedirs(lock_dir, exist_ok=True)
+        # 其他Worker进程可能正在合成同一个单词，等它完成后直接使用结果（按key前两位分成256个锁文件）
+        with open(os.path.join(lock_dir, key[:2] + '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            path = self.cache.lookup(key, record=False)
+            if path is not None:
+                return path
+            start = time.perf_counter()
+            path = self._synthesize(key, text)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._metrics['synthesized'] += 1
+            self._metrics['synth_ms_total'] += elapsed_ms
+            self._metrics['synth_ms_max'] = max(self._metrics['synth_ms_max'], elapsed_ms)
+        logger.info(f"已生成TTS音频: {text} -> {path} ({elapsed_ms:.0f}ms)")
+        return path
+
+    def _job_done(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if future.exception() is not None:
+                self._metrics['failures'] += 1
+        if future.exception() is not None:
+            logger.error(f"TTS生成失败: key={key}, 错误: {future.exception()}")
+
+    def submit(self, text):
+        """提交合成任务，返回 (key, Future)；已有缓存文件时Future为None"""
+        key = cache_key(text)
+        path = self.find_cached(key)
+        with self._lock:
+            self._metrics['requests'] += 1
+            if path is not None:
+                self._metrics['cache_hits'] += 1
+                return key, None
+            self._ensure_executor()
+            future = self._inflight.get(key)
+            if future is not None:
+                self._metrics['coalesced'] += 1
+                return key, future
+            if len(self._inflight) >= self.max_pending:
+                self._metrics['rejected'] += 1
+                raise TTSBusyError(f"等待中的TTS任务过多: {len(self._inflight)}")
+            future = self._executor.submit(self._run_job, key, preprocess_text(text))
+            self._inflight[key] = future
+            self._metrics['jobs'] += 1
+        future.add_done_callback(lambda future: self._job_done(key, future))
+        return key, future
+
+    def get(self, text, wait):
+        """提交（或合并到）合成任务并最多等待wait秒
+
+        返回 (key, 音频路径)，音频尚未生成完成时路径为None；合成失败时抛出原始异常。
+        """
+        key, future = self.submit(text)
+        if future is None:
+            return key, self.find_cached(key)
+        try:
+            return key, future.result(timeout=max(0.0, wait))
+        except concurrent.futures.TimeoutError:
+            return key, None
+
+    def ensure(self, text):
+        """在当前线程中同步生成音频（供预生成任务使用），返回 (key, 音频路径, 是否新生成)"""
+        key = cache_key(text)
+        path = self.find_cached(key, record=False)
+        if path is not None:
+            return key, path, False
+        return key, self._run_job(key, preprocess_text(text)), True
+
+    # --- 指标 ---
+    def stats(self):
+        """返回当前进程的任务数、合并次数和合成耗时"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['inflight'] = len(self._inflight) if self._pid == os.getpid() else 0
+        synthesized = metrics['synthesized']
+        metrics['synth_ms_avg'] = round(metrics['synth_ms_total'] / synthesized, 3) if synthesized else 0.0
+        for key in ('synth_ms_total', 'synth_ms_max'):
+            metrics[key] = round(metrics[key], 3)
+        metrics['max_workers'] = self.max_workers
+        metrics['max_pending'] = self.max_pending
+        metrics['backends'] = {backend.name: backend.stats() for backend in self.backends}
+        metrics['cache'] = self.cache.stats()
+        return metrics
+
+
+service = TTSService(
+    default_cache,
+    tts_backends.create_backends(config.TTS_BACKEND),
+    max_workers=config.TTS_MAX_WORKERS,
+    max_pending=config.TTS_MAX_PENDING,
+)
@@ -0,0 +1,156 @@
+"""
+单词内容缓存 - 进程内缓存规范化后的单词数据及预先编码好的JSON片段
+
+单词内容只会被导入脚本修改，因此按word_id缓存：详情字段的None已统一转换为""，
+音频地址也已预先计算（音频清单中不存在的文件改用TTS地址）。热点接口只需在缓存的片段上追加
+学生相关的字段（错误次数、SRS进度等）。词库内容版本号或音频清单变化时整体失效。
+"""
+import json
+import threading
+from types import MappingProxyType
+
+import audio_manifest
+import content_version
+
+DETAIL_FIELDS = ('derivatives', 'root_etymology', 'mnemonic', 'comparison',
+                 'collocation', 'exam_sentence', 'exam_year_source',
+                 'exam_options', 'exam_explanation', 'tips')
+
+_LOAD_SQL = '''SELECT w.word_id, w.spelling, w.meaning_cn, w.pos, w.audio_path_uk, w.audio_path_us,
+                      w.derivatives, w.root_etymology, w.mnemonic, w.comparison, w.collocation,
+                      w.exam_sentence, w.exam_year_source, w.exam_options, w.exam_explanation, w.tips,
+                      w.list_id, wl.list_name, wl.book_id, b.book_name
+               FROM Words w
+               LEFT JOIN WordLists wl ON w.list_id = wl.list_id
+               LEFT JOIN Books b ON wl.book_id = b.book_id
+               WHERE w.word_id IN ({placeholders})'''
+
+# SQLite单条语句的参数数量有限，按主键批量取行时分批执行
+_LOAD_BATCH_SIZE = 500
+
+# 各视图包含的字段，与原接口返回的字段保持一致
+_QUIZ_KEYS = ('word_id', 'spelling', 'meaning_cn', 'pos', 'audio_path_uk', 'audio_path_us') + DETAIL_FIELDS + ('book_name',)
+_SRS_KEYS = _QUIZ_KEYS + ('list_name',)
+_SUMMARY_KEYS = ('spelling', 'meaning_cn', 'pos', 'list_id', 'book_id', 'book_name', 'list_name')
+
+
+def _encode(obj):
+    return json.dumps(obj, separators=(',', ':'))
+
+
+class WordPayload:
+    """单个单词的不可变缓存数据"""
+
+    __slots__ = ('word_id', 'fields', 'summary', 'audio', '_fragments')
+
+    def __init__(self, row):
+        fields = dict(row)
+        for field in DETAIL_FIELDS:
+            if fields.get(field) is None:
+                fields[field] = ""
+        if fields.get('book_name') is None:
+            fields['book_name'] = ""
+        if fields.get('list_name') is None:
+            fields['list_name'] = ""
+
+        tts_url = f"/api/tts/{fields['spelling']}"
+        audio_urls = {}
+        srs_audio = {}
+        for key in ('audio_path_uk', 'audio_path_us'):
+            url = audio_manifest.manifest.resolve(fields['book_name'], fields[key])
+            audio_urls[key] = url or tts_url
+            # SRS视图返回文件名由前端拼接路径，文件不存在时返回空字符串，前端直接使用TTS
+            srs_audio[key] = fields[key] if url and not fields[key].startswith('/') else ""
+
+        quiz = {key: fields[key] for key in _QUIZ_KEYS}
+        views = {
+            # 标准模式：带完整音频地址
+            'quiz': dict(quiz, **audio_urls),
+            # 默写模式：不提供音频
+            'dictation': dict(quiz, audio_path_uk="", audio_path_us=""),
+            # 错词复习模式：额外包含所属列表
+            'review': dict(quiz, list_id=fields['list_id'], list_name=fields['list_name'], **audio_urls),
+            # SRS复习：保留数据库中的原始音频文件名，由前端拼接路径
+            'srs': dict({key: fields[key] for key in _SRS_KEYS}, **srs_audio),
+        }
+
+        self.word_id = fields['word_id']
+        self.fields = MappingProxyType(fields)
+        self.summary = MappingProxyType({key: fields[key] for key in _SUMMARY_KEYS})
+        # 标准模式中的音频地址（音频包按这些地址收集文件）
+        self.audio = MappingProxyType(audio_urls)
+        # 预先编码的JSON对象，去掉末尾的 "}" 以便追加学生相关字段
+        self._fragments = {name: _encode(view)[:-1] for name, view in views.items()}
+
+    def to_json(self, view, extra=None):
+        """返回指定视图的JSON文本，extra中的字段追加在末尾（不能与视图字段重名）"""
+        fragment = self._fragments[view]
+        if not extra:
+            return fragment + '}'
+        return fragment + ',' + _encode(extra)[1:]
+
+
+class WordPayloadCache:
+    """word_id → WordPayload 的进程内缓存"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._payloads = {}
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self, conn):
+        version = (content_version.get_version(conn), audio_manifest.manifest.check())
+        with self._lock:
+            if version != self._version:
+                self._payloads = {}
+                self._version = version
+        return version
+
+    def get_many(self, conn, word_ids):
+        """按word_ids的顺序返回缓存的单词数据，数据库中不存在的单词会被跳过"""
+        version = self._check_version(conn)
+        with self._lock:
+            found = {word_id: self._payloads[word_id] for word_id in word_ids if word_id in self._payloads}
+        missing = [word_id for word_id in dict.fromkeys(word_ids) if word_id not in found]
+        self.hits += len(word_ids) - len(missing)
+        self.misses += len(missing)
+
+        for start in range(0, len(missing), _LOAD_BATCH_SIZE):
+            batch = missing[start:start + _LOAD_BATCH_SIZE]
+            sql = _LOAD_SQL.format(placeholders=','.join('?' * len(batch)))
+            for row in conn.execute(sql, batch).fetchall():
+                found[row['word_id']] = WordPayload(row)
+
+        if missing:
+            with self._lock:
+                if self._version == version:
+                    for word_id in missing:
+                        if word_id in found:
+                            self._payloads[word_id] = found[word_id]
+        return [found[word_id] for word_id in word_ids if word_id in found]
+
+    def get(self, conn, word_id):
+        """返回单个单词的缓存数据，不存在时返回None"""
+        payloads = self.get_many(conn, [word_id])
+        return payloads[0] if payloads else None
+
+    def invalidate(self):
+        """清空缓存"""
+        with self._lock:
+            self._payloads = {}
+
+    def stats(self):
+        """返回缓存命中统计"""
+        with self._lock:
+            size = len(self._payloads)
+        return {'size': size, 'hits': self.hits, 'misses': self.misses, 'version': self._version}
+
+
+word_cache = WordPayloadCache()
+
+
+def json_array(items):
+    """把若干JSON文本拼接成JSON数组"""
+    return '[' + ','.join(items) + ']'
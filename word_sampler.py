@@ -0,0 +1,66 @@
+"""
+单词随机抽样 - 用进程内的列表→单词ID索引代替 ORDER BY RANDOM()
+
+每个列表的单词ID在第一次使用时加载并缓存，词库内容版本号变化（导入脚本写入）时整体失效。
+抽样在内存中以 O(k) 完成，被抽中单词的内容再从 word_cache 按主键获取。
+"""
+import random
+import threading
+
+import content_version
+
+
+class WordIdIndex:
+    """列表ID → 单词ID元组 的懒加载缓存"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._version = None
+
+    def get(self, conn, list_id):
+        """返回列表中所有单词ID（按word_id排序的元组）"""
+        version = content_version.get_version(conn)
+        with self._lock:
+            if version != self._version:
+                self._ids = {}
+                self._version = version
+            ids = self._ids.get(list_id)
+        if ids is not None:
+            return ids
+
+        rows = conn.execute("SELECT word_id FROM Words WHERE list_id = ? ORDER BY word_id", (list_id,)).fetchall()
+        ids = tuple(row[0] for row in rows)
+        with self._lock:
+            if self._version == version:
+                self._ids[list_id] = ids
+        return ids
+
+    def invalidate(self, list_id=None):
+        """清除某个列表（或全部列表）的缓存"""
+        with self._lock:
+            if list_id is None:
+                self._ids = {}
+            else:
+                self._ids.pop(list_id, None)
+
+
+word_index = WordIdIndex()
+
+
+def sample_word_ids(conn, list_id, k=None, seed=None):
+    """从列表中随机抽取k个单词ID，k为None时返回打乱顺序的全部单词
+
+    提供seed时结果可复现：同一个列表、同样的seed和数量总是得到同一份试卷。
+    """
+    ids = word_index.get(conn, list_id)
+    rng = random.Random(f"{list_id}:{seed}") if seed is not None else random
+    # 与原先 LIMIT 的语义一致：负数表示不限制数量
+    if k is None or k < 0 or k >= len(ids):
+        shuffled = list(ids)
+        rng.shuffle(shuffled)
+        return shuffled
+    if k == 0:
+        return []
+    return rng.sample(ids, k)
+
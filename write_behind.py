@@ -0,0 +1,289 @@
+"""
+后台写入队列 - /api/submit 的批改结果先追加到本地日志文件并立即返回，由后台线程批量写入SQLite
+
+开启 WRITE_BEHIND_ENABLED 后生效。每个Worker进程把事件逐行追加（并fsync）到自己的日志段文件，
+后台线程每隔 WRITE_BEHIND_FLUSH_INTERVAL 秒（或攒够 WRITE_BEHIND_BATCH_SIZE 条）封存当前日志段，
+在一个写事务中写入全部结果，同时在 WriteBehindSegments 表中登记段名，提交后删除日志文件。
+段名登记与数据写入在同一事务中，进程在提交后、删除文件前崩溃也不会重复写入。
+
+崩溃恢复：每个进程对自己打开的日志段持有文件锁，后台线程启动时及之后定期扫描日志目录，
+能拿到锁的日志段说明所属进程已经退出，由当前进程重放。没有fcntl的环境（Windows本地开发）
+只有单个进程，目录中不属于本进程的日志段一律视为遗留文件。
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows本地开发环境没有fcntl
+    fcntl = None
+
+import config
+import db
+import submissions
+
+logger = logging.getLogger(__name__)
+
+_SUFFIX = '.journal'
+# 扫描遗留日志段的间隔（秒）
+_RECOVERY_INTERVAL = 30.0
+# WriteBehindSegments 中已写入段名的保留天数
+_SEGMENT_RETENTION_DAYS = 7
+
+
+class _Segment:
+    """一个日志段文件及其中尚未写入数据库的事件"""
+
+    def __init__(self, path, file, events=None):
+        self.path = path
+        self.file = file
+        self.events = events if events is not None else []
+        self.created = time.monotonic()
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)[:-len(_SUFFIX)]
+
+    def close(self):
+        try:
+            self.file.close()  # 关闭文件同时释放文件锁
+        except OSError:
+            pass
+
+
+def _try_lock(file):
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def _read_events(file):
+    """读取日志段中的事件；进程崩溃时最后一行可能不完整，直接丢弃"""
+    file.seek(0)
+    events = []
+    for line_no, line in enumerate(file, 1):
+        if not line.endswith('\n'):
+            logger.warning(f"日志段末尾存在不完整的记录，已忽略: {file.name}:{line_no}")
+            break
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            logger.warning(f"日志段中存在无法解析的记录，已忽略: {file.name}:{line_no}")
+    return events
+
+
+def _apply_segment(conn, name, events):
+    if conn.execute("SELECT 1 FROM WriteBehindSegments WHERE segment = ?", (name,)).fetchone():
+        return False
+    submissions.record_results(conn, events)
+    conn.execute("INSERT INTO WriteBehindSegments (segment, events) VALUES (?, ?)", (name, len(events)))
+    return True
+
+
+class WriteBehindQueue:
+    """按Worker进程划分的持久化写入队列"""
+
+    def __init__(self, journal_dir, enabled=False, flush_interval=0.5, batch_size=200, fsync=True):
+        self.journal_dir = journal_dir
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.fsync = fsync
+
+        self._cond = threading.Condition(threading.Lock())
+        self._pid = None
+        self._active = None
+        self._sealed = []
+        self._thread = None
+        self._stopping = False
+        self._metrics = {
+            'appended': 0,
+            'flushed_events': 0,
+            'flushes': 0,
+            'flush_failures': 0,
+            'flush_ms_total': 0.0,
+            'flush_ms_max': 0.0,
+            'last_flush_ms': 0.0,
+            'recovered_segments': 0,
+            'recovered_events': 0,
+        }
+
+    # --- 写入 ---
+    def _ensure_started(self):
+        # gunicorn preload_app 下主进程的状态会被fork到Worker，后台线程不会随fork复制
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._active = None
+            self._sealed = []
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='write-behind-flusher', daemon=True)
+            self._thread.start()
+
+    def _open_segment(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        path = os.path.join(self.journal_dir, f"{os.getpid()}-{time.time_ns()}{_SUFFIX}")
+        file = open(path, 'a+', encoding='utf-8')
+        _try_lock(file)
+        return _Segment(path, file)
+
+    def append(self, event):
+        """把一条批改结果写入日志（已落盘）后返回，由后台线程异步写入数据库"""
+        line = json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self._cond:
+            self._ensure_started()
+            if self._active is None:
+                self._active = self._open_segment()
+            self._active.file.write(line)
+            self._active.file.flush()
+            if self.fsync:
+                os.fsync(self._active.file.fileno())
+            self._active.events.append(event)
+            self._metrics['appended'] += 1
+            if len(self._active.events) >= self.batch_size:
+                self._cond.notify()
+
+    # --- 后台写入 ---
+    def _run(self):
+        last_recovery = 0.0
+        while True:
+            if time.monotonic() - last_recovery >= _RECOVERY_INTERVAL:
+                self.recover()
+                last_recovery = time.monotonic()
+            with self._cond:
+                if not self._stopping and (self._active is None or len(self._active.events) < self.batch_size):
+                    self._cond.wait(self.flush_interval)
+                if self._active is not None and self._active.events:
+                    self._sealed.append(self._active)
+                    self._active = None
+                stopping = self._stopping
+                pending = list(self._sealed)
+            self._flush(pending)
+            if stopping:
+                return
+
+    def _flush(self, segments):
+        if not segments:
+            return
+        conn = db.pool.acquire()
+        try:
+            for segment in segments:
+                start = time.perf_counter()
+                try:
+                    db.writer.run(conn, _apply_segment, segment.name, segment.events)
+                except Exception as e:
+                    # 保留日志段，下一轮重试
+                    with self._cond:
+                        self._metrics['flush_failures'] += 1
+                    logger.error(f"后台写入失败，稍后重试: segment={segment.name}, events={len(segment.events)}, error={e}")
+                    return
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                os.remove(segment.path)
+                segment.close()
+                with self._cond:
+                    self._sealed.remove(segment)
+                    self._metrics['flushes'] += 1
+                    self._metrics['flushed_events'] += len(segment.events)
+                    self._metrics['flush_ms_total'] += elapsed_ms
+                    self._metrics['flush_ms_max'] = max(self._metrics['flush_ms_max'], elapsed_ms)
+                    self._metrics['last_flush_ms'] = elapsed_ms
+        finally:
+            db.pool.release(conn)
+
+    # --- 崩溃恢复 ---
+    def recover(self):
+        """重放已退出进程遗留的日志段，返回重放的事件数"""
+        try:
+            names = sorted(name for name in os.listdir(self.journal_dir) if name.endswith(_SUFFIX))
+        except FileNotFoundError:
+            return 0
+        with self._cond:
+            own = {segment.path for segment in self._sealed}
+            if self._active is not None:
+                own.add(self._active.path)
+
+        recovered = 0
+        conn = db.pool.acquire()
+        try:
+            for name in names:
+                path = os.path.join(self.journal_dir, name)
+                if path in own:
+                    continue
+                try:
+                    file = open(path, 'r', encoding='utf-8')
+                except FileNotFoundError:
+                    continue
+                segment = _Segment(path, file)
+                try:
+                    if not _try_lock(file):
+                        continue  # 所属进程仍在运行
+                    segment.events = _read_events(file)
+                    if segment.events:
+                        applied = db.writer.run(conn, _apply_segment, segment.name, segment.events)
+                        if applied:
+                            recovered += len(segment.events)
+                            with self._cond:
+                                self._metrics['recovered_segments'] += 1
+                                self._metrics['recovered_events'] += len(segment.events)
+                    os.remove(path)
+                except Exception as e:
+                    logger.error(f"重放日志段失败: {path}, error={e}")
+                finally:
+                    segment.close()
+            db.writer.run(conn, lambda conn: conn.execute(
+                "DELETE FROM WriteBehindSegments WHERE applied_at < datetime('now', 'localtime', ?)",
+                (f'-{_SEGMENT_RETENTION_DAYS} days',)))
+        finally:
+            db.pool.release(conn)
+        if recovered:
+            logger.info(f"已重放遗留日志中的批改结果: {recovered}条")
+        return recovered
+
+    def close(self, timeout=10.0):
+        """停止后台线程，退出前写入所有未写入的结果"""
+        with self._cond:
+            if self._pid != os.getpid() or self._thread is None:
+                return
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        thread.join(timeout)
+
+    # --- 指标 ---
+    def stats(self):
+        """返回当前进程的队列深度和写入耗时等指标"""
+        with self._cond:
+            metrics = dict(self._metrics)
+            segments = list(self._sealed) + ([self._active] if self._active is not None else [])
+            metrics['queue_depth'] = sum(len(segment.events) for segment in segments)
+            metrics['pending_segments'] = len(segments)
+            oldest = min((segment.created for segment in segments if segment.events), default=None)
+        metrics['oldest_pending_age_s'] = round(time.monotonic() - oldest, 3) if oldest is not None else 0.0
+        flushes = metrics['flushes']
+        metrics['flush_ms_avg'] = round(metrics['flush_ms_total'] / flushes, 3) if flushes else 0.0
+        for key in ('flush_ms_total', 'flush_ms_max', 'last_flush_ms'):
+            metrics[key] = round(metrics[key], 3)
+        try:
+            metrics['journal_files'] = sum(1 for name in os.listdir(self.journal_dir) if name.endswith(_SUFFIX))
+        except FileNotFoundError:
+            metrics['journal_files'] = 0
+        metrics['enabled'] = self.enabled
+        metrics['pid'] = os.getpid()
+        return metrics
+
+
+queue = WriteBehindQueue(
+    config.WRITE_BEHIND_DIR,
+    enabled=config.WRITE_BEHIND_ENABLED,
+    flush_interval=config.WRITE_BEHIND_FLUSH_INTERVAL,
+    batch_size=config.WRITE_BEHIND_BATCH_SIZE,
+    fsync=config.WRITE_BEHIND_FSYNC,
+)
+atexit.register(queue.close)